@@ -3,6 +3,7 @@ from PyQt6.QtCore import QObject, Qt, pyqtBoundSignal, pyqtSignal,  QRectF
 from PyQt6.QtWidgets import (QGraphicsPathItem, QGraphicsView, QGraphicsScene, QGraphicsLineItem)
 
 from ..drawing.tools import ArrowDrawingHandler, ConnectedLineHandler, EllipseDrawingHandler, BrushTool, DrawingHandler, LineDrawingHandler, ToolProtocol, PenTool, RectDrawingHandler, TextboxDrawingHandler, FreeHandDrawingHandler, NullDrawingHandler
+from ..graphics.styles import StyleTable
 from ..utils import Handlers, Tools
 
 class DrawingController(QObject):
@@ -26,8 +27,9 @@ class DrawingController(QObject):
         super().__init__()
         self.scene_view = scene_view
         self.handler = handler if handler is not None else NullDrawingHandler(handler_signal=self.handler_signal)
-        self.pen = pen if pen is not None else QPen(Qt.GlobalColor.black)
-        self.brush = brush if brush is not None else QBrush(Qt.GlobalColor.black)
+        # Interned, the setters below replace them instead of modifying them
+        self.pen = self.intern_pen(pen if pen is not None else QPen(Qt.GlobalColor.black))
+        self.brush = self.intern_brush(brush if brush is not None else QBrush(Qt.GlobalColor.black))
         self.name_to_classname_mapping = {Handlers.Line.name: LineDrawingHandler,
                                           Handlers.Freehand.name: FreeHandDrawingHandler,
                                           Handlers.Selector.name: NullDrawingHandler,
@@ -53,11 +55,19 @@ class DrawingController(QObject):
             else:
                 self.handler.mousePress(self.scene_view, event, self.brush)
 
-    def mouseMoveEvent(self, event: QMouseEvent):
+    def mouseMoveEvent(self, event: QMouseEvent, samples: list[QMouseEvent] | None = None):
+        """
+        event: latest move event
+        samples: every move event since the previous call, ending with event. Passed to handlers implementing mouseMoveSamples
+        """
         if (isinstance(self.handler, DrawingHandler)
             and self.scene_view
             and self.pen):
-            self.handler.mouseMove(self.scene_view, event, self.pen)
+            move_samples = getattr(self.handler, "mouseMoveSamples", None)
+            if samples and callable(move_samples):
+                move_samples(self.scene_view, samples, self.pen)
+            else:
+                self.handler.mouseMove(self.scene_view, event, self.pen)
 
     def mouseReleaseEvent(self, event: QMouseEvent):
         if (isinstance(self.handler, DrawingHandler)
@@ -68,22 +78,45 @@ class DrawingController(QObject):
     def setSceneView(self, scene_view: QGraphicsView) -> None:
         self.scene_view = scene_view
 
+    def style_table(self) -> StyleTable | None:
+        """ Table of the active scene, pens and brushes are interned there. None without a scene """
+        scene = self.scene_view.scene() if self.scene_view is not None else None
+        return getattr(scene, "style_table", None)
+
+    def intern_pen(self, pen: QPen) -> QPen:
+        table = self.style_table()
+        return table.pen(pen) if table is not None else pen
+
+    def intern_brush(self, brush: QBrush) -> QBrush:
+        table = self.style_table()
+        return table.brush(brush) if table is not None else brush
+
     def setPenWidth(self, size: int) -> None:
-        self.pen.setWidth(size)
+        pen = QPen(self.pen)
+        pen.setWidth(size)
+        self.pen = self.intern_pen(pen)
 
     def setPenColor(self, color: QColor):
-        self.pen.setColor(color)
+        pen = QPen(self.pen)
+        pen.setColor(color)
+        self.pen = self.intern_pen(pen)
 
     def setFill(self, color: QColor):
-        self.brush.setColor(color)
+        brush = QBrush(self.brush)
+        brush.setColor(color)
+        self.brush = self.intern_brush(brush)
 
     def setBrushStyle(self, style: str):
         if style in Qt.BrushStyle.__members__:
-            self.brush.setStyle(Qt.BrushStyle[style])
+            brush = QBrush(self.brush)
+            brush.setStyle(Qt.BrushStyle[style])
+            self.brush = self.intern_brush(brush)
 
     def setPenStyle(self, style: str):
         if style in Qt.PenStyle.__members__:
-            self.pen.setStyle(Qt.PenStyle[style])
+            pen = QPen(self.pen)
+            pen.setStyle(Qt.PenStyle[style])
+            self.pen = self.intern_pen(pen)
 
     def setHandler(self, handler: DrawingHandler | ToolProtocol):
         self.handler = handler
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
 from collections.abc import Callable
+from math import hypot
+import logging
 from typing import Protocol
 
 from PyQt6.QtGui import QBrush, QMouseEvent, QPen, QPainterPath
@@ -7,7 +9,10 @@ from PyQt6.QtCore import QPointF, Qt, pyqtBoundSignal, QRectF, QLineF
 from PyQt6.QtWidgets import (QGraphicsItem, QGraphicsPathItem, QGraphicsView, QGraphicsScene, QGraphicsRectItem)
 
 from ..graphics import (DeepCopyableEllipseItem, DeepCopyableLineItem, DeepCopyablePathItem, DeepCopyableRectItem, SelectableRectItem, DeepCopyableTextbox,
-                        DeepCopyableArrowItem, DeepCopyableLineABC)
+                        DeepCopyableArrowItem, DeepCopyableLineABC, DeepCopyableConnectorItem, LiveStrokeItem)
+from ..graphics.strokes import curves_to_path, fit_stroke
+
+logger = logging.getLogger(__name__)
 
 TOLERENCE = 10 # GraphicsItems with width or height less than tolerence will be discarded from scene. Assumed to be 'miss click' items
 
@@ -23,6 +28,9 @@ class DrawingHandler(ABC):
     def mouseMove(self, view: QGraphicsView, event: QMouseEvent, pen: QPen) -> None: ...
     def max_z_value(self, scene: QGraphicsScene):
         """ Returns z-value of graphicsitem in the forefront of the scene """
+        top_z_value = getattr(scene, "top_z_value", None)
+        if callable(top_z_value):
+            return top_z_value()
         max_val = 0
         for item in scene.items():
             if not isinstance(item, QGraphicsItem):
@@ -52,6 +60,9 @@ class BrushTool(ToolProtocol):
         scene = view.scene()
         if not scene: return
         selected = scene.selectedItems()
+        if (apply_style := getattr(scene, "apply_style", None)) is not None:
+            apply_style(selected, brush=tool)
+            return
         for item in selected:
             method = getattr(item, "setBrush", None)
             if callable(method):
@@ -62,6 +73,9 @@ class PenTool(ToolProtocol):
         scene = view.scene()
         if not scene: return
         selected = scene.selectedItems()
+        if (apply_style := getattr(scene, "apply_style", None)) is not None:
+            apply_style(selected, pen=tool)
+            return
         for item in selected:
             method = getattr(item, "setPen", None)
             if callable(method):
@@ -113,7 +127,7 @@ class TextboxDrawingHandler(DrawingHandler):
             scene.removeItem(self.rect_item)
         if self.rect_item and self.rect_item.boundingRect().width() > (TOLERENCE + 7) and self.rect_item.boundingRect().height() > (TOLERENCE + 7):
             # prevent accidental creation of textbox item
-            self.selectable_rect_item = SelectableRectItem(self.rect_item, self.handler_signal)
+            self.selectable_rect_item = SelectableRectItem(self.rect_item)
             scene.addItem(self.selectable_rect_item)
             self.selectable_rect_item.setZValue(self.max_z_value(scene))
 
@@ -155,7 +169,7 @@ class GenericLineDrawingHandler(DrawingHandler):
 
             self.current_line.setLine(QLineF(self.start_point, end_point))
             if self.current_line.line().length() > TOLERENCE:
-                selectable_line = SelectableRectItem(self.current_line, self.handler_signal)
+                selectable_line = SelectableRectItem(self.current_line)
                 scene.addItem(selectable_line)
                 selectable_line.setZValue(self.max_z_value(scene))
 
@@ -213,7 +227,7 @@ class ShapeDrawingHandler(DrawingHandler):
             return
         if event.button() == Qt.MouseButton.LeftButton and self.shape_item is not None:
             if self.shape_item.boundingRect().width() > TOLERENCE or self.shape_item.boundingRect().height() > TOLERENCE:
-                selectable_rect = SelectableRectItem(self.shape_item, self.handler_signal)
+                selectable_rect = SelectableRectItem(self.shape_item)
                 scene.addItem(selectable_rect)
 
             self.drawing_started = False
@@ -228,12 +242,16 @@ class EllipseDrawingHandler(ShapeDrawingHandler):
         super().__init__(handler_signal, DeepCopyableEllipseItem)
 
 class FreeHandDrawingHandler(DrawingHandler):
-    """ Handles drawing behaviour of free hand tool """
+    """ Handles drawing behaviour of free hand tool. The stroke is displayed by a LiveStrokeItem while drawing, so each
+    move event only repaints the newest segment, and becomes a DeepCopyablePathItem on release. Released strokes are
+    decimated and fitted with cubic curves """
+    simplify_tolerance = 1.0 # maximum deviation in screen pixels of the simplified stroke, 0 keeps every sample
+
     def __init__(self, handler_signal: pyqtBoundSignal):
         super().__init__(handler_signal)
         self.drawing_started = False
-        self.current_line = None
-        self.current_path_item = None
+        self.stroke_item: LiveStrokeItem | None = None
+        self.node_counts: tuple[int, int] | None = None # (samples, nodes) of the last simplified stroke
 
     def mousePress(self, view: QGraphicsView, event: QMouseEvent, pen: QPen):
         scene = view.scene()
@@ -242,71 +260,80 @@ class FreeHandDrawingHandler(DrawingHandler):
         if event.button() == Qt.MouseButton.LeftButton:
             self.drawing_started = True
             start_point = view.mapToScene(event.position().toPoint())
-            self.current_path = QPainterPath(start_point)
-            self.current_path_item = QGraphicsPathItem(self.current_path)
-            self.current_path_item.setPen(pen)
-            scene.addItem(self.current_path_item)
-            self.current_path_item.setZValue(self.max_z_value(scene))
+            self.stroke_item = LiveStrokeItem(start_point, pen)
+            scene.addItem(self.stroke_item)
+            self.stroke_item.setZValue(self.max_z_value(scene))
 
     def mouseMove(self, view: QGraphicsView, event: QMouseEvent, pen: QPen):
         scene = view.scene()
         # Check for events occuring out of bounds or any required variables being None
         if (not self.drawing_started or scene is None
-            or not self.inBounds(scene, event) or self.current_path_item is None
+            or not self.inBounds(scene, event) or self.stroke_item is None
             ):
             return
+        # Repeated positions are ignored by the stroke
+        self.stroke_item.append(view.mapToScene(event.position().toPoint()))
 
-        end = view.mapToScene(event.position().toPoint())
-        # Only update current path if new event position is different from the previous entry event position
-        if self.current_path.currentPosition() != end:
-            self.current_path.lineTo(end)
-            self.current_path_item.setPath(self.current_path)
+    def mouseMoveSamples(self, view: QGraphicsView, events: list[QMouseEvent], pen: QPen):
+        """ Receives every move event of a frame when moves are coalesced, so strokes keep their full resolution """
+        for event in events:
+            self.mouseMove(view, event, pen)
 
     def mouseRelease(self, view: QGraphicsView, event: QMouseEvent, pen: QPen):
         scene = view.scene()
         # Code should run fine without this line
-        if scene is None or self.current_path_item is None:
+        if scene is None or self.stroke_item is None:
             return
 
-        scene.removeItem(self.current_path_item)
-        if self.current_path_item.path().length() > TOLERENCE:
-            copyable_path = DeepCopyablePathItem(self.current_path_item.path())
+        scene.removeItem(self.stroke_item)
+        if self.stroke_item.length() > TOLERENCE:
+            copyable_path = DeepCopyablePathItem(self.simplified_path(view, self.stroke_item))
             copyable_path.setPen(pen)
-            selectable_path_item = SelectableRectItem(copyable_path, self.handler_signal)
+            selectable_path_item = SelectableRectItem(copyable_path)
             scene.addItem(selectable_path_item)
+        self.stroke_item = None
         self.drawing_started = False
 
+    def simplified_path(self, view: QGraphicsView, stroke: LiveStrokeItem) -> QPainterPath:
+        """ Returns the stroke simplified within simplify_tolerance pixels at the current zoom of view """
+        if self.simplify_tolerance <= 0:
+            return stroke.path()
+        points = stroke.points()
+        transform = view.transform()
+        scale = hypot(transform.m11(), transform.m12()) or 1.0
+        curves = fit_stroke(points, self.simplify_tolerance / scale)
+        self.node_counts = (len(points), len(curves) + 1)
+        logger.debug("Simplified freehand stroke from %d samples to %d nodes", *self.node_counts)
+        return curves_to_path(curves)
+
     def inBounds(self, scene: QGraphicsScene, event: QMouseEvent) -> bool:
         """ Returns true if event took place within the bounds of scene """
         return scene.sceneRect().contains(event.position())
 
 class ConnectedLineHandler(DrawingHandler):
-    connection_zones: list[QPointF] = []
+    """
+    Draws connected lines into a single DeepCopyableConnectorItem. Each press ends the current segment, segments ending
+    on a vertex of the connector share it, so the junction can later be dragged as one. Drawing continues until the
+    handler is reset
+    """
     radius = 5
 
     def __init__(self, handler_signal: pyqtBoundSignal):
         self.handler_signal = handler_signal
         self.drawing = False
-        self.current_line = None
+        self.current_line = None # segment following the cursor
         self.start_point = None
+        self.connector: DeepCopyableConnectorItem | None = None
+        self.start_vertex: int | None = None
         self._tolerance = 15
 
     @classmethod
-    def _add_connection_zone(cls, pos: QPointF):
-        """
-        pos: position in scene coordinates
-        """
-        cls.connection_zones.append(pos)
-
-    @staticmethod
-    def _euclid_distance(p1: QPointF, p2: QPointF):
-        return ((p1.x() - p2.x())**2 + (p1.y() - p2.y())**2 )** (1/2)
-
-    @classmethod
-    def attempt_connection(cls, pos: QPointF) -> None | QPointF:
-        for point in cls.connection_zones:
-            if cls._euclid_distance(point, pos) < cls.radius:
-                return point
+    def attempt_connection(cls, scene: QGraphicsScene | None, pos: QPointF) -> None | QPointF:
+        """ Returns the closest end point of a line in scene within radius of pos, lines drawn with any handler are snapped to """
+        snap_index = getattr(scene, "snap_index", None)
+        if snap_index is None:
+            return None
+        return snap_index.nearest(pos, cls.radius)
 
     def mousePress(self, view: QGraphicsView, event: QMouseEvent, pen: QPen) -> None:
         scene = view.scene()
@@ -314,54 +341,63 @@ class ConnectedLineHandler(DrawingHandler):
             return None
 
         if event.button() == Qt.MouseButton.LeftButton:
-            # End drawing
-            if self.drawing and self.start_point is not None and self.current_line is not None:
-                self._end_drawing(self.current_line, scene)
-
-            self._init_drawing(view, scene, event, pen)
-
-
-    def mouseMove(self, view: QGraphicsView, event: QMouseEvent, pen: QPen) -> None:
-        if self.start_point is not None and self.current_line is not None and self.drawing:
             event_pos = view.mapToScene(event.position().toPoint())
-            maybe_point = self.attempt_connection(event_pos)
-            if maybe_point is not None and self.current_line.line().length() > self._tolerance:
-                scene = view.scene()
-                if scene is None:
-                    return None
-                self.connection_zones.append(self.current_line.line().p2())
-                self.current_line.setLine(QLineF(self.start_point, maybe_point))
-                self._end_drawing(self.current_line, scene)
-                self._init_drawing(view, scene, event, pen)
+            if self.drawing and self.connector is not None and self.start_vertex is not None:
+                self._add_segment(scene, event_pos)
             else:
-                self.current_line.setLine(QLineF(self.start_point, event_pos))
+                self._init_drawing(scene, event_pos, pen)
+
+    def mouseMove(self, view: QGraphicsView, event: QMouseEvent, pen: QPen) -> None:
+        if not self.drawing or self.start_point is None or self.current_line is None:
+            return
+        scene = view.scene()
+        if scene is None:
+            return None
+        event_pos = view.mapToScene(event.position().toPoint())
+        maybe_point = self.attempt_connection(scene, event_pos)
+        if maybe_point is not None and QLineF(self.start_point, maybe_point).length() > self._tolerance:
+            self._add_segment(scene, maybe_point)
+        else:
+            self.current_line.setLine(QLineF(self.start_point, event_pos))
 
     def mouseRelease(self, view, event, pen):
         return
 
-    def _end_drawing(self, line_item, scene):
-        selectable_rect = SelectableRectItem(line_item, select_signal=self.handler_signal)
-        scene.addItem(selectable_rect)
-
-    def _init_drawing(self, view, scene, event, pen):
+    def _vertex_at(self, scene: QGraphicsScene, pos: QPointF) -> int:
+        """ Returns the connector vertex at pos, after snapping pos to nearby end points. Adds a vertex if there is none """
+        snapped = self.attempt_connection(scene, pos)
+        local_pos = self.connector.mapFromScene(snapped if snapped is not None else pos)
+        vertex = self.connector.vertex_at(local_pos, self.radius)
+        return vertex if vertex is not None else self.connector.add_vertex(local_pos)
+
+    def _add_segment(self, scene: QGraphicsScene, pos: QPointF) -> None:
+        vertex = self._vertex_at(scene, pos)
+        self.connector.add_edge(self.start_vertex, vertex)
+        if self.connector.parentItem() is None and self.connector.edge_count():
+            # The connector is added to the scene once it has a segment
+            scene.addItem(SelectableRectItem(self.connector))
+        self._move_start(vertex)
+
+    def _move_start(self, vertex: int) -> None:
+        self.start_vertex = vertex
+        self.start_point = self.connector.mapToScene(self.connector.graph.vertices[vertex])
+        self.current_line.setLine(QLineF(self.start_point, self.start_point))
+
+    def _init_drawing(self, scene: QGraphicsScene, pos: QPointF, pen: QPen) -> None:
         self.drawing = True
-        event_scene_pos = view.mapToScene(event.position().toPoint())
-        maybe_point = self.attempt_connection(event_scene_pos)
-        if maybe_point is not None:
-            self.start_point = maybe_point
-        else:
-            self.start_point = event_scene_pos
-            self.connection_zones.append(event_scene_pos)
-
-        self.start_point = maybe_point if maybe_point is not None else event_scene_pos
+        self.connector = DeepCopyableConnectorItem()
+        self.connector.setPen(pen)
         self.current_line = DeepCopyableLineItem()
         self.current_line.setPen(pen)
         scene.addItem(self.current_line)
         self.current_line.setZValue(self.max_z_value(scene))
+        self._move_start(self._vertex_at(scene, pos))
 
     def reset(self, scene):
         self.drawing = False
         if self.current_line is not None:
             scene.removeItem(self.current_line)
             self.current_line = None
+        self.connector = None
+        self.start_vertex = None
         self.start_point = None
@@ -2,13 +2,18 @@ from abc import ABC, abstractmethod
 from collections.abc import Callable
 
 from PyQt6.QtGui import QTransform
-from PyQt6.QtCore import QLineF, QPointF, QRectF
+from PyQt6.QtCore import QLineF, QPointF, QRectF, QSizeF
 from PyQt6.QtWidgets import (QGraphicsSceneMouseEvent, QGraphicsItem)
 
 class TransformationHandler(ABC):
+    """ The item resolves which handler a press belongs to with hit, only that handler then receives the press, the moves
+    and the release of the drag """
     def __init__(self, set_rect_callback: Callable[[], QRectF], item):
         self.set_rect_callback = set_rect_callback
         self.item = item
+    def hit(self, pos: QPointF) -> bool:
+        """ pos: position in item coordinates """
+        return self.rect.contains(pos)
     @abstractmethod
     def handle_mouse_move(self, event) -> None: ...
     @abstractmethod
@@ -31,12 +36,17 @@ class RotationHandler(TransformationHandler):
         self.is_rotating = False
         self.is_resizing = False
         self.rotation_start_angle = 0
+        # Rotation center in item and scene coordinates, fixed for the duration of a drag
+        self._center = QPointF()
+        self._scene_center = QPointF()
 
     def handle_mouse_press(self, event):
-        if self.rect.contains(self.item.mapFromScene(event.scenePos())):
-            self.item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, False)
-            self.is_rotating = True
-            self.rotation_start_angle = self.angle(event.scenePos(), self.item.mapToScene(self.item.boundingRect().center()))
+        self.item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, False)
+        self.is_rotating = True
+        self._center = self.item.boundingRect().center()
+        self._scene_center = self.item.mapToScene(self._center)
+        self.rotation_start_angle = self.angle(event.scenePos(), self._scene_center)
+        self.item.begin_transform()
 
     @staticmethod
     def angle(p1: QPointF, p2: QPointF) -> float:
@@ -52,14 +62,14 @@ class RotationHandler(TransformationHandler):
     def handle_mouse_move(self, event: QGraphicsSceneMouseEvent):
         if self.is_rotating:
             # Modulo 360, degree of line origin -> event going clockwise
-            current_angle = self.angle(event.scenePos(), self.item.mapToScene(self.item.boundingRect().center()))
+            # The angle is measured from the press, so the transform does not depend on the moves in between
+            current_angle = self.angle(event.scenePos(), self._scene_center)
             angle_diff = (self.rotation_start_angle - current_angle) % 360
-            transform = self.build_transform(angle_diff)
-            self.item.setTransform(transform, combine=True)
-            self.rotation_start_angle = current_angle
+            self.item.set_transform_from_origin(self.build_transform(angle_diff))
 
     def handle_mouse_release(self, event: QGraphicsSceneMouseEvent):
         if self.is_rotating:
+            self.item.commit_transform()
             self.item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, True)
             self.is_rotating = False
 
@@ -67,7 +77,7 @@ class RotationHandler(TransformationHandler):
         """
         degrees: the number of degrees
         """
-        center = self.item.boundingRect().center()
+        center = self._center if self.is_rotating else self.item.boundingRect().center()
         transform = QTransform()
         transform.translate(center.x() , center.y() )
         transform.rotate(degrees)
@@ -86,6 +96,7 @@ class ScaleHandler(TransformationHandler):
     1. We can not invert items. If you drag the top left corner towards the top right corner, you can not pass the top right corner.
     2. There is also glitching when the image width/height is small
     """
+    min_size = 20
     def __init__(self, set_rect_callback: Callable[[],QRectF], item: QGraphicsItem, bounding_rect_callback: Callable[[], QRectF]):
         """
         -- Params --
@@ -97,6 +108,11 @@ class ScaleHandler(TransformationHandler):
         super().__init__(set_rect_callback, item)
         self.bounding_rect_callback = bounding_rect_callback
         self.stretching = False
+        # Computed at press time. The dragged corner can not pass the opposing one, so neither changes during a drag
+        self._corner: tuple[bool, bool] = (False, False) # (top, left) of the dragged corner
+        self._pivot: QPointF | None = None # stationary corner in the coordinates of bounding_rect_callback
+        self._press_pos = QPointF()
+        self._start_size = QSizeF()
 
     def edge_coordinate(self) -> QPointF:
         """ Scene coordinates for the center of the handler rectangle  """
@@ -121,49 +137,37 @@ class ScaleHandler(TransformationHandler):
         return top, left
 
     def handle_mouse_press(self, event: QGraphicsSceneMouseEvent):
-        if self.rect.contains(self.item.mapFromScene(event.scenePos())):
-            self.item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, False)
-            self.stretching = True
+        self.item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, False)
+        self.stretching = True
+        self._corner = self.scene_corner()
+        top, left = self.local_corner()
+        self._pivot = self._get_corner(not top, not left)
+        self._press_pos = self.item.mapFromScene(event.scenePos())
+        self._start_size = self.item.itemBoundingRect().size()
+        self.item.begin_transform()
 
     def handle_mouse_move(self, event):
         if self.stretching:
-            new_coordinate = self.item.mapFromScene(event.scenePos())
-            edge_coordinate = self.rect.center()
-
-            if new_coordinate.x() == 0 or edge_coordinate.x() == 0 or edge_coordinate.y() == 0 or new_coordinate.y() == 0:
-                return
-
-            delta_x = new_coordinate.x() - edge_coordinate.x()
-            delta_y = new_coordinate.y() - edge_coordinate.y()
+            # Scale factors are measured from the press, so the transform does not depend on the moves in between
+            position = self.item.mapFromScene(event.scenePos())
+            delta_x = position.x() - self._press_pos.x()
+            delta_y = position.y() - self._press_pos.y()
 
             # Moving the cursor left has the inverse effect when draging a left corner compared with a right corner
-            top, left = self.scene_corner()
+            top, left = self._corner
             if left:
                 delta_x = -delta_x
-
             if top:
                 delta_y = -delta_y
-            bounding_rect = self.item.boundingRect()
-            x_scale_factor = (bounding_rect.width() + delta_x) / max(bounding_rect.width(), 10)
-            y_scale_factor = (bounding_rect.height() + delta_y) / max(bounding_rect.height(), 10)
-            # Prevent large scaling factors
-            if x_scale_factor > 0:
-                x_scale_factor_restricted = min(x_scale_factor, 1.5)
-            else:
-                x_scale_factor_restricted = max(x_scale_factor, -1.5)
-
-            if y_scale_factor > 0:
-                y_scale_factor_restricted = min(y_scale_factor, 1.5)
-            else:
-                y_scale_factor_restricted = max(y_scale_factor, -1.5)
-
-            x_scale_factor_restricted = x_scale_factor_restricted if bounding_rect.width() > 20 or x_scale_factor_restricted > 1 else 1
-            y_scale_factor_restricted = y_scale_factor_restricted if bounding_rect.height() > 20 or y_scale_factor_restricted > 1 else 1
-            transform = self.build_transform(x_scale_factor_restricted, y_scale_factor_restricted)
-            self.item.setTransform(transform, combine=True)
+            width, height = self._start_size.width(), self._start_size.height()
+            # Items are not shrunk below min_size, which also prevents inverting them
+            x_scale_factor = max(width + delta_x, min(width, self.min_size)) / width
+            y_scale_factor = max(height + delta_y, min(height, self.min_size)) / height
+            self.item.set_transform_from_origin(self.build_transform(x_scale_factor, y_scale_factor), scale=True)
 
     def handle_mouse_release(self, event: QGraphicsSceneMouseEvent):
         if self.stretching:
+            self.item.commit_transform()
             self.item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, True)
             self.stretching = False
 
@@ -193,11 +197,60 @@ class ScaleHandler(TransformationHandler):
 
     def build_transform(self, x_scale_factor: float, y_scale_factor: float):
         """ Create QTransform required to scale item fixed to the opposing diagonal corner """
-        top, left = self.local_corner()
         transform = QTransform()
-        translate_center = self._get_corner(not top, not left)
+        if self.stretching:
+            translate_center = self._pivot
+        else:
+            top, left = self.local_corner()
+            translate_center = self._get_corner(not top, not left)
         if translate_center is not None:
             transform.translate(translate_center.x() , translate_center.y())
             transform.scale(abs(x_scale_factor), abs(y_scale_factor))
             transform.translate(-translate_center.x() , -translate_center.y())
         return transform
+
+
+class VertexHandler(TransformationHandler):
+    """
+    VertexHandler drags the shared vertices of a connector item. All edges incident to the dragged vertex follow it in
+    a single geometry change of the connector
+    """
+    def __init__(self, set_rect_callback: Callable[[], QRectF], item: QGraphicsItem, connector, handle_size: float = 8):
+        """
+        -- Params --
+        set_rect_callback: Callable that returns the QRectF containing all vertex handles
+        item: selectable container of connector
+        connector: DeepCopyableConnectorItem whose vertices are dragged
+        handle_size: width of the square around each vertex in which presses start a drag
+        """
+        super().__init__(set_rect_callback, item)
+        self.connector = connector
+        self.handle_size = handle_size
+        self.vertex: int | None = None
+        self._hit_vertex: int | None = None
+
+    def hit(self, pos: QPointF) -> bool:
+        """ True if pos is on a vertex handle. The vertex is kept for the press that follows """
+        self._hit_vertex = self.connector.vertex_at(self.connector.mapFromItem(self.item, pos), self.handle_size / 2)
+        return self._hit_vertex is not None
+
+    def handle_mouse_press(self, event: QGraphicsSceneMouseEvent):
+        self.vertex, self._hit_vertex = self._hit_vertex, None
+        if self.vertex is not None:
+            self.item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, False)
+
+    def handle_mouse_move(self, event: QGraphicsSceneMouseEvent):
+        if self.vertex is not None:
+            self.connector.move_vertex(self.vertex, self.connector.mapFromScene(event.scenePos()))
+
+    def handle_mouse_release(self, event: QGraphicsSceneMouseEvent):
+        if self.vertex is not None:
+            self.item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, True)
+            self.vertex = None
+
+    def paint(self, painter) -> None:
+        """ Draws a handle at every vertex instead of the handler rect """
+        half = self.handle_size / 2
+        for point in self.connector.graph.vertices.values():
+            center = self.item.mapFromItem(self.connector, point)
+            painter.drawRect(QRectF(center.x() - half, center.y() - half, self.handle_size, self.handle_size))
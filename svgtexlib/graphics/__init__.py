@@ -1,10 +1,14 @@
 from .selectable_rect import SelectableRectItem
+from .scene import SelectableScene
 from .wrappers import (DeepCopyableItemABC, StoringQSvgRenderer, DeepCopyableSvgItem, DeepCopyableEllipseItem,DeepCopyableItemABC,
                        DeepCopyableRectItem, DeepCopyableLineItem, DeepCopyablePathItem, DeepCopyableTextbox, DeepCopyableItemGroup,
                        DeepCopyableLineABC, DeepCopyableShapeABC)
 from .items import DeepCopyableArrowItem
+from .connectors import ConnectorGraph, DeepCopyableConnectorItem
+from .strokes import LiveStrokeItem
 __all__ = [
         "SelectableRectItem",
+        "SelectableScene",
         "DeepCopyableItemABC",
         "StoringQSvgRenderer",
         "DeepCopyableSvgItem",
@@ -17,5 +21,8 @@ __all__ = [
         "DeepCopyableItemABC",
         "DeepCopyableLineABC",
         "DeepCopyableArrowItem",
-        "DeepCopyableShapeABC"
+        "DeepCopyableShapeABC",
+        "ConnectorGraph",
+        "DeepCopyableConnectorItem",
+        "LiveStrokeItem"
         ]
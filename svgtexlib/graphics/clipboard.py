@@ -0,0 +1,78 @@
+from __future__ import annotations
+from collections.abc import Callable, Iterable
+
+from PyQt6.QtCore import QPointF, QRectF
+
+from .scene import SelectableScene
+from .selectable_rect import SelectableRectItem
+
+"""
+Copy and paste of SelectableRectItem's.
+
+Copying records an immutable description of every item instead of a copy: the item's geometry state and a factory
+building its child. Factories share the copied item's payloads, svg items the renderer and path items the path (Qt
+shares path data between copies until one is modified). Pasting builds new items from the descriptions, so the
+clipboard can be pasted any number of times and every pasted svg item renders through the same renderer.
+"""
+
+
+class ClipboardEntry:
+    """ Description of a copied SelectableRectItem """
+    __slots__ = ("_build", "_state")
+
+    def __init__(self, build: Callable, state: tuple):
+        """
+        -- Params --
+        build: returns a new child item, see DeepCopyableItemABC.clipboard_factory
+        state: geometry state of the copied item, see SelectableRectItem.geometry_state
+        """
+        self._build = build
+        self._state = state
+
+    @classmethod
+    def from_item(cls, item: SelectableRectItem) -> ClipboardEntry:
+        return cls(item.item.clipboard_factory(), item.geometry_state())
+
+    def materialize(self, offset: QPointF = QPointF()) -> SelectableRectItem:
+        """ Builds a new item, moved by offset from the copied item """
+        item = SelectableRectItem(self._build())
+        pos, *rest = self._state
+        item.set_geometry_state((pos + offset, *rest))
+        return item
+
+
+class Clipboard:
+    """ Copied items, shared by all scenes so items can be pasted into another canvas """
+    def __init__(self):
+        self._entries: tuple[ClipboardEntry, ...] = ()
+        self._origin = QPointF()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def copy(self, items: Iterable[SelectableRectItem]) -> None:
+        """ Replaces the clipboard with items. Nothing is copied if items is empty """
+        # Pasted items are stacked in entry order, bottom most first
+        items = sorted(items, key=lambda item: item.zValue())
+        if not items:
+            return
+        bounds = QRectF()
+        for item in items:
+            bounds = bounds.united(item.item.sceneBoundingRect())
+        self._entries = tuple(ClipboardEntry.from_item(item) for item in items)
+        self._origin = bounds.topLeft()
+
+    def paste(self, scene: SelectableScene, pos: QPointF) -> list[SelectableRectItem]:
+        """ Adds new items to scene, the top left corner of the copied items is moved to pos. Undone as one step """
+        offset = pos - self._origin
+        items = [entry.materialize(offset) for entry in self._entries]
+        with scene.undo_stack.macro():
+            for item in items:
+                scene.addItem(item)
+        return items
+
+    def clear(self) -> None:
+        self._entries = ()
+
+
+CLIPBOARD = Clipboard()
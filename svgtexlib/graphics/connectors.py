@@ -0,0 +1,201 @@
+from __future__ import annotations
+from math import hypot
+
+from PyQt6.QtCore import QPointF
+from PyQt6.QtGui import QPainterPath
+from PyQt6.QtWidgets import QGraphicsItem, QGraphicsPathItem
+
+from .wrappers import DeepCopyableItemABC
+from ..drawing.transformation_handlers import TransformationHandler, VertexHandler
+
+
+class ConnectorGraph:
+    """
+    Undirected graph of line segments whose end points are shared vertices. Moving a vertex moves the end of every
+    edge incident to it. Vertex ids are stable and never reused
+    """
+    def __init__(self):
+        self.vertices: dict[int, QPointF] = {}
+        self._adjacency: dict[int, dict[int, None]] = {} # dicts are used as ordered sets, keeping polylines deterministic
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.vertices)
+
+    def add_vertex(self, point: QPointF) -> int:
+        vertex = self._next_id
+        self._next_id += 1
+        self.vertices[vertex] = QPointF(point)
+        self._adjacency[vertex] = {}
+        return vertex
+
+    def add_edge(self, u: int, v: int) -> bool:
+        """ Returns True if the edge was added, self loops and existing edges are ignored """
+        if u == v or v in self._adjacency[u]:
+            return False
+        self._adjacency[u][v] = None
+        self._adjacency[v][u] = None
+        return True
+
+    def remove_vertex(self, vertex: int) -> None:
+        for neighbour in self._adjacency.pop(vertex, {}):
+            self._adjacency[neighbour].pop(vertex, None)
+        self.vertices.pop(vertex, None)
+
+    def move_vertex(self, vertex: int, point: QPointF) -> None:
+        self.vertices[vertex] = QPointF(point)
+
+    def neighbours(self, vertex: int) -> list[int]:
+        return list(self._adjacency[vertex])
+
+    def edges(self) -> list[tuple[int, int]]:
+        return [(u, v) for u, neighbours in self._adjacency.items() for v in neighbours if u < v]
+
+    def vertex_at(self, point: QPointF, radius: float) -> int | None:
+        """ Returns the vertex closest to point within radius """
+        best, best_distance = None, radius
+        for vertex, position in self.vertices.items():
+            distance = hypot(position.x() - point.x(), position.y() - point.y())
+            if distance <= best_distance:
+                best, best_distance = vertex, distance
+        return best
+
+    def polylines(self) -> list[list[int]]:
+        """ Splits the edges into chains of vertices, every edge is part of exactly one chain. Chains start at vertices of
+        odd degree so paths through the diagram are not broken up """
+        unused = {vertex: dict(neighbours) for vertex, neighbours in self._adjacency.items()}
+        odd = [vertex for vertex, neighbours in unused.items() if len(neighbours) % 2 == 1]
+        chains = []
+        for start in odd + list(unused):
+            while unused[start]:
+                chain, vertex = [start], start
+                while unused[vertex]:
+                    neighbour = next(iter(unused[vertex]))
+                    del unused[vertex][neighbour]
+                    del unused[neighbour][vertex]
+                    chain.append(neighbour)
+                    vertex = neighbour
+                chains.append(chain)
+        return chains
+
+    def copy(self) -> ConnectorGraph:
+        graph = ConnectorGraph()
+        graph.vertices = {vertex: QPointF(point) for vertex, point in self.vertices.items()}
+        graph._adjacency = {vertex: dict(neighbours) for vertex, neighbours in self._adjacency.items()}
+        graph._next_id = self._next_id
+        return graph
+
+    @classmethod
+    def from_polylines(cls, polylines: list[list[QPointF]]) -> ConnectorGraph:
+        """ Points with equal coordinates become one shared vertex """
+        graph = cls()
+        ids: dict[tuple[float, float], int] = {}
+        for polyline in polylines:
+            previous = None
+            for point in polyline:
+                key = (point.x(), point.y())
+                if (vertex := ids.get(key)) is None:
+                    vertex = ids[key] = graph.add_vertex(point)
+                if previous is not None:
+                    graph.add_edge(previous, vertex)
+                previous = vertex
+        return graph
+
+
+class DeepCopyableConnectorItem(QGraphicsPathItem, DeepCopyableItemABC):
+    """
+    Connected lines drawn as a single item over a ConnectorGraph. The path is rebuilt in one geometry change when a
+    vertex moves, the decomposition into polylines is only recomputed when edges are added or removed
+    """
+    vertex_handle_size = 8
+
+    def __init__(self, graph: ConnectorGraph | None = None, parent=None):
+        super().__init__(parent)
+        self.graph = graph if graph is not None else ConnectorGraph()
+        self._polylines: list[list[int]] | None = None
+        self._update_path()
+
+    def _update_path(self) -> None:
+        if self._polylines is None:
+            self._polylines = self.graph.polylines()
+        vertices = self.graph.vertices
+        path = QPainterPath()
+        for polyline in self._polylines:
+            path.moveTo(vertices[polyline[0]])
+            for vertex in polyline[1:]:
+                path.lineTo(vertices[vertex])
+        self.setPath(path)
+        # The selectable container derives its bounds from this item
+        notify = getattr(self.parentItem(), "child_geometry_changed", None)
+        if notify is not None:
+            notify()
+
+    def add_vertex(self, point: QPointF) -> int:
+        """ point: position in item coordinates """
+        return self.graph.add_vertex(point)
+
+    def add_edge(self, u: int, v: int) -> None:
+        if self.graph.add_edge(u, v):
+            self._polylines = None
+            self._update_path()
+
+    def remove_vertex(self, vertex: int) -> None:
+        self.graph.remove_vertex(vertex)
+        self._polylines = None
+        self._update_path()
+
+    def move_vertex(self, vertex: int, point: QPointF) -> None:
+        """ Moves vertex and the ends of all its edges. point: position in item coordinates """
+        self.graph.move_vertex(vertex, point)
+        self._update_path()
+
+    def vertex_at(self, point: QPointF, radius: float) -> int | None:
+        """ point: position in item coordinates """
+        return self.graph.vertex_at(point, radius)
+
+    def edge_count(self) -> int:
+        return len(self.graph.edges())
+
+    def scene_vertices(self) -> list[QPointF]:
+        """ Vertices in scene coordinates, used by the scene's snap index """
+        return [self.mapToScene(point) for point in self.graph.vertices.values()]
+
+    def transformation_handlers(self, container: QGraphicsItem) -> list[TransformationHandler]:
+        """ Handlers the selectable container registers before its own, vertices are dragged instead of the container """
+        half = self.vertex_handle_size / 2
+        rect_callback = lambda: container.mapRectFromItem(self, self.boundingRect()).adjusted(-half, -half, half, half)
+        return [VertexHandler(rect_callback, container, self, self.vertex_handle_size)]
+
+    def setBrush(self, *args):
+        """ Connectors are never filled """
+        return
+
+    def to_svg(self, defs: dict) -> str:
+        pen_svg = self.pen_to_svg(self.pen())
+        transform_svg = self.transform_to_svg(self.sceneTransform())
+        vertices = self.graph.vertices
+        if self._polylines is None:
+            self._polylines = self.graph.polylines()
+        polylines_svg = []
+        for polyline in self._polylines:
+            points = " ".join(f"{vertices[vertex].x()} {vertices[vertex].y()}" for vertex in polyline)
+            polylines_svg.append(f'  <polyline points="{points}" style="{pen_svg};fill:none"/>\n')
+        return (f'<g transform="{transform_svg}" metadata-custom-type="DeepCopyableConnectorItem">\n'
+                f'{"".join(polylines_svg)}'
+                f'</g>\n')
+
+    def __deepcopy__(self, memo) -> DeepCopyableConnectorItem:
+        new_item = DeepCopyableConnectorItem(self.graph.copy())
+        new_item.setPen(self.copy_pen(self.pen()))
+        new_item.setTransform(self.transform())
+        new_item.setPos(self.pos())
+        new_item.setZValue(self.zValue())
+        new_item.setVisible(self.isVisible())
+        new_item.setOpacity(self.opacity())
+        new_item.setFlags(self.flags())
+        return new_item
+
+    @classmethod
+    def from_polylines(cls, polylines: list[list[QPointF]]) -> DeepCopyableConnectorItem:
+        """ polylines: points in item coordinates, equal points are joined into shared vertices """
+        return cls(ConnectorGraph.from_polylines(polylines))
@@ -0,0 +1,139 @@
+from __future__ import annotations
+from collections import OrderedDict
+from hashlib import sha1
+import re
+import threading
+from xml.sax.saxutils import quoteattr
+
+from lxml import etree
+
+"""
+Glyph sharing for compiled equations.
+
+Matplotlib embeds the outline of every glyph it uses in a <defs> block of each equation it renders. Equations are
+normalized so that glyph outlines are stored once in a GlyphDictionary, keyed by a hash of their content, and equations
+reference them with <use xlink:href="#glyph-..."/>. When a scene is saved each glyph is written once to the document
+level <defs> block.
+
+Items keep the definitions of the glyphs they reference, the dictionary is only needed to deduplicate new equations. Ids
+are content hashes, so an evicted glyph that is compiled again gets its old id back.
+"""
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+GLYPH_ID_PREFIX = "glyph-"
+
+
+class GlyphDictionary:
+    """ Content addressed store of glyph definitions. Maps glyph id to the svg code of the glyph <path> element.
+    Thread safe, equations are compiled on a worker thread. The least recently used glyphs are evicted beyond max_glyphs """
+    def __init__(self, max_glyphs: int = 10000):
+        self.max_glyphs = max_glyphs
+        self._glyphs: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._glyphs)
+
+    def __contains__(self, glyph_id: str) -> bool:
+        return glyph_id in self._glyphs
+
+    def get(self, glyph_id: str) -> str | None:
+        with self._lock:
+            return self._glyphs.get(glyph_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._glyphs.clear()
+
+    @staticmethod
+    def _attributes(element: etree._Element) -> dict[str, str]:
+        """ Glyph attributes excluding id, with whitespace normalized so identical outlines hash identically """
+        return {k: " ".join(v.split()) for k, v in element.attrib.items() if k != "id" and "}" not in k}
+
+    @staticmethod
+    def _to_svg(glyph_id: str, attributes: dict[str, str]) -> str:
+        attributes_svg = "".join(f" {k}={quoteattr(v)}" for k, v in sorted(attributes.items()))
+        return f'<path id="{glyph_id}"{attributes_svg}/>'
+
+    def _insert(self, glyph_id: str, attributes: dict[str, str]) -> str:
+        """ Stores the glyph unless it is known, returns its svg code """
+        with self._lock:
+            if (svg := self._glyphs.get(glyph_id)) is None:
+                svg = self._glyphs[glyph_id] = self._to_svg(glyph_id, attributes)
+                while len(self._glyphs) > self.max_glyphs:
+                    self._glyphs.popitem(last=False)
+            else:
+                self._glyphs.move_to_end(glyph_id)
+            return svg
+
+    def _add(self, element: etree._Element) -> tuple[str, str]:
+        attributes = self._attributes(element)
+        key = "|".join(f"{k}={v}" for k, v in sorted(attributes.items()))
+        glyph_id = GLYPH_ID_PREFIX + sha1(key.encode("utf-8")).hexdigest()[:16]
+        return glyph_id, self._insert(glyph_id, attributes)
+
+    def add(self, element: etree._Element) -> str:
+        """ Adds glyph <path> element, returns its content hash id """
+        return self._add(element)[0]
+
+    def register(self, element: etree._Element) -> str:
+        """ Adds glyph <path> element read from a saved document, keeping its id """
+        glyph_id = element.attrib["id"]
+        self._insert(glyph_id, self._attributes(element))
+        return glyph_id
+
+    def defs_for(self, glyph_ids) -> dict[str, str]:
+        """ Returns mapping glyph id -> svg code for the known glyphs in glyph_ids """
+        with self._lock:
+            return {glyph_id: svg for glyph_id in glyph_ids if (svg := self._glyphs.get(glyph_id)) is not None}
+
+GLYPHS = GlyphDictionary()
+
+
+def share_glyphs(svg: bytes | str, glyphs: GlyphDictionary = GLYPHS) -> tuple[str, dict[str, str]]:
+    """
+    Moves glyph definitions of svg into glyphs and rewrites references to the shared glyph ids.
+
+    -- Params --
+    svg: svg document, e.g the output of tex2svg
+    returns: (svg document without glyph definitions, mapping of referenced glyph id -> glyph svg code)
+    """
+    root = etree.fromstring(svg.encode("utf-8") if isinstance(svg, str) else svg)
+    renamed: dict[str, str] = {}
+    # Definitions are collected as glyphs are added, a glyph may be evicted by another thread before the end
+    glyph_defs: dict[str, str] = {}
+    for defs in list(root.iter(f"{{{SVG_NS}}}defs")):
+        for path in list(defs.iterchildren(f"{{{SVG_NS}}}path")):
+            old_id = path.get("id")
+            if not old_id:
+                continue
+            glyph_id, glyph_svg = glyphs._add(path)
+            renamed[old_id] = glyph_id
+            glyph_defs[glyph_id] = glyph_svg
+            defs.remove(path)
+        if len(defs) == 0 and (parent := defs.getparent()) is not None:
+            parent.remove(defs)
+
+    for use in root.iter(f"{{{SVG_NS}}}use"):
+        for attr in (XLINK_HREF, "href"):
+            ref = use.get(attr)
+            if ref and ref.startswith("#") and ref[1:] in renamed:
+                use.set(attr, "#" + renamed[ref[1:]])
+    return etree.tostring(root, encoding="unicode"), glyph_defs
+
+
+def referenced_glyphs(svg: str) -> set[str]:
+    """ Returns ids of shared glyphs referenced in svg """
+    return set(re.findall(r'href="#(' + GLYPH_ID_PREFIX + r'[0-9a-f]+)"', svg))
+
+
+def inline_glyphs(svg: str, glyph_defs: dict[str, str]) -> str:
+    """ Inserts glyph_defs into the outermost <svg> element of svg, making it renderable on its own """
+    if not glyph_defs:
+        return svg
+    match = re.search(r'<svg\b[^>]*>', svg)
+    if match is None:
+        return svg
+    defs_svg = "<defs>" + "".join(glyph_defs.values()) + "</defs>"
+    return svg[:match.end()] + defs_svg + svg[match.end():]
@@ -0,0 +1,148 @@
+from __future__ import annotations
+from collections import OrderedDict
+from collections.abc import Callable
+from math import ceil, sqrt
+import weakref
+
+from PyQt6 import sip
+from PyQt6.QtGui import QImage, QPainter, QTransform
+from PyQt6.QtCore import QByteArray, QObject, QRectF, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtSvg import QSvgRenderer
+from PyQt6.QtWidgets import QGraphicsItem
+
+RasterKey = tuple[int, float]
+
+_MAX_REJECTED = 4096 # keys remembered as not rasterizable, oldest are forgotten first
+
+
+class _RasterSignals(QObject):
+    finished = pyqtSignal(object, object) # RasterKey, QImage | None
+
+
+class _RasterTask(QRunnable):
+    """ Renders an svg document to an image on a worker thread. The renderer is created on the worker thread,
+    renderers shared with scene items live on the gui thread and must not be used here """
+    def __init__(self, key: RasterKey, svg: bytes, rect: QRectF, scale: float, signals: _RasterSignals):
+        super().__init__()
+        self.key = key
+        self.svg = svg
+        self.rect = rect
+        self.scale = scale
+        self.signals = signals
+
+    def run(self):
+        renderer = QSvgRenderer(QByteArray(self.svg))
+        width, height = ceil(self.rect.width() * self.scale), ceil(self.rect.height() * self.scale)
+        if not renderer.isValid() or width <= 0 or height <= 0:
+            self.signals.finished.emit(self.key, None)
+            return
+        image = QImage(width, height, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        painter.scale(self.scale, self.scale)
+        renderer.render(painter, QRectF(0, 0, self.rect.width(), self.rect.height()))
+        painter.end()
+        self.signals.finished.emit(self.key, image)
+
+
+class RasterCache(QObject):
+    """
+    Byte budgeted LRU cache of svg content pre-rendered at a given view scale. Paint of a cached item becomes a single
+    image blit. Misses are rasterized on worker threads while the caller falls back to vector rendering, items that
+    requested an image are repainted once it is ready. Keys whose image would not fit the budget, or failed to render,
+    are remembered and not requested again.
+    """
+    def __init__(self, budget_bytes: int = 64 * 1024 * 1024, max_threads: int = 2, parent: QObject | None = None):
+        super().__init__(parent)
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.enabled = True
+        self._images: OrderedDict[RasterKey, QImage] = OrderedDict()
+        self._waiting: dict[RasterKey, list[weakref.ref[QGraphicsItem]]] = {}
+        self._rejected: OrderedDict[RasterKey, None] = OrderedDict()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._signals = _RasterSignals(self)
+        self._signals.finished.connect(self._on_finished)
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    @staticmethod
+    def device_scale(transform: QTransform) -> float | None:
+        """ Returns uniform scale of transform, or None if transform rotates, skews or scales non uniformly """
+        if abs(transform.m12()) > 1e-6 or abs(transform.m21()) > 1e-6:
+            return None
+        sx, sy = abs(transform.m11()), abs(transform.m22())
+        if sx == 0 or abs(sx - sy) > 1e-3 * sx:
+            return None
+        return round(sqrt(sx * sy), 2)
+
+    def get(self, key: RasterKey) -> QImage | None:
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def request(self, key: RasterKey, svg: Callable[[], bytes], rect: QRectF, item: QGraphicsItem) -> None:
+        """
+        Schedule rasterization of an svg document at scale key[1], item is updated when the image is ready
+
+        -- Params --
+        svg: returns the document, only called if the key is not cached, pending or rejected
+        """
+        if key in self._images or key in self._rejected:
+            return
+        waiting = self._waiting.get(key)
+        if waiting is not None:
+            waiting.append(weakref.ref(item))
+            return
+        scale = key[1]
+        if ceil(rect.width() * scale) * ceil(rect.height() * scale) * 4 > self.budget_bytes:
+            self._reject(key)
+            return
+        self._waiting[key] = [weakref.ref(item)]
+        self._pool.start(_RasterTask(key, svg(), QRectF(rect), scale, self._signals))
+
+    def setBudget(self, budget_bytes: int) -> None:
+        self.budget_bytes = budget_bytes
+        self._rejected.clear()
+        self._evict()
+
+    def clear(self) -> None:
+        self._images.clear()
+        self._rejected.clear()
+        self.used_bytes = 0
+
+    def _reject(self, key: RasterKey) -> None:
+        self._rejected[key] = None
+        if len(self._rejected) > _MAX_REJECTED:
+            self._rejected.popitem(last=False)
+
+    def _evict(self) -> None:
+        while self.used_bytes > self.budget_bytes and self._images:
+            _, image = self._images.popitem(last=False)
+            self.used_bytes -= image.sizeInBytes()
+
+    def _on_finished(self, key: RasterKey, image: QImage | None) -> None:
+        waiting = self._waiting.pop(key, [])
+        if image is None or image.sizeInBytes() > self.budget_bytes:
+            self._reject(key)
+            return
+        self._images[key] = image
+        self.used_bytes += image.sizeInBytes()
+        self._evict()
+        for ref in waiting:
+            item = ref()
+            if item is not None and not sip.isdeleted(item):
+                item.update()
+
+_raster_cache: RasterCache | None = None
+
+def raster_cache() -> RasterCache:
+    """ Returns the application wide raster cache, created on first use """
+    global _raster_cache
+    if _raster_cache is None:
+        _raster_cache = RasterCache()
+    return _raster_cache
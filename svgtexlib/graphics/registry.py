@@ -0,0 +1,52 @@
+from __future__ import annotations
+from collections.abc import Iterator
+from typing import Any
+import weakref
+
+from PyQt6 import sip
+
+
+def _alive(ref: weakref.ref) -> Any | None:
+    item = ref()
+    if item is None or sip.isdeleted(item):
+        return None
+    return item
+
+
+class ItemRegistry:
+    """ Insertion ordered set of graphics items holding weak references. Dead items are dropped when encountered """
+    def __init__(self):
+        self._refs: dict[int, weakref.ref] = {}
+
+    def __len__(self) -> int:
+        self._prune()
+        return len(self._refs)
+
+    def __contains__(self, item: Any) -> bool:
+        ref = self._refs.get(id(item))
+        return ref is not None and ref() is item
+
+    def __iter__(self) -> Iterator[Any]:
+        dead = []
+        for key, ref in list(self._refs.items()):
+            if (item := _alive(ref)) is None:
+                dead.append(key)
+                continue
+            yield item
+        for key in dead:
+            self._refs.pop(key, None)
+
+    def _prune(self) -> None:
+        for key in [key for key, ref in self._refs.items() if _alive(ref) is None]:
+            del self._refs[key]
+
+    def add(self, item: Any) -> None:
+        self._refs[id(item)] = weakref.ref(item)
+
+    def discard(self, item: Any) -> None:
+        if item in self:
+            del self._refs[id(item)]
+
+    def clear(self) -> None:
+        self._refs.clear()
+
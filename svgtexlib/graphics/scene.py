@@ -0,0 +1,278 @@
+from __future__ import annotations
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from math import inf
+
+from PyQt6.QtCore import QPointF, QRectF
+from PyQt6.QtGui import QBrush, QPen, QTransform
+from PyQt6.QtWidgets import QGraphicsItem, QGraphicsScene, QGraphicsView
+
+from .glyphs import GLYPHS
+from .registry import ItemRegistry
+from .selectable_rect import SelectableRectItem
+from .snapping import SnapIndex
+from .spatial import SpatialIndex
+from .styles import StyleTable
+from .undo import (AddItemsCommand, GeometryCommand, GroupCommand, RemoveItemsCommand, StyleCommand, TextEditCommand,
+                   UndoStack, UngroupCommand)
+from .wrappers import DeepCopyableItemGroup
+from .zorder import ZOrderIndex
+from ..utils import InteractionMode
+
+
+class SelectableScene(QGraphicsScene):
+    """
+    Scene owning the registries used by SelectableRectItem's. Items register themselves when added to the scene and
+    unregister when removed, registries hold weak references so deleted items are never kept alive.
+
+    The scene also holds the interaction mode. Items consult it when events arrive, so switching tools does not touch
+    the items.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selectable_items = ItemRegistry()
+        self.z_order = ZOrderIndex()
+        self.spatial_index = SpatialIndex()
+        self.snap_index = SnapIndex()
+        self.style_table = StyleTable()
+        self.undo_stack = UndoStack()
+        self.select_enabled = True
+        self._interaction_mode = InteractionMode.Draw
+        # Items of the current drag session by id, None outside of a drag. See begin_drag
+        self._drag_items: dict[int, SelectableRectItem] | None = None
+        self._drag_states: dict[int, tuple] = {} # geometry states of the dragged items when the drag started
+        self._drag_update_modes: list[tuple[QGraphicsView, QGraphicsView.ViewportUpdateMode]] = []
+
+    def interactionMode(self) -> InteractionMode:
+        if not self.select_enabled:
+            return InteractionMode.Draw
+        return self._interaction_mode
+
+    def setInteractionMode(self, mode: InteractionMode | str) -> None:
+        """ mode: InteractionMode or the class name of the active drawing handler, e.g from DrawingController.handler_signal """
+        if isinstance(mode, str):
+            mode = InteractionMode.from_handler(mode)
+        self._interaction_mode = mode
+        self._interaction_mode_changed()
+
+    def _interaction_mode_changed(self) -> None:
+        if self.interactionMode() == InteractionMode.Draw:
+            self.clearSelection()
+        # Selected items draw transformation handles only in select mode
+        for item in self.selectedItems():
+            item.update()
+
+    def register_item(self, item: SelectableRectItem, z: float | None = None) -> None:
+        """ z: z value of item, None stacks item on top """
+        self.selectable_items.add(item)
+        self.z_order.add(item, z)
+        self.spatial_index.insert(item)
+        self.snap_index.insert(item)
+        self.undo_stack.push(AddItemsCommand(self, [item]))
+
+    def unregister_item(self, item: SelectableRectItem) -> None:
+        if self._drag_items is not None:
+            self._drag_items.pop(id(item), None)
+            self._drag_states.pop(id(item), None)
+        if item in self.selectable_items:
+            self.undo_stack.push(RemoveItemsCommand(self, [item]))
+        self.selectable_items.discard(item)
+        self.z_order.remove(item)
+        self.spatial_index.remove(item)
+        self.snap_index.remove(item)
+
+    def item_geometry_changed(self, item: SelectableRectItem) -> None:
+        """ Marks item dirty in the geometry indexes, they are updated by the next query. Items being dragged are
+        updated once the drag ends """
+        if self._drag_items is not None and id(item) in self._drag_items:
+            return
+        self.spatial_index.mark_dirty(item)
+        self.snap_index.mark_dirty(item)
+
+    def begin_drag(self, items: list[SelectableRectItem]) -> None:
+        """
+        Starts a drag session for items. Until end_drag the geometry indexes keep the bounds items had when the drag
+        started, and views repaint the bounding rect of all changes instead of the region of every item
+        """
+        if self._drag_items is not None:
+            self.end_drag()
+        self._drag_items = {id(item): item for item in items}
+        self._drag_states = {key: item.geometry_state() for key, item in self._drag_items.items()}
+        self._drag_update_modes = [(view, view.viewportUpdateMode()) for view in self.views()]
+        for view, _ in self._drag_update_modes:
+            view.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.BoundingRectViewportUpdate)
+
+    def end_drag(self) -> None:
+        """ Ends the drag session, dragged items are reindexed once and their change is recorded for undo """
+        if self._drag_items is None:
+            return
+        items, self._drag_items = list(self._drag_items.values()), None
+        states, self._drag_states = self._drag_states, {}
+        for item in items:
+            self.item_geometry_changed(item)
+        changes = [(item, states[id(item)], item.geometry_state()) for item in items]
+        changes = [change for change in changes if change[1] != change[2]]
+        if changes:
+            changed, old, new = map(list, zip(*changes))
+            self.undo_stack.push(GeometryCommand(self, changed, old, new))
+        for view, mode in self._drag_update_modes:
+            view.setViewportUpdateMode(mode)
+        self._drag_update_modes = []
+
+    def is_dragging(self) -> bool:
+        return self._drag_items is not None
+
+    @contextmanager
+    def batch_update(self, items: list[SelectableRectItem]) -> Iterator[None]:
+        """ Changes made to items inside the block are reindexed once and repainted as one region, see begin_drag.
+        Inside a drag session the session's deferral is used """
+        if self.is_dragging():
+            yield
+            return
+        self.begin_drag(items)
+        try:
+            yield
+        finally:
+            self.end_drag()
+
+    def apply_style(self, items: Iterable, pen: QPen | None = None, brush: QBrush | None = None) -> list[tuple]:
+        """
+        Sets pen and/or brush on every item that supports it, as one batch
+
+        -- Params --
+        items: e.g selectedItems(), items without setPen/setBrush are skipped
+        returns: (item, previous pen, previous brush) for every restyled item, undone by restore_style
+        """
+        record = []
+        # Restyled items share one interned pen and brush
+        pen = self.style_table.pen(pen) if pen is not None else None
+        brush = self.style_table.brush(brush) if brush is not None else None
+        items = [item for item in items if callable(getattr(item, "setPen", None)) or callable(getattr(item, "setBrush", None))]
+        with self.batch_update([item for item in items if isinstance(item, SelectableRectItem)]):
+            for item in items:
+                # Styles live on the wrapped item of selectable containers
+                target = item.item if isinstance(item, SelectableRectItem) else item
+                old_pen = target.pen() if callable(getattr(target, "pen", None)) else None
+                old_brush = target.brush() if callable(getattr(target, "brush", None)) else None
+                if pen is not None and callable(getattr(item, "setPen", None)):
+                    item.setPen(pen)
+                if brush is not None and callable(getattr(item, "setBrush", None)):
+                    item.setBrush(brush)
+                record.append((item, old_pen, old_brush))
+        if record:
+            self.undo_stack.push(StyleCommand(self, record, pen, brush))
+        return record
+
+    def restore_style(self, record: list[tuple]) -> None:
+        """ Reverts apply_style, record: its return value """
+        with self.batch_update([item for item, _, _ in record if isinstance(item, SelectableRectItem)]):
+            for item, pen, brush in record:
+                if pen is not None:
+                    item.setPen(pen)
+                if brush is not None:
+                    item.setBrush(brush)
+
+    def record_text_edit(self, textbox, old: str, new: str) -> None:
+        """ Records an edit of textbox's text for undo, consecutive typing in one textbox is undone as one """
+        if (command := TextEditCommand.from_texts(textbox, old, new)) is not None:
+            self.undo_stack.push(command)
+
+    def clear(self) -> None:
+        super().clear()
+        self.undo_stack.clear()
+        # Items keep the glyphs they reference, the shared dictionary only deduplicates equations compiled later
+        GLYPHS.clear()
+
+    def apply_translation(self, items: Iterable[SelectableRectItem], offset: QPointF) -> None:
+        """ Moves items by offset, as one batch. offset is in scene coordinates """
+        items = list(items)
+        with self.batch_update(items):
+            for item in items:
+                item.setPos(item.pos() + offset)
+
+    def apply_transform(self, items: Iterable[SelectableRectItem], transform: QTransform) -> None:
+        """ Combines transform with the transform of every item, as one batch """
+        items = list(items)
+        with self.batch_update(items):
+            for item in items:
+                item.setTransform(transform, combine=True)
+
+    def group_items(self, items: Iterable) -> SelectableRectItem | None:
+        """ Replaces the SelectableRectItem's in items by one item grouping their contents, keeping their stacking order.
+        Returns the new item, None if fewer than two items were given """
+        items = sorted((item for item in items if isinstance(item, SelectableRectItem)), key=lambda item: item.zValue())
+        if len(items) < 2:
+            return None
+        container = SelectableRectItem(DeepCopyableItemGroup())
+        members = [(item, item.item, QGraphicsItem.pos(item.item), QGraphicsItem.transform(item.item)) for item in items]
+        self.undo_stack.execute(GroupCommand(self, container, members))
+        return container
+
+    def ungroup_item(self, container: SelectableRectItem) -> list[SelectableRectItem]:
+        """ Replaces a grouped item by one SelectableRectItem for every member. Returns the new items """
+        group = container.item
+        if not isinstance(group, DeepCopyableItemGroup):
+            return []
+        transforms = [(item, item.sceneTransform()) for item in group.childItems()]
+        for item, _ in transforms:
+            group.removeFromGroup(item)
+        # Members keep their scene transform in containers placed at the origin
+        members = [(SelectableRectItem(item), item, QPointF(), transform) for item, transform in transforms]
+        self.undo_stack.execute(UngroupCommand(self, container, members))
+        return [member[0] for member in members]
+
+    def top_z_value(self) -> float:
+        """ Returns the z value of the topmost selectable item, 0 for an empty scene. Kept up to date by the z-order index
+        as items are added, removed or restacked, so drawing handlers do not scan the scene """
+        top = self.z_order.max_z()
+        return top if top is not None else 0.0
+
+    def registry_counts(self) -> dict[str, int]:
+        return {"selectable_items": len(self.selectable_items),
+                "z_order": len(self.z_order),
+                "spatial_index": len(self.spatial_index),
+                "snap_index": len(self.snap_index)
+                }
+
+    def selectables_at(self, pos: QPointF) -> list[SelectableRectItem]:
+        """ SelectableRectItem's under pos, topmost first
+        pos: position in scene coordinates """
+        return [item for item in self.spatial_index.items_at(pos) if item.contains(item.mapFromScene(pos))]
+
+    def selectable_at(self, pos: QPointF) -> SelectableRectItem | None:
+        """ Topmost SelectableRectItem under pos, pos is in scene coordinates """
+        items = self.selectables_at(pos)
+        return items[0] if items else None
+
+    def selectables_in(self, rect: QRectF, contained: bool = False) -> list[SelectableRectItem]:
+        """ SelectableRectItem's intersecting rect, or inside rect if contained is set. rect is in scene coordinates """
+        return self.spatial_index.items_in(rect, contained)
+
+    def nearest_selectable(self, pos: QPointF, max_distance: float = inf) -> SelectableRectItem | None:
+        return self.spatial_index.nearest(pos, max_distance)
+
+    def cycle(self, cursor_pos: QPointF):
+        """ Cycle's the z-values of all SelectableRectItem's under cursor
+        cursor_pos: Scene curosr position """
+        items_under_cursor = self.selectables_at(cursor_pos)
+        # Disable selection and hover behaviour while cycling through the items
+        for item in items_under_cursor:
+            item.setSelected(False)
+            item.setAcceptHoverEvents(False)
+
+        values = list(sorted([item.zValue() for item in items_under_cursor], reverse=True))
+        for item in items_under_cursor:
+            old_index = values.index(item.zValue())
+            new_index = (old_index + 1) % len(values)
+            item.setZValue(values[new_index])
+            if values[new_index] == values[0]:
+                item.setSelected(True)
+                item.setAcceptHoverEvents(True)
+        # Enable selection behaviour. The item with the greatest z value will become selected by default
+        for item in items_under_cursor:
+            item.setAcceptHoverEvents(True)
+
+    def toggleSelectEnabled(self):
+        """ Used to toggle the selection behaviour of the scene's items """
+        self.select_enabled = not self.select_enabled
+        self._interaction_mode_changed()
@@ -1,57 +1,109 @@
 from __future__ import annotations
-from typing import OrderedDict
-from collections import OrderedDict
 from copy import deepcopy
 
 from PyQt6.QtGui import QPen, QPainterPath, QTransform
-from PyQt6.QtCore import QPointF, Qt, pyqtBoundSignal, QRectF
+from PyQt6.QtCore import QPointF, Qt, QRectF
 from PyQt6.QtWidgets import QGraphicsItem
 
 from .wrappers import DeepCopyableItemABC, DeepCopyableTextbox
 from ..drawing.transformation_handlers import RotationHandler, TransformationHandler, ScaleHandler
-from ..utils import Handlers, Tools
+from ..utils import InteractionMode, normalize_transform
 
 
 
 
 class SelectableRectItem(QGraphicsItem):
-    """ Selectable container for QGraphicsItems """
+    """ Selectable container for QGraphicsItems. Whether the item can be selected or moved is decided by the
+    interaction mode of its scene when an event arrives, see SelectableScene.interactionMode """
 
-    selectableItems: OrderedDict = OrderedDict()
-    selectEnabled = True
-    last_signal: str = ""
-    selector_name: str | None = None
-
-    def __init__(self, item : DeepCopyableItemABC, select_signal: pyqtBoundSignal | None = None, detection_size: int = 14):
+    def __init__(self, item : DeepCopyableItemABC, detection_size: int = 14):
         """
         item: SelectableRectItem acts as a selectable container for item
-        select_signal: bound signal that emits current handler name
         detection_size: width of square in which mouse events are delegated to its corresponding handler
         """
         super().__init__()
         self._pen = QPen(Qt.GlobalColor.darkBlue, 2, Qt.PenStyle.DashLine)
         self._item = None
         self.detection_size = detection_size
+        # (item bounding rect, handle rects by name), bounding rect. Computed on demand, see _invalidate_geometry
+        self._geometry: tuple[QRectF, dict[str, QRectF]] | None = None
+        self._bounding_rect: QRectF | None = None
         self.item = item
         self.reflected_x = False
         self.reflected_y = False
-        self._id = id(self)
         self._transform = QTransform()
+        # (container, item, combined) transforms at the start of a transform drag, see begin_transform
+        self._transform_origin: tuple[QTransform, QTransform, QTransform] | None = None
+        self._origin_scale = QTransform() # last matrix passed to set_transform_from_origin with scale=True
         self.setAcceptHoverEvents(True)
 
-        self.select_signal = select_signal
-        if select_signal:
-            select_signal.connect(self._toggle_active)
-        self.selectableItems[self._id] = self
-
-    def scene_order(self):
-        for index, key in enumerate(self.selectableItems.keys()):
-            if key == self._id:
-                return index
-        return 0
+        self._stacked = False # True once the item has been placed in a scene's z-order
+        self._active_handler: TransformationHandler | None = None # handler grabbed by the current press
+        # Flags are set once, bypassing setFlag so they are not forwarded to textboxes
+        QGraphicsItem.setFlags(self, self.flags() | QGraphicsItem.GraphicsItemFlag.ItemIsSelectable
+                               | QGraphicsItem.GraphicsItemFlag.ItemIsMovable | QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+
+    def interaction_mode(self) -> InteractionMode:
+        """ Returns the interaction mode of the item's scene. Scenes without one behave as InteractionMode.Select """
+        mode = getattr(self.scene(), "interactionMode", None)
+        return mode() if mode is not None else InteractionMode.Select
+
+    def _invalidate_geometry(self) -> None:
+        """ Drops the cached item and handle geometry. Called after prepareGeometryChange, so Qt still sees the old bounds """
+        self._geometry = None
+        self._bounding_rect = None
+
+    def _geometry_changed(self) -> None:
+        """ Notifies the scene's geometry indexes that the scene bounds of the item changed """
+        notify = getattr(self.scene(), "item_geometry_changed", None)
+        if notify is not None:
+            notify(self)
+
+    def _z_order(self):
+        """ Returns the z-order index of the item's scene, None if the scene does not keep one """
+        return getattr(self.scene(), "z_order", None)
+
+    def scene_order(self) -> int:
+        """ Returns the number of selectable items stacked below this item """
+        z_order = self._z_order()
+        return z_order.rank(self) if z_order is not None and self in z_order else 0
 
     def bring_to_front(self):
-        self.selectableItems.move_to_end(self._id, last=True)
+        if (z_order := self._z_order()) is not None:
+            z_order.bring_to_front(self)
+
+    def send_to_back(self):
+        if (z_order := self._z_order()) is not None:
+            z_order.send_to_back(self)
+
+    def raise_(self):
+        if (z_order := self._z_order()) is not None:
+            z_order.raise_(self)
+
+    def lower(self):
+        if (z_order := self._z_order()) is not None:
+            z_order.lower(self)
+
+    def itemChange(self, change, value):
+        if change == QGraphicsItem.GraphicsItemChange.ItemSelectedChange:
+            if value and self.interaction_mode() == InteractionMode.Draw:
+                return False
+        elif change == QGraphicsItem.GraphicsItemChange.ItemSceneChange:
+            if (unregister := getattr(self.scene(), "unregister_item", None)) is not None:
+                unregister(self)
+        elif change == QGraphicsItem.GraphicsItemChange.ItemSceneHasChanged:
+            if (register := getattr(value, "register_item", None)) is not None:
+                # New items are stacked on top, items returning to a scene (e.g undo) keep their z value
+                register(self, self.zValue() if self._stacked else None)
+                self._stacked = True
+        elif change in (QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged,
+                        QGraphicsItem.GraphicsItemChange.ItemTransformHasChanged):
+            self._geometry_changed()
+        elif change == QGraphicsItem.GraphicsItemChange.ItemZValueHasChanged:
+            # Keep the index in sync with z values set directly, e.g by drawing handlers or cycle
+            if (z_order := self._z_order()) is not None:
+                z_order.update(self, value)
+        return super().itemChange(change, value)
 
     @property
     def item(self) -> DeepCopyableItemABC:
@@ -61,6 +113,9 @@ class SelectableRectItem(QGraphicsItem):
 
     @item.setter
     def item(self, item: DeepCopyableItemABC):
+        if self._item is not None:
+            self.prepareGeometryChange()
+        self._invalidate_geometry()
         self._item = item
         self._item.setParentItem(self)
         self.transformation_handlers: list[TransformationHandler] = self._register_transformation_handlers()
@@ -71,15 +126,17 @@ class SelectableRectItem(QGraphicsItem):
         return self._transform
 
     def _register_transformation_handlers(self) -> list[TransformationHandler]:
-        """ """
+        """ Items may provide handlers of their own, e.g connectors drag their vertices. These are registered first """
+        item_handlers = getattr(self.item, "transformation_handlers", None)
+        handlers = item_handlers(self) if callable(item_handlers) else []
         rotation_handler = RotationHandler(self.rotatingRectIcon, self)
         stretch_handler_top_right = ScaleHandler(self.topRightStretchIcon, self, self.item.boundingRect)
         stretch_handler_top_left = ScaleHandler(self.topLeftStretchIcon, self, self.item.boundingRect)
         stretch_handler_bottom_right = ScaleHandler(self.bottomRightStretchIcon, self, self.item.boundingRect)
         stretch_handler_bottom_left = ScaleHandler(self.bottomLeftStretchIcon, self, self.item.boundingRect)
-        return [rotation_handler, stretch_handler_top_left, stretch_handler_top_right,
-                stretch_handler_bottom_right, stretch_handler_bottom_left,
-                ]
+        return handlers + [rotation_handler, stretch_handler_top_left, stretch_handler_top_right,
+                           stretch_handler_bottom_right, stretch_handler_bottom_left,
+                           ]
 
     def setFlag(self, flag, enabled: bool=True):
         if isinstance(self.item, DeepCopyableTextbox):
@@ -93,25 +150,6 @@ class SelectableRectItem(QGraphicsItem):
     def add_handler(self, handler: TransformationHandler) -> None:
         self.transformation_handlers.append(handler)
 
-    @classmethod
-    def _toggle_active(cls, name: str) -> None:
-        cls.last_signal = name
-        if not cls.selectEnabled:
-            return
-        for item in cls.selectableItems.values():
-            if name == Handlers.Selector.value:
-                item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, True)
-                item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, True)
-                cls.selector_name = name
-            elif name == Tools.Brush.value or name == Tools.Pen.value:
-                item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, True)
-                item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, False)
-                cls.selector_name = name
-            else:
-                item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, False)
-                item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, False)
-                cls.selector_name = None
-
     def setTransform(self, matrix: QTransform, combine=False) -> None:
         if round(matrix.determinant(), 3) != 1:
             self.item.setTransform(matrix, combine=combine)
@@ -119,7 +157,84 @@ class SelectableRectItem(QGraphicsItem):
             QGraphicsItem.setTransform(self, matrix, combine=combine)
         self._transform = matrix * self._transform
         self.prepareGeometryChange()
+        self._invalidate_geometry()
         self.update()
+        self._geometry_changed()
+
+    def begin_transform(self) -> None:
+        """ Records the current transforms as the origin of an interactive transform """
+        self._transform_origin = (QGraphicsItem.transform(self), self.item.transform(), QTransform(self._transform))
+        self._origin_scale = QTransform()
+
+    def set_transform_from_origin(self, matrix: QTransform, scale: bool = False) -> None:
+        """
+        Replaces the transform with matrix applied on top of the transform recorded by begin_transform. Unlike
+        setTransform(matrix, combine=True) repeated calls do not accumulate rounding error
+
+        -- Params --
+        matrix: transform measured from the start of the drag
+        scale: True if matrix is applied to the wrapped item, otherwise it is applied to the container
+        """
+        if self._transform_origin is None:
+            self.begin_transform()
+        container, item, combined = self._transform_origin
+        if scale and getattr(self.item, "combines_transforms", False):
+            # Items that can only be transformed incrementally receive the change since the previous call
+            inverse, _ = self._origin_scale.inverted()
+            self.item.setTransform(matrix * inverse, combine=True)
+            self._origin_scale = QTransform(matrix)
+        elif scale:
+            self.item.setTransform(matrix * item)
+        else:
+            QGraphicsItem.setTransform(self, matrix * container)
+        self._transform = matrix * combined
+        self.prepareGeometryChange()
+        self._invalidate_geometry()
+        self.update()
+        self._geometry_changed()
+
+    def commit_transform(self) -> None:
+        """ Ends an interactive transform, normalizing the resulting matrices """
+        if self._transform_origin is None:
+            return
+        self._transform_origin = None
+        QGraphicsItem.setTransform(self, normalize_transform(QGraphicsItem.transform(self)))
+        if not getattr(self.item, "combines_transforms", False):
+            self.item.setTransform(normalize_transform(self.item.transform()))
+        self._transform = normalize_transform(self._transform)
+        self.prepareGeometryChange()
+        self._invalidate_geometry()
+        self._geometry_changed()
+
+    def geometry_state(self) -> tuple:
+        """ Position and transforms of the item, restored by set_geometry_state. Used by undo """
+        rect = self.item.rect() if getattr(self.item, "combines_transforms", False) and hasattr(self.item, "rect") else None
+        return (self.pos(), QGraphicsItem.transform(self), self.item.transform(), QTransform(self._transform), rect)
+
+    def set_geometry_state(self, state: tuple) -> None:
+        pos, container, item, combined, rect = state
+        self.setPos(pos)
+        QGraphicsItem.setTransform(self, container)
+        if getattr(self.item, "combines_transforms", False):
+            if rect is not None:
+                self.item.setRect(rect)
+            inverse, _ = self.item.transform().inverted()
+            delta = inverse * item
+            if not delta.isIdentity():
+                self.item.setTransform(delta, combine=True)
+        else:
+            self.item.setTransform(item)
+        self._transform = QTransform(combined)
+        self.prepareGeometryChange()
+        self._invalidate_geometry()
+        self.update()
+        self._geometry_changed()
+
+    def child_geometry_changed(self) -> None:
+        """ Called by items whose geometry changes without a transform, e.g when a connector vertex is dragged """
+        self.prepareGeometryChange()
+        self._invalidate_geometry()
+        self._geometry_changed()
 
     def bounding_path(self):
         path = QPainterPath()
@@ -128,7 +243,26 @@ class SelectableRectItem(QGraphicsItem):
             path.addRect(handler.rect)
         return path
 
+    def _cached_geometry(self) -> tuple[QRectF, dict[str, QRectF]]:
+        if self._geometry is None:
+            item_rect = self._item_bounding_rect()
+            size = self.detection_size
+            def handle(center: QPointF) -> QRectF:
+                return QRectF(center.x() - size / 2, center.y() - size / 2, size, size)
+            handles = {"top_center": handle(QPointF(item_rect.center().x(), item_rect.top())),
+                       "rotate": handle(QPointF(item_rect.right(), item_rect.center().y())),
+                       "top_right": handle(item_rect.topRight()),
+                       "top_left": handle(item_rect.topLeft()),
+                       "bottom_right": handle(item_rect.bottomRight()),
+                       "bottom_left": handle(item_rect.bottomLeft())
+                       }
+            self._geometry = (item_rect, handles)
+        return self._geometry
+
     def itemBoundingRect(self):
+        return QRectF(self._cached_geometry()[0])
+
+    def _item_bounding_rect(self):
         """ This default behaviour kinda suck if bouding rect is almost zero in a directino the bounding rect will be wider however the item will be 'stuck' to the side """
         path = QPainterPath()
         bounding_rect = self.item.boundingRect()
@@ -144,40 +278,60 @@ class SelectableRectItem(QGraphicsItem):
     def transformOriginPoint(self):
         return self.item.boundingRect().topLeft()
 
+    def handler_at(self, pos: QPointF) -> TransformationHandler | None:
+        """ Returns the transformation handler whose hit area contains pos, pos is in item coordinates """
+        for handler in self.transformation_handlers:
+            if handler.hit(pos):
+                return handler
+        return None
+
     def mouseMoveEvent(self, event) -> None:
-        self.prepareGeometryChange()
-        self.update()
-        if self.selector_name == Tools.Brush.value or self.selector_name == Tools.Pen.value:
+        if self.interaction_mode() != InteractionMode.Select:
             return
-        for handler in self.transformation_handlers:
-            handler.handle_mouse_move(event)
+        if self._active_handler is not None:
+            self._active_handler.handle_mouse_move(event)
         super().mouseMoveEvent(event)
 
     def mousePressEvent(self, event) -> None:
-        if self.selector_name == Tools.Brush.value or self.selector_name == Tools.Pen.value:
+        mode = self.interaction_mode()
+        if mode == InteractionMode.Draw:
+            # Let the press fall through to the drawing handler
+            event.ignore()
             return
-        for handler in self.transformation_handlers:
-            handler.handle_mouse_press(event)
+        if mode == InteractionMode.Style:
+            return
+        self._active_handler = self.handler_at(event.pos())
+        if self._active_handler is not None:
+            self._active_handler.handle_mouse_press(event)
         super().mousePressEvent(event)
+        if (begin_drag := getattr(self.scene(), "begin_drag", None)) is not None:
+            # Handlers transform this item only, otherwise the whole selection moves with it
+            dragged = [self] if self._active_handler is not None else \
+                      [item for item in self.scene().selectedItems() if isinstance(item, SelectableRectItem)]
+            begin_drag(dragged or [self])
 
     def mouseReleaseEvent(self, event) -> None:
-        for handler in self.transformation_handlers:
+        handler, self._active_handler = self._active_handler, None
+        if handler is not None:
             handler.handle_mouse_release(event)
         super().mouseReleaseEvent(event)
+        if (end_drag := getattr(self.scene(), "end_drag", None)) is not None:
+            end_drag()
 
     # TODO: Match args to abstract class
     def paint(self, painter, option, widget) -> None:
-        if self.flags() & QGraphicsItem.GraphicsItemFlag.ItemIsSelectable == 0 or painter is None:
+        if painter is None or not self.isSelected():
             return
 
-        self.setZValue(self.scene_order())
-        if self.isSelected():
-            painter.setPen(self._pen)
-            painter.drawRect(self.itemBoundingRect())
-            if self.selector_name != Handlers.Selector.value:
-                return
+        painter.setPen(self._pen)
+        painter.drawRect(self.itemBoundingRect())
+        if self.interaction_mode() != InteractionMode.Select:
+            return
 
-            for handler in self.transformation_handlers:
+        for handler in self.transformation_handlers:
+            if callable(paint_handler := getattr(handler, "paint", None)):
+                paint_handler(painter)
+            else:
                 painter.drawRect(handler.rect)
 
     def setBrush(self, *args):
@@ -187,8 +341,18 @@ class SelectableRectItem(QGraphicsItem):
 
     def setPen(self, *args):
         method = getattr(self.item, "setPen", None)
-        if callable(method):
+        if not callable(method):
+            return
+        current = self.item.pen() if callable(getattr(self.item, "pen", None)) else None
+        if current is not None and len(args) == 1 and isinstance(args[0], QPen) and args[0].widthF() == current.widthF():
+            # Same width, the bounds are unchanged
             method(*args)
+            return
+        # The pen width is part of the item's bounding rect
+        self.prepareGeometryChange()
+        method(*args)
+        self._invalidate_geometry()
+        self._geometry_changed()
 
     def setSelected(self, selected):
         if selected:
@@ -196,8 +360,12 @@ class SelectableRectItem(QGraphicsItem):
         super().setSelected(selected)
 
     def hoverEnterEvent(self, event) -> None:
-        if not any([item.isSelected() for item in self.selectableItems.values()]):
-            self.setSelected(True)
+        scene = self.scene()
+        if scene is not None and not any(isinstance(item, SelectableRectItem) for item in scene.selectedItems()):
+            # Of overlapping items only the topmost one under the cursor is selected by hovering
+            selectable_at = getattr(scene, "selectable_at", None)
+            if selectable_at is None or selectable_at(event.scenePos()) is self:
+                self.setSelected(True)
         super().hoverEnterEvent(event)
 
     def hoverLeaveEvent(self, event) -> None:
@@ -205,86 +373,32 @@ class SelectableRectItem(QGraphicsItem):
         super().hoverLeaveEvent(event)
 
     def boundingRect(self):
-        path = QPainterPath()
-        path.addRect(self.itemBoundingRect())
-        for handler in self.transformation_handlers:
-            path.addRect(handler.rect)
-        return path.boundingRect()
+        if self._bounding_rect is None:
+            rect = self.itemBoundingRect()
+            for handler in self.transformation_handlers:
+                rect = rect.united(handler.rect)
+            self._bounding_rect = rect
+        return QRectF(self._bounding_rect)
 
     def testIcon(self):
-        handle_size = 14
-        item_boundingRect = self.itemBoundingRect()
-        center = QPointF(item_boundingRect.center().x(), item_boundingRect.topLeft().y())
-        return QRectF(center.x() - handle_size / 2, center.y() - handle_size / 2, handle_size, handle_size)
+        return QRectF(self._cached_geometry()[1]["top_center"])
 
     def rotatingRectIcon(self):
-        handle_size = 14 # TODO: make this more dynamic
-        item_boundingRect = self.itemBoundingRect()
-        center_right = QPointF(item_boundingRect.right(), item_boundingRect.center().y())
-        return QRectF(center_right.x() - handle_size / 2, center_right.y() - handle_size / 2, handle_size, handle_size )
+        return QRectF(self._cached_geometry()[1]["rotate"])
 
     def topRightStretchIcon(self):
-        handle_size = 14
-        item_boundingRect = self.itemBoundingRect()
-        top_right = QPointF(item_boundingRect.right(), item_boundingRect.top())
-        return QRectF(top_right.x() - handle_size / 2, top_right.y() - handle_size / 2, handle_size, handle_size)
+        return QRectF(self._cached_geometry()[1]["top_right"])
 
     def topLeftStretchIcon(self):
-        handle_size = 14
-        item_boundingRect = self.itemBoundingRect()
-        top_left = QPointF(item_boundingRect.left(), item_boundingRect.top())
-        return QRectF(top_left.x() - handle_size / 2, top_left.y() - handle_size / 2, handle_size, handle_size)
+        return QRectF(self._cached_geometry()[1]["top_left"])
 
     def bottomRightStretchIcon(self):
-        handle_size = 14
-        item_boundingRect = self.itemBoundingRect()
-        bottom_right = QPointF(item_boundingRect.right(), item_boundingRect.bottom())
-        return QRectF(bottom_right.x() - handle_size / 2, bottom_right.y() - handle_size / 2, handle_size, handle_size)
+        return QRectF(self._cached_geometry()[1]["bottom_right"])
 
     def bottomLeftStretchIcon(self):
-        handle_size = 14
-        item_boundingRect = self.itemBoundingRect()
-        bottom_left = QPointF(item_boundingRect.left(), item_boundingRect.bottom())
-        return QRectF(bottom_left.x() - handle_size / 2, bottom_left.y() - handle_size / 2, handle_size, handle_size)
-
-    @classmethod
-    def cycle(cls, cursor_pos: QPointF):
-        """ Cycle's the z-values of all QSelectableItems under cursor
-        cursor_pos: Scene curosr position """
-        items_under_cursor = list(filter(lambda item: item.boundingRect().contains(cursor_pos), cls.selectableItems.values()))
-        # Disable selection and hover behaviour while cycling through the items
-        for item in items_under_cursor:
-            item.setSelected(False)
-            item.setAcceptHoverEvents(False)
-
-        values = list(sorted([item.zValue() for item in items_under_cursor], reverse=True))
-        for item in items_under_cursor:
-            old_index = values.index(item.zValue())
-            new_index = (old_index + 1) % len(values)
-            item.setZValue(values[new_index])
-            if values[new_index] == values[0]:
-                item.setSelected(True)
-                item.setAcceptHoverEvents(True)
-        # Enable selection behaviour. The item with the greatest z value will become selected by default
-        for item in items_under_cursor:
-            item.setAcceptHoverEvents(True)
-
-    @classmethod
-    def toggleEnabled(cls):
-        """ Used to toggle the class selection behaviour """
-        cls.selectEnabled = not cls.selectEnabled
-        if cls.selectEnabled:
-            cls._toggle_active(cls.last_signal)
-        else:
-            # Disable selection behaviour
-            for item in cls.selectableItems.values():
-                item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, False)
-                item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, False)
+        return QRectF(self._cached_geometry()[1]["bottom_left"])
 
     def __deepcopy__(self, memo) -> SelectableRectItem:
-        copy_item = SelectableRectItem(deepcopy(self.item), select_signal=self.select_signal)
-        SelectableRectItem._toggle_active(SelectableRectItem.last_signal)
-        return copy_item
-
-    def __del__(self):
-        del self.selectableItems[self._id]
+        new_item = SelectableRectItem(deepcopy(self.item))
+        new_item.set_geometry_state(self.geometry_state())
+        return new_item
@@ -0,0 +1,165 @@
+from __future__ import annotations
+from collections.abc import Callable
+from math import floor, hypot
+from typing import Any
+import weakref
+
+from PyQt6 import sip
+from PyQt6.QtCore import QPointF
+from PyQt6.QtWidgets import QGraphicsLineItem
+
+Cell = tuple[int, int]
+
+
+def line_endpoints(item: Any) -> list[QPointF]:
+    """ Returns the end points of a line like item in scene coordinates, empty for other items. Selectable containers
+    are unwrapped, connectors return all of their vertices """
+    item = getattr(item, "item", item)
+    if callable(scene_vertices := getattr(item, "scene_vertices", None)):
+        return scene_vertices()
+    if not isinstance(item, QGraphicsLineItem):
+        return []
+    line = item.line()
+    return [item.mapToScene(line.p1()), item.mapToScene(line.p2())]
+
+
+class SnapIndex:
+    """
+    Uniform grid over the end points of line like items, used to snap new lines onto existing ones. Nearest within
+    radius queries inspect the cells around the query point only, O(1) expected for radius <= cell_size.
+
+    Items whose end points change are marked dirty and re-indexed by the next query. Items are held by weak references.
+    The index also answers which items share an end point, i.e the end point graph of the scene.
+    """
+    def __init__(self, endpoints: Callable[[Any], list[QPointF]] = line_endpoints, cell_size: float = 16.0):
+        """
+        endpoints: returns the points of an item in scene coordinates, items without points are not indexed
+        """
+        self.endpoints = endpoints
+        self.cell_size = cell_size
+        self._cells: dict[Cell, dict[int, list[QPointF]]] = {}
+        self._owners: dict[int, tuple[weakref.ref, list[tuple[Cell, QPointF]]]] = {}
+        self._dirty: dict[int, weakref.ref] = {}
+
+    def __len__(self) -> int:
+        """ Number of indexed points """
+        self.flush()
+        return sum(len(points) for _, points in self._owners.values())
+
+    def __contains__(self, item: Any) -> bool:
+        entry = self._owners.get(id(item))
+        return entry is not None and entry[0]() is item
+
+    def _cell(self, point: QPointF) -> Cell:
+        return floor(point.x() / self.cell_size), floor(point.y() / self.cell_size)
+
+    def _place(self, key: int, ref: weakref.ref, points: list[QPointF]) -> None:
+        if not points:
+            return
+        placed = []
+        for point in points:
+            cell = self._cell(point)
+            self._cells.setdefault(cell, {}).setdefault(key, []).append(point)
+            placed.append((cell, point))
+        self._owners[key] = (ref, placed)
+
+    def _unplace(self, key: int) -> None:
+        entry = self._owners.pop(key, None)
+        if entry is None:
+            return
+        for cell, _ in entry[1]:
+            owners = self._cells.get(cell)
+            if owners is None:
+                continue
+            owners.pop(key, None)
+            if not owners:
+                del self._cells[cell]
+
+    def insert(self, item: Any) -> None:
+        key = id(item)
+        self._unplace(key)
+        self._dirty.pop(key, None)
+        self._place(key, weakref.ref(item), self.endpoints(item))
+
+    def remove(self, item: Any) -> None:
+        key = id(item)
+        self._dirty.pop(key, None)
+        self._unplace(key)
+
+    def mark_dirty(self, item: Any) -> None:
+        """ Records that the end points of item moved, the index is updated by the next query """
+        key = id(item)
+        if key in self._owners:
+            self._dirty[key] = self._owners[key][0]
+
+    def flush(self) -> None:
+        dirty, self._dirty = self._dirty, {}
+        for key, ref in dirty.items():
+            self._unplace(key)
+            item = ref()
+            if item is not None and not sip.isdeleted(item):
+                self._place(key, ref, self.endpoints(item))
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._owners.clear()
+        self._dirty.clear()
+
+    def _within(self, pos: QPointF, radius: float):
+        """ Yields (distance, owner key, point) for every indexed point within radius of pos """
+        self.flush()
+        size = self.cell_size
+        min_col, min_row = floor((pos.x() - radius) / size), floor((pos.y() - radius) / size)
+        max_col, max_row = floor((pos.x() + radius) / size), floor((pos.y() + radius) / size)
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                owners = self._cells.get((col, row))
+                if not owners:
+                    continue
+                for key, points in list(owners.items()):
+                    for point in points:
+                        distance = hypot(point.x() - pos.x(), point.y() - pos.y())
+                        if distance < radius:
+                            yield distance, key, point
+
+    def _item(self, key: int) -> Any | None:
+        entry = self._owners.get(key)
+        item = entry[0]() if entry is not None else None
+        if item is None or sip.isdeleted(item):
+            self._unplace(key)
+            return None
+        return item
+
+    def nearest(self, pos: QPointF, radius: float, exclude: Any | None = None) -> QPointF | None:
+        """
+        Returns the indexed point closest to pos within radius, None if there is none
+
+        exclude: item whose points are ignored
+        """
+        best, best_distance = None, radius
+        excluded = id(exclude) if exclude is not None else None
+        for distance, key, point in self._within(pos, radius):
+            if key != excluded and distance < best_distance and self._item(key) is not None:
+                best, best_distance = point, distance
+        return QPointF(best) if best is not None else None
+
+    def items_at(self, pos: QPointF, radius: float) -> list[Any]:
+        """ Returns the items with an end point within radius of pos """
+        items = {}
+        for _, key, _ in self._within(pos, radius):
+            if key not in items and (item := self._item(key)) is not None:
+                items[key] = item
+        return list(items.values())
+
+    def connected(self, item: Any, tolerance: float = 0.5) -> list[Any]:
+        """ Returns the items sharing an end point with item, its neighbours in the end point graph """
+        self.flush()
+        entry = self._owners.get(id(item))
+        if entry is None:
+            return []
+        neighbours = {}
+        for _, point in entry[1]:
+            for other in self.items_at(point, tolerance):
+                if other is not item:
+                    neighbours[id(other)] = other
+        return list(neighbours.values())
@@ -0,0 +1,217 @@
+from __future__ import annotations
+from collections import defaultdict
+from math import floor, hypot, inf
+from typing import Any
+import weakref
+
+from PyQt6 import sip
+from PyQt6.QtCore import QPointF, QRectF
+
+CellRange = tuple[int, int, int, int] # min column, min row, max column, max row
+
+
+def rect_distance(rect: QRectF, point: QPointF) -> float:
+    """ Distance from point to the closest point of rect, 0 if rect contains point """
+    dx = max(rect.left() - point.x(), 0.0, point.x() - rect.right())
+    dy = max(rect.top() - point.y(), 0.0, point.y() - rect.bottom())
+    return hypot(dx, dy)
+
+
+class SpatialIndex:
+    """
+    Uniform grid over the scene bounding rects of items, answering point, rect and nearest queries in scene coordinates.
+    Items spanning more than max_cells cells are kept in a separate list instead of being added to every cell.
+
+    Geometry changes are cheap: mark_dirty only records the item, bounds are recomputed by the next query. Items are
+    held by weak references.
+    """
+    def __init__(self, cell_size: float = 64.0, max_cells: int = 256):
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self._cells: defaultdict[tuple[int, int], set[int]] = defaultdict(set)
+        self._entries: dict[int, tuple[weakref.ref, QRectF, CellRange | None]] = {}
+        self._oversized: set[int] = set()
+        self._dirty: dict[int, weakref.ref] = {}
+        self._extent: CellRange | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, item: Any) -> bool:
+        entry = self._entries.get(id(item))
+        return entry is not None and entry[0]() is item
+
+    def _cell_range(self, rect: QRectF) -> CellRange:
+        size = self.cell_size
+        return (floor(rect.left() / size), floor(rect.top() / size), floor(rect.right() / size), floor(rect.bottom() / size))
+
+    def _place(self, key: int, ref: weakref.ref, rect: QRectF) -> None:
+        cells = self._cell_range(rect)
+        min_col, min_row, max_col, max_row = cells
+        if (max_col - min_col + 1) * (max_row - min_row + 1) > self.max_cells:
+            self._entries[key] = (ref, rect, None)
+            self._oversized.add(key)
+            return
+        self._entries[key] = (ref, rect, cells)
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                self._cells[(col, row)].add(key)
+        if self._extent is None:
+            self._extent = cells
+        else:
+            e = self._extent
+            self._extent = (min(e[0], min_col), min(e[1], min_row), max(e[2], max_col), max(e[3], max_row))
+
+    def _unplace(self, key: int) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        cells = entry[2]
+        if cells is None:
+            self._oversized.discard(key)
+            return
+        min_col, min_row, max_col, max_row = cells
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                cell = self._cells.get((col, row))
+                if cell is not None:
+                    cell.discard(key)
+                    if not cell:
+                        del self._cells[(col, row)]
+
+    def insert(self, item: Any) -> None:
+        key = id(item)
+        self._unplace(key)
+        self._dirty.pop(key, None)
+        self._place(key, weakref.ref(item), item.sceneBoundingRect())
+
+    def remove(self, item: Any) -> None:
+        key = id(item)
+        self._dirty.pop(key, None)
+        self._unplace(key)
+
+    def mark_dirty(self, item: Any) -> None:
+        """ Records that the scene bounds of item changed, the index is updated by the next query """
+        key = id(item)
+        if key in self._entries:
+            self._dirty[key] = self._entries[key][0]
+
+    def flush(self) -> None:
+        """ Updates the bounds of items marked dirty. Items whose cells did not change are not moved """
+        dirty, self._dirty = self._dirty, {}
+        for key, ref in dirty.items():
+            item = self._alive(key, ref)
+            if item is None:
+                continue
+            rect = item.sceneBoundingRect()
+            entry = self._entries[key]
+            if entry[2] is not None and entry[2] == self._cell_range(rect):
+                self._entries[key] = (ref, rect, entry[2])
+                continue
+            self._unplace(key)
+            self._place(key, ref, rect)
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._entries.clear()
+        self._oversized.clear()
+        self._dirty.clear()
+        self._extent = None
+
+    def _alive(self, key: int, ref: weakref.ref) -> Any | None:
+        item = ref()
+        if item is None or sip.isdeleted(item):
+            self._unplace(key)
+            return None
+        return item
+
+    def _candidates(self, cells: CellRange) -> set[int]:
+        min_col, min_row, max_col, max_row = cells
+        keys = set(self._oversized)
+        if (max_col - min_col + 1) * (max_row - min_row + 1) > len(self._cells):
+            # Query covers more cells than are occupied
+            for (col, row), cell in self._cells.items():
+                if min_col <= col <= max_col and min_row <= row <= max_row:
+                    keys |= cell
+            return keys
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                cell = self._cells.get((col, row))
+                if cell:
+                    keys |= cell
+        return keys
+
+    def _resolve(self, keys, predicate) -> list[Any]:
+        items = []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None or not predicate(entry[1]):
+                continue
+            if (item := self._alive(key, entry[0])) is not None:
+                items.append(item)
+        return items
+
+    def items_at(self, point: QPointF) -> list[Any]:
+        """ Items whose scene bounding rect contains point, topmost first """
+        self.flush()
+        size = self.cell_size
+        col, row = floor(point.x() / size), floor(point.y() / size)
+        items = self._resolve(self._candidates((col, row, col, row)), lambda rect: rect.contains(point))
+        items.sort(key=lambda item: item.zValue(), reverse=True)
+        return items
+
+    def items_in(self, rect: QRectF, contained: bool = False) -> list[Any]:
+        """
+        Items whose scene bounding rect intersects rect, topmost first
+
+        contained: only return items whose scene bounding rect lies inside rect
+        """
+        self.flush()
+        predicate = rect.contains if contained else rect.intersects
+        items = self._resolve(self._candidates(self._cell_range(rect)), predicate)
+        items.sort(key=lambda item: item.zValue(), reverse=True)
+        return items
+
+    def nearest(self, point: QPointF, max_distance: float = inf) -> Any | None:
+        """ Returns the item whose scene bounding rect is closest to point, None if no item is within max_distance """
+        self.flush()
+        best, best_distance = None, max_distance
+        for key in list(self._oversized):
+            ref, rect, _ = self._entries[key]
+            distance = rect_distance(rect, point)
+            if distance <= best_distance and (item := self._alive(key, ref)) is not None:
+                best, best_distance = item, distance
+
+        if self._extent is None:
+            return best
+        size = self.cell_size
+        col, row = floor(point.x() / size), floor(point.y() / size)
+        min_col, min_row, max_col, max_row = self._extent
+        max_ring = max(col - min_col, max_col - col, row - min_row, max_row - row, 0)
+        seen: set[int] = set()
+        for ring in range(max_ring + 1):
+            # Every cell of this ring is at least (ring - 1) * size away from point
+            if (ring - 1) * size > best_distance:
+                break
+            for cell in self._ring(col, row, ring):
+                for key in list(self._cells.get(cell, ())):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    ref, rect, _ = self._entries[key]
+                    distance = rect_distance(rect, point)
+                    if distance <= best_distance and (item := self._alive(key, ref)) is not None:
+                        best, best_distance = item, distance
+        return best
+
+    @staticmethod
+    def _ring(col: int, row: int, ring: int):
+        if ring == 0:
+            yield (col, row)
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield (c, row - ring)
+            yield (c, row + ring)
+        for r in range(row - ring + 1, row + ring):
+            yield (col - ring, r)
+            yield (col + ring, r)
@@ -0,0 +1,248 @@
+from __future__ import annotations
+from math import hypot
+
+import numpy as np
+from PyQt6.QtCore import QPointF, QRectF, Qt
+from PyQt6.QtGui import QPainterPath, QPen, QPolygonF
+from PyQt6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+
+class LiveStrokeItem(QGraphicsItem):
+    """
+    Non interactive item displaying a freehand stroke while it is drawn. Appending a point only repaints the new
+    segment: points are kept in chunks with their own bounds so paint skips chunks outside the exposed rect, and the
+    bounding rect grows with a doubling margin so geometry changes, which repaint the whole item, stay rare.
+
+    Finalize with path() once the stroke is done.
+    """
+    chunk_size = 64 # segments per chunk
+    initial_margin = 128.0
+
+    def __init__(self, start: QPointF, pen: QPen, parent=None):
+        super().__init__(parent)
+        self._pen = QPen(pen)
+        # Chunk bounds include the pen width, so horizontal and vertical segments have non empty bounds
+        self._chunks: list[tuple[QPolygonF, QRectF]] = [(QPolygonF([QPointF(start)]), self._pad(QRectF(start, start), self._pen_margin()))]
+        self._last = QPointF(start)
+        self._length = 0.0
+        self._count = 1
+        self._margin = self.initial_margin
+        self._bounds = self._pad(QRectF(start, start), self._margin)
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+        self.setAcceptHoverEvents(False)
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+
+    def _pad(self, rect: QRectF, margin: float) -> QRectF:
+        return rect.adjusted(-margin, -margin, margin, margin)
+
+    def _pen_margin(self) -> float:
+        return max(self._pen.widthF(), 1.0)
+
+    def append(self, point: QPointF) -> None:
+        """ Adds a segment from the last point to point. point: position in item coordinates """
+        if point == self._last:
+            return
+        segment = self._pad(QRectF(self._last, point).normalized(), self._pen_margin())
+        polygon, rect = self._chunks[-1]
+        if polygon.size() > self.chunk_size:
+            # Chunks share their end points so the stroke stays connected
+            self._chunks.append((QPolygonF([self._last, QPointF(point)]), segment))
+        else:
+            polygon.append(QPointF(point))
+            self._chunks[-1] = (polygon, rect.united(segment))
+        self._length += hypot(point.x() - self._last.x(), point.y() - self._last.y())
+        self._count += 1
+        self._last = QPointF(point)
+
+        if not self._bounds.contains(segment):
+            self.prepareGeometryChange()
+            self._margin *= 2
+            self._bounds = self._pad(self._bounds.united(segment), self._margin)
+        self.update(segment)
+
+    def length(self) -> float:
+        return self._length
+
+    def point_count(self) -> int:
+        return self._count
+
+    def points(self) -> list[QPointF]:
+        points = []
+        for i, (polygon, _) in enumerate(self._chunks):
+            # Every chunk after the first starts with the last point of the previous one
+            points.extend(QPointF(polygon.at(j)) for j in range(1 if i else 0, polygon.size()))
+        return points
+
+    def path(self) -> QPainterPath:
+        """ Returns the stroke as a path of line segments """
+        points = self.points()
+        path = QPainterPath(points[0])
+        for point in points[1:]:
+            path.lineTo(point)
+        return path
+
+    def boundingRect(self) -> QRectF:
+        return self._bounds
+
+    def paint(self, painter, option: QStyleOptionGraphicsItem, widget=None) -> None:
+        if painter is None:
+            return
+        painter.setPen(self._pen)
+        exposed = option.exposedRect if option is not None else self._bounds
+        for polygon, rect in self._chunks:
+            if exposed.intersects(rect):
+                painter.drawPolyline(polygon)
+
+
+def rdp_mask(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Ramer-Douglas-Peucker decimation. Distances of a whole span to its chord are computed at once.
+
+    -- Params --
+    points: array of shape (n, 2)
+    tolerance: maximum distance of a dropped point to the simplified polyline
+    returns: boolean mask of the points to keep, the end points are always kept
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        span = points[start + 1:end] - a
+        chord = b - a
+        norm = hypot(chord[0], chord[1])
+        if norm == 0:
+            distances = np.hypot(span[:, 0], span[:, 1])
+        else:
+            distances = np.abs(chord[0] * span[:, 1] - chord[1] * span[:, 0]) / norm
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    norm = hypot(vector[0], vector[1])
+    return vector / norm if norm else vector
+
+def _bezier(ctrl: np.ndarray, t: np.ndarray) -> np.ndarray:
+    mt = 1 - t
+    return ((mt ** 3)[:, None] * ctrl[0] + (3 * mt ** 2 * t)[:, None] * ctrl[1]
+            + (3 * mt * t ** 2)[:, None] * ctrl[2] + (t ** 3)[:, None] * ctrl[3])
+
+def _chord_parameters(points: np.ndarray) -> np.ndarray:
+    lengths = np.hypot(*np.diff(points, axis=0).T)
+    u = np.concatenate(([0.0], np.cumsum(lengths)))
+    return u / u[-1] if u[-1] else np.linspace(0, 1, len(points))
+
+def _generate_bezier(points: np.ndarray, u: np.ndarray, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """ Least squares cubic through points with fixed end points and end tangent directions """
+    first, last = points[0], points[-1]
+    mt = 1 - u
+    a1 = (3 * mt ** 2 * u)[:, None] * left
+    a2 = (3 * mt * u ** 2)[:, None] * right
+    c00, c01, c11 = np.sum(a1 * a1), np.sum(a1 * a2), np.sum(a2 * a2)
+    rest = points - _bezier(np.array([first, first, last, last]), u)
+    x0, x1 = np.sum(a1 * rest), np.sum(a2 * rest)
+    det = c00 * c11 - c01 * c01
+    length = hypot(*(last - first))
+    alpha_left = alpha_right = length / 3
+    if abs(det) > 1e-12:
+        alpha_left, alpha_right = (x0 * c11 - x1 * c01) / det, (c00 * x1 - c01 * x0) / det
+        if alpha_left < 1e-6 * length or alpha_right < 1e-6 * length:
+            alpha_left = alpha_right = length / 3
+    return np.array([first, first + left * alpha_left, last + right * alpha_right, last])
+
+def _reparameterize(ctrl: np.ndarray, points: np.ndarray, u: np.ndarray) -> np.ndarray:
+    """ One Newton-Raphson step moving every parameter towards the closest point of the curve """
+    d1 = 3 * (ctrl[1:] - ctrl[:-1])
+    d2 = 2 * (d1[1:] - d1[:-1])
+    mt = 1 - u
+    first = (mt ** 2)[:, None] * d1[0] + (2 * mt * u)[:, None] * d1[1] + (u ** 2)[:, None] * d1[2]
+    second = mt[:, None] * d2[0] + u[:, None] * d2[1]
+    diff = _bezier(ctrl, u) - points
+    numerator = np.sum(diff * first, axis=1)
+    denominator = np.sum(first * first, axis=1) + np.sum(diff * second, axis=1)
+    safe = np.where(denominator != 0, denominator, 1)
+    return np.clip(np.where(denominator != 0, u - numerator / safe, u), 0, 1)
+
+def _max_error(ctrl: np.ndarray, points: np.ndarray, u: np.ndarray) -> tuple[float, int]:
+    errors = np.sum((_bezier(ctrl, u) - points) ** 2, axis=1)
+    index = int(np.argmax(errors))
+    return float(errors[index]), index
+
+def _fit_cubic(points: np.ndarray, left: np.ndarray, right: np.ndarray, tolerance: float, curves: list[np.ndarray]) -> None:
+    """ Schneider's algorithm, splitting at the point of maximum error until every curve is within tolerance """
+    if len(points) == 2:
+        third = hypot(*(points[1] - points[0])) / 3
+        curves.append(np.array([points[0], points[0] + left * third, points[1] + right * third, points[1]]))
+        return
+    u = _chord_parameters(points)
+    ctrl = _generate_bezier(points, u, left, right)
+    error, split = _max_error(ctrl, points, u)
+    if error > tolerance ** 2 and error < (4 * tolerance) ** 2:
+        for _ in range(4):
+            u = _reparameterize(ctrl, points, u)
+            ctrl = _generate_bezier(points, u, left, right)
+            error, split = _max_error(ctrl, points, u)
+            if error <= tolerance ** 2:
+                break
+    if error <= tolerance ** 2:
+        curves.append(ctrl)
+        return
+    split = min(max(split, 1), len(points) - 2)
+    # Tangent over a few samples on each side, a single pixel step is dominated by sampling noise
+    center = _unit(points[max(split - 3, 0)] - points[min(split + 3, len(points) - 1)])
+    _fit_cubic(points[:split + 1], left, center, tolerance, curves)
+    _fit_cubic(points[split:], -center, right, tolerance, curves)
+
+def fit_stroke(points: list[QPointF], tolerance: float, corner_cos: float = 0.5) -> list[np.ndarray]:
+    """
+    Decimates points with Ramer-Douglas-Peucker and fits cubic Bézier curves between the corners of the decimated
+    polyline, so corners are not rounded off. End tangents are taken from the decimated polyline
+
+    -- Params --
+    points: stroke samples
+    tolerance: maximum deviation of the fitted curves from the samples, in the units of points
+    corner_cos: vertices where the cosine of the angle between the incoming and outgoing direction is below this are corners
+    returns: list of control point arrays of shape (4, 2), each curve starts where the previous one ends
+    """
+    array = np.array([(point.x(), point.y()) for point in points], dtype=float)
+    if len(array) > 1:
+        # Repeated samples have no direction
+        distinct = np.concatenate(([True], np.any(np.diff(array, axis=0) != 0, axis=1)))
+        array = array[distinct]
+    if len(array) < 2:
+        return []
+    kept = np.nonzero(rdp_mask(array, tolerance))[0]
+    if len(kept) == 2 and np.array_equal(array[kept[0]], array[kept[1]]):
+        # A loop smaller than tolerance decimates to its coincident end points, keep the sample farthest from them
+        farthest = int(np.argmax(np.hypot(array[:, 0] - array[0, 0], array[:, 1] - array[0, 1])))
+        kept = np.array([0, farthest, len(array) - 1])
+
+    # Corners are found on the decimated polyline, where sampling noise has been removed
+    directions = np.diff(array[kept], axis=0)
+    directions /= np.hypot(directions[:, 0], directions[:, 1])[:, None]
+    turns = np.sum(directions[:-1] * directions[1:], axis=1)
+    corners = [0, *(np.nonzero(turns < corner_cos)[0] + 1), len(kept) - 1]
+
+    # Curves are fitted to the samples between corners, so they can not drift between the decimated points
+    curves: list[np.ndarray] = []
+    for start, end in zip(corners, corners[1:]):
+        run = array[kept[start]:kept[end] + 1]
+        _fit_cubic(run, directions[start], -directions[end - 1], tolerance, curves)
+    return curves
+
+def curves_to_path(curves: list[np.ndarray]) -> QPainterPath:
+    path = QPainterPath()
+    if not curves:
+        return path
+    path.moveTo(*curves[0][0])
+    for ctrl in curves:
+        path.cubicTo(*ctrl[1], *ctrl[2], *ctrl[3])
+    return path
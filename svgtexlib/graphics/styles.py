@@ -0,0 +1,86 @@
+from __future__ import annotations
+from collections.abc import Callable
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QBrush, QPen
+
+"""
+Shared pens and brushes.
+
+Most items of a drawing use one of a handful of styles. A StyleTable interns them: equal styles map to one QPen or
+QBrush, and items given an interned style share its data through Qt's implicit sharing instead of holding a copy each.
+Restyling an item replaces its style, the shared one is never modified (copy on write). The svg code of a style is
+computed once per style when a scene is saved.
+
+Every scene owns a table, which is dropped with the scene. Styles of items outside of a scene are not interned, copies
+of an item share the data of its styles.
+"""
+
+# Brush styles described by color and style alone, gradients and textures carry more data and are not interned
+_PLAIN_BRUSH_STYLES = {style for style in Qt.BrushStyle if style.value <= Qt.BrushStyle.DiagCrossPattern.value}
+
+
+class StyleTable:
+    """ Interned pens and brushes, and memoized svg code for them. Interned styles must not be modified """
+    def __init__(self):
+        self._pens: dict[tuple, QPen] = {}
+        self._brushes: dict[tuple, QBrush] = {}
+        self._pen_svg: dict[tuple, str] = {}
+        self._brush_svg: dict[tuple, tuple[str, dict[str, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pens) + len(self._brushes)
+
+    @staticmethod
+    def pen_key(pen: QPen) -> tuple | None:
+        """ Returns a hashable description of pen, None if pen is painted with a gradient or texture """
+        brush = pen.brush()
+        if brush.style() not in _PLAIN_BRUSH_STYLES or not brush.transform().isIdentity():
+            return None
+        return (brush.color().rgba(), brush.style(), pen.widthF(), pen.style(), pen.capStyle(), pen.joinStyle(),
+                tuple(pen.dashPattern()) if pen.style() == Qt.PenStyle.CustomDashLine else (), pen.dashOffset(),
+                pen.miterLimit(), pen.isCosmetic())
+
+    @staticmethod
+    def brush_key(brush: QBrush) -> tuple | None:
+        """ Returns a hashable description of brush, None for gradients and textures """
+        if brush.style() not in _PLAIN_BRUSH_STYLES or not brush.transform().isIdentity():
+            return None
+        return (brush.color().rgba(), brush.style())
+
+    def pen(self, pen: QPen) -> QPen:
+        """ Returns the interned pen equal to pen """
+        key = self.pen_key(pen)
+        if key is None:
+            return pen
+        if (interned := self._pens.get(key)) is None:
+            interned = self._pens[key] = QPen(pen)
+        return interned
+
+    def brush(self, brush: QBrush) -> QBrush:
+        """ Returns the interned brush equal to brush """
+        key = self.brush_key(brush)
+        if key is None:
+            return brush
+        if (interned := self._brushes.get(key)) is None:
+            interned = self._brushes[key] = QBrush(brush)
+        return interned
+
+    def pen_svg(self, pen: QPen, convert: Callable[[QPen], str]) -> str:
+        """ convert(pen), computed once for every distinct color, width and style """
+        key = (pen.color().rgba(), pen.widthF(), pen.style())
+        if (svg := self._pen_svg.get(key)) is None:
+            svg = self._pen_svg[key] = convert(pen)
+        return svg
+
+    def brush_svg(self, brush: QBrush, defs: dict, convert: Callable[[QBrush, dict], str]) -> str:
+        """ convert(brush, defs), computed once for every distinct color and style. The defs it adds are added again on
+        every call """
+        key = (brush.color().rgba(), brush.style())
+        if (cached := self._brush_svg.get(key)) is None:
+            brush_defs: dict[str, str] = {}
+            cached = self._brush_svg[key] = (convert(brush, brush_defs), brush_defs)
+        svg, brush_defs = cached
+        defs.update(brush_defs)
+        return svg
+
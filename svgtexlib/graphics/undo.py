@@ -0,0 +1,350 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from PyQt6 import sip
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import QGraphicsItem
+
+"""
+Undo history of a scene.
+
+Edits are recorded as commands holding only what changed: old and new geometry of the moved items, the interned pens
+and brushes before and after a restyle, a text diff, or the items that were added or removed. Undo and redo apply the
+change, they never copy items. Removed items are kept detached from the scene until their command is evicted.
+"""
+
+# Rough per entry costs used for the memory budget
+_ENTRY_SIZE = 64
+_GEOMETRY_STATE_SIZE = 320
+_ITEM_SIZE = 1024
+
+
+def estimate_item_size(item: Any) -> int:
+    """ Approximate memory held by a detached item, svg items are dominated by their svg code """
+    inner = getattr(item, "item", item)
+    svg_data = getattr(inner, "svg_data", None)
+    return _ITEM_SIZE + (len(svg_data) if svg_data else 0)
+
+
+class Command(ABC):
+    @abstractmethod
+    def undo(self) -> None: ...
+    @abstractmethod
+    def redo(self) -> None: ...
+    def size(self) -> int:
+        """ Approximate memory held by the command, in bytes """
+        return _ENTRY_SIZE
+    def merge(self, other: Command) -> bool:
+        """ Absorbs other, a command pushed right after this one. Returns False if the commands can not be merged """
+        return False
+
+
+class MacroCommand(Command):
+    """ Commands undone and redone as one """
+    def __init__(self, commands: list[Command]):
+        self.commands = commands
+
+    def undo(self) -> None:
+        for command in reversed(self.commands):
+            command.undo()
+
+    def redo(self) -> None:
+        for command in self.commands:
+            command.redo()
+
+    def size(self) -> int:
+        return _ENTRY_SIZE + sum(command.size() for command in self.commands)
+
+
+class AddItemsCommand(Command):
+    def __init__(self, scene, items: list):
+        self.scene = scene
+        self.items = items
+
+    def undo(self) -> None:
+        for item in self.items:
+            if not sip.isdeleted(item) and item.scene() is self.scene:
+                self.scene.removeItem(item)
+
+    def redo(self) -> None:
+        for item in self.items:
+            if not sip.isdeleted(item) and item.scene() is None:
+                self.scene.addItem(item)
+
+    def size(self) -> int:
+        # Added items live in the scene, the command only references them until it is undone
+        return _ENTRY_SIZE + 8 * len(self.items)
+
+
+class RemoveItemsCommand(AddItemsCommand):
+    def undo(self) -> None:
+        super().redo()
+
+    def redo(self) -> None:
+        super().undo()
+
+    def size(self) -> int:
+        return _ENTRY_SIZE + sum(estimate_item_size(item) for item in self.items)
+
+
+class GeometryCommand(Command):
+    """ Moves, rotations and scaling of SelectableRectItem's, see SelectableRectItem.geometry_state """
+    def __init__(self, scene, items: list, old: list[tuple], new: list[tuple]):
+        """
+        -- Params --
+        old, new: geometry states of items before and after the edit
+        """
+        self.scene = scene
+        self.items = items
+        self.old = old
+        self.new = new
+
+    def _apply(self, states: list[tuple]) -> None:
+        alive = [(item, state) for item, state in zip(self.items, states) if not sip.isdeleted(item)]
+        with self.scene.batch_update([item for item, _ in alive]):
+            for item, state in alive:
+                item.set_geometry_state(state)
+
+    def undo(self) -> None:
+        self._apply(self.old)
+
+    def redo(self) -> None:
+        self._apply(self.new)
+
+    def size(self) -> int:
+        return _ENTRY_SIZE + 2 * _GEOMETRY_STATE_SIZE * len(self.items)
+
+class GroupCommand(Command):
+    """ Grouping of SelectableRectItem's into one item, see SelectableScene.group_items """
+    def __init__(self, scene, container, members: list[tuple]):
+        """
+        -- Params --
+        container: SelectableRectItem wrapping the DeepCopyableItemGroup
+        members: (SelectableRectItem, item, pos, transform) for every grouped item, its container while ungrouped and
+            its position and transform in that container
+        """
+        self.scene = scene
+        self.container = container
+        self.members = members
+
+    def redo(self) -> None:
+        group = self.container.item
+        for container, item, _, _ in self.members:
+            group.addToGroup(item)
+            if container.scene() is self.scene:
+                self.scene.removeItem(container)
+        self.container.child_geometry_changed()
+        if self.container.scene() is None:
+            self.scene.addItem(self.container)
+
+    def undo(self) -> None:
+        group = self.container.item
+        if self.container.scene() is self.scene:
+            self.scene.removeItem(self.container)
+        for container, item, pos, transform in self.members:
+            if item.parentItem() is group:
+                group.removeFromGroup(item)
+            item.setParentItem(container)
+            # Bypass overrides, e.g textboxes resize on setTransform
+            QGraphicsItem.setPos(item, pos)
+            QGraphicsItem.setTransform(item, transform)
+            container.child_geometry_changed()
+            if container.scene() is None:
+                self.scene.addItem(container)
+        self.container.child_geometry_changed()
+
+    def size(self) -> int:
+        return _ENTRY_SIZE + _GEOMETRY_STATE_SIZE * len(self.members)
+
+
+class UngroupCommand(GroupCommand):
+    def undo(self) -> None:
+        super().redo()
+
+    def redo(self) -> None:
+        super().undo()
+
+
+class StyleCommand(Command):
+    """ Restyle recorded by SelectableScene.apply_style. Styles are interned, so only references are stored """
+    def __init__(self, scene, record: list[tuple], pen=None, brush=None):
+        """ record: return value of apply_style, pen and brush: the styles that were applied """
+        self.scene = scene
+        self.record = record
+        self.pen = pen
+        self.brush = brush
+
+    def undo(self) -> None:
+        self.scene.restore_style([entry for entry in self.record if not sip.isdeleted(entry[0])])
+
+    def redo(self) -> None:
+        self.scene.apply_style([item for item, _, _ in self.record if not sip.isdeleted(item)], self.pen, self.brush)
+
+    def size(self) -> int:
+        return _ENTRY_SIZE + 24 * len(self.record)
+
+
+class TextEditCommand(Command):
+    """ Replacement of removed by inserted at position start of a textbox's text """
+    def __init__(self, textbox, start: int, removed: str, inserted: str):
+        self.textbox = textbox
+        self.start = start
+        self.removed = removed
+        self.inserted = inserted
+
+    @classmethod
+    def from_texts(cls, textbox, old: str, new: str) -> TextEditCommand | None:
+        """ Returns the command turning old into new, None if they are equal """
+        if old == new:
+            return None
+        prefix = 0
+        limit = min(len(old), len(new))
+        while prefix < limit and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+            suffix += 1
+        return cls(textbox, prefix, old[prefix:len(old) - suffix], new[prefix:len(new) - suffix])
+
+    def _replace(self, length: int, text: str) -> None:
+        if sip.isdeleted(self.textbox):
+            return
+        cursor = QTextCursor(self.textbox.text_item.document())
+        cursor.setPosition(self.start)
+        cursor.setPosition(self.start + length, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(text)
+
+    def undo(self) -> None:
+        self._replace(len(self.inserted), self.removed)
+
+    def redo(self) -> None:
+        self._replace(len(self.removed), self.inserted)
+
+    def size(self) -> int:
+        return _ENTRY_SIZE + 2 * (len(self.removed) + len(self.inserted))
+
+    def merge(self, other: Command) -> bool:
+        """ Merges typing and deleting runs in the same textbox """
+        if not isinstance(other, TextEditCommand) or other.textbox is not self.textbox:
+            return False
+        if not other.removed and other.start == self.start + len(self.inserted):
+            # Typing continues after the inserted text
+            self.inserted += other.inserted
+            return True
+        if not other.inserted and not self.inserted and other.start + len(other.removed) == self.start:
+            # Backspace continues before the removed text
+            self.start = other.start
+            self.removed = other.removed + self.removed
+            return True
+        return False
+
+
+class UndoStack:
+    """
+    Undo and redo history with a memory budget. Pushing a command clears the redo history, the oldest commands are
+    evicted once the history exceeds max_bytes or max_commands. Commands pushed while undoing or redoing are ignored,
+    so edits made by a command are not recorded again
+    """
+    def __init__(self, max_bytes: int = 16 * 2 ** 20, max_commands: int = 1000):
+        self.max_bytes = max_bytes
+        self.max_commands = max_commands
+        self._undo: deque[tuple[Command, int]] = deque()
+        self._redo: list[tuple[Command, int]] = []
+        self._bytes = 0
+        self._macro: list[Command] | None = None
+        self.applying = False
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    def memory(self) -> int:
+        """ Approximate bytes held by the undo and redo history """
+        return self._bytes
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def push(self, command: Command, merge: bool = True) -> None:
+        """ Records command, which has already been applied. merge: allow merging with the previous command """
+        if self.applying:
+            return
+        if self._macro is not None:
+            self._macro.append(command)
+            return
+        self._clear_redo()
+        if merge and self._undo and self._undo[-1][0].merge(command):
+            top, size = self._undo.pop()
+            self._bytes -= size
+            command = top
+        size = command.size()
+        self._undo.append((command, size))
+        self._bytes += size
+        self._evict()
+
+    def execute(self, command: Command) -> None:
+        """ Applies command and records it. Edits made by command are not recorded on their own """
+        self._run(command.redo)
+        self.push(command)
+
+    @contextmanager
+    def macro(self) -> Iterator[None]:
+        """ Commands pushed inside the block are undone as one """
+        if self._macro is not None or self.applying:
+            yield
+            return
+        self._macro = []
+        try:
+            yield
+        finally:
+            commands, self._macro = self._macro, None
+            if len(commands) == 1:
+                self.push(commands[0])
+            elif commands:
+                self.push(MacroCommand(commands), merge=False)
+
+    def undo(self) -> bool:
+        """ Returns False if there is nothing to undo """
+        if not self._undo:
+            return False
+        command, size = self._undo.pop()
+        self._run(command.undo)
+        self._redo.append((command, size))
+        return True
+
+    def redo(self) -> bool:
+        """ Returns False if there is nothing to redo """
+        if not self._redo:
+            return False
+        command, size = self._redo.pop()
+        self._run(command.redo)
+        self._undo.append((command, size))
+        return True
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self._bytes = 0
+
+    def _run(self, action) -> None:
+        self.applying = True
+        try:
+            action()
+        finally:
+            self.applying = False
+
+    def _clear_redo(self) -> None:
+        self._bytes -= sum(size for _, size in self._redo)
+        self._redo.clear()
+
+    def _evict(self) -> None:
+        # The newest command is kept even if it alone exceeds the budget
+        while len(self._undo) > 1 and (self._bytes > self.max_bytes or len(self._undo) > self.max_commands):
+            _, size = self._undo.popleft()
+            self._bytes -= size
@@ -1,16 +1,22 @@
 from __future__ import annotations
+from collections.abc import Callable, Iterable
+from copy import deepcopy
 from pathlib import Path
 from abc import ABC, abstractmethod
 import re
 
-from PyQt6.QtGui import QBrush, QColor, QMouseEvent, QPainter, QPainterPath, QPen, QKeyEvent, QTextCursor, QTransform
+from PyQt6.QtGui import QBrush, QColor, QMouseEvent, QPainter, QPainterPath, QPen, QPicture, QKeyEvent, QTextCursor, QTransform
 from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QLineF, QPointF, QSize, Qt, QRectF
 from PyQt6.QtSvg import QSvgGenerator, QSvgRenderer
 from PyQt6.QtSvgWidgets import QGraphicsSvgItem
-from PyQt6.QtWidgets import (QGraphicsEllipseItem, QGraphicsItemGroup, QGraphicsLineItem, QGraphicsPathItem, QGraphicsSceneMouseEvent, QGraphicsTextItem,QGraphicsItem, QGraphicsRectItem)
+from PyQt6.QtWidgets import (QGraphicsEllipseItem, QGraphicsItemGroup, QGraphicsLineItem, QGraphicsPathItem, QGraphicsSceneMouseEvent, QGraphicsTextItem,QGraphicsItem, QGraphicsRectItem, QStyle,
+                             QStyleOptionGraphicsItem)
 
 from .patterns import (build_dense_pattern_svg, color_to_rgb, build_hor_pattern_svg, build_ver_pattern_svg,
                             build_cross_pattern_svg, build_bdiag_pattern_svg, build_fdiag_pattern_svg, build_diagcross_pattern_svg)
+from .glyphs import inline_glyphs
+from .raster_cache import raster_cache
+from .styles import StyleTable
 from ..utils import KeyCodes
 
 
@@ -22,21 +28,27 @@ class DeepCopyableItemABC(QGraphicsItem):
     def __deepcopy__(self, memo) -> DeepCopyableItemABC: ...
     @abstractmethod
     def to_svg(self, defs) -> str: ...
+    def clipboard_factory(self) -> Callable[[], DeepCopyableItemABC]:
+        """ Returns a function building copies of the item as it is now, used by the clipboard. Items whose payload can
+        be shared override it, by default the item is copied once and the copy is copied again on every call """
+        prototype = deepcopy(self)
+        return lambda: deepcopy(prototype)
+
+    def style_table(self) -> StyleTable | None:
+        """ The style table of the item's scene, None for items outside of a scene """
+        return getattr(self.scene(), "style_table", None)
+
     def copy_pen(self, pen: QPen):
-        new_pen = QPen()
-        new_pen.setColor(pen.color())
-        new_pen.setWidth(pen.width())
-        new_pen.setStyle(pen.style())
-        new_pen.setCapStyle(pen.capStyle())
-        new_pen.setJoinStyle(pen.joinStyle())
-        new_pen.setDashPattern(pen.dashPattern())
-        new_pen.setDashOffset(pen.dashOffset())
-        new_pen.setMiterLimit(pen.miterLimit())
-        new_pen.setBrush(pen.brush())
-        new_pen.setCosmetic(pen.isCosmetic())
-        return new_pen
+        """ Returns the interned pen equal to pen, items sharing it are restyled by replacing it. Outside of a scene the
+        copy shares the data of pen """
+        table = self.style_table()
+        return table.pen(pen) if table is not None else QPen(pen)
 
     def pen_to_svg(self, pen: QPen):
+        table = self.style_table()
+        return table.pen_svg(pen, self._pen_to_svg) if table is not None else self._pen_to_svg(pen)
+
+    def _pen_to_svg(self, pen: QPen):
         color_str = color_to_rgb(pen.color())
         width, style = pen.widthF(), pen.style()
         if style == Qt.PenStyle.DashLine: dasharray = '5, 5'
@@ -47,6 +59,10 @@ class DeepCopyableItemABC(QGraphicsItem):
         return f'stroke:{color_str};stroke-width:{width};stroke-dasharray:{dasharray}'
 
     def brush_to_svg(self, brush: QBrush, defs: dict):
+        table = self.style_table()
+        return table.brush_svg(brush, defs, self._brush_to_svg) if table is not None else self._brush_to_svg(brush, defs)
+
+    def _brush_to_svg(self, brush: QBrush, defs: dict):
         """
         --- Limitations ---
         Only a couple fill patterns supported
@@ -129,7 +145,8 @@ class DeepCopyableItemABC(QGraphicsItem):
         new_brush = QBrush()
         new_brush.setColor(brush.color())
         new_brush.setStyle(brush.style())
-        return new_brush
+        table = self.style_table()
+        return table.brush(new_brush) if table is not None else new_brush
 
     @classmethod
     def transform_to_svg(cls, transform: QTransform | None) -> str:
@@ -155,22 +172,32 @@ class DeepCopyableShapeABC(DeepCopyableItemABC):
 
 class StoringQSvgRenderer(QSvgRenderer):
     """ Wrapper for QSvgRenderer that stores data used to create renderer """
-    def __init__(self, contents: QByteArray, parent = None):
+    def __init__(self, contents: QByteArray, parent = None, svg_contents: str | None = None, glyph_defs: dict[str, str] | None = None):
+        """
+        contents: svg document to render
+        svg_contents: svg document to store, defaults to contents. Documents referencing shared glyphs are stored without the glyph definitions
+        glyph_defs: mapping glyph id -> svg code of the shared glyphs referenced by the document
+        """
         super().__init__(contents, parent=parent)
-        self.svg_contents = contents.data().decode('utf-8')
+        self.svg_contents = svg_contents if svg_contents is not None else contents.data().decode('utf-8')
+        self.glyph_defs = glyph_defs if glyph_defs is not None else {}
 
 class DeepCopyableSvgItem(QGraphicsSvgItem, DeepCopyableItemABC):
     """ Wrapper for QGraphicsSvgItem that supports deepcopying and conversion to valid SVG code that can be included in a SVG document """
 
     def __init__(self, data: None | StoringQSvgRenderer | str = None, parent=None):
         self.svg_data = None
+        self.glyph_defs: dict[str, str] = {}
         self.xml_info = {}
         self.doctype_info = {}
+        self._raster_key: int | None = None
+        self._last_scale: float | None = None
 
         if isinstance(data, str):
             if not Path(data).is_file(): raise ValueError(f"Invalid path: {data}")
             super().__init__(data)
             self.svg_data = self._read_svg_file(data)
+            self._raster_key = hash(self.svg_data)
 
         elif isinstance(data, StoringQSvgRenderer):
             super().__init__()
@@ -212,23 +239,68 @@ class DeepCopyableSvgItem(QGraphicsSvgItem, DeepCopyableItemABC):
     def setSharedRenderer(self, renderer: StoringQSvgRenderer): # type: ignore
         super().setSharedRenderer(renderer)
         self.svg_data = renderer.svg_contents
+        self.glyph_defs = renderer.glyph_defs
+        self._raster_key = hash(self.svg_data)
+
+    def paint(self, painter, option, widget=None):
+        """ Blits a cached raster of the svg when one exists for the current view scale. Otherwise renders the vector
+        content and, unless the scale is still changing (zooming), requests a raster from the cache """
+        if painter is None:
+            return
+        cache = raster_cache()
+        scale = cache.device_scale(painter.worldTransform())
+        selected = option is not None and option.state & QStyle.StateFlag.State_Selected
+        # Pictures recorded by item groups keep the vector content
+        if (not cache.enabled or selected or scale is None or self._raster_key is None or not self.svg_data
+                or isinstance(painter.device(), QPicture)):
+            super().paint(painter, option, widget)
+            return
+
+        key = (self._raster_key, scale)
+        image = cache.get(key)
+        if image is None:
+            super().paint(painter, option, widget)
+            if self._last_scale is None or scale == self._last_scale:
+                cache.request(key, lambda: inline_glyphs(self.svg_data, self.glyph_defs).encode('utf-8'),
+                              self.boundingRect(), self)
+        else:
+            rect = self.boundingRect()
+            painter.drawImage(QRectF(rect.x(), rect.y(), image.width() / scale, image.height() / scale), image)
+        self._last_scale = scale
 
     def _read_svg_file(self, file_path):
         with open(file_path, 'r', encoding='utf-8') as file:
             return file.read()
 
-    def __deepcopy__(self, memo) -> DeepCopyableSvgItem:
+    def shared_renderer(self) -> StoringQSvgRenderer | None:
+        """ Returns the renderer of the item, shareable by copies. An item loaded from a file is switched to a storing
+        renderer once, so later copies do not parse the svg again. None if the item has no svg """
         if not self.svg_data:
-            return DeepCopyableSvgItem()
-        data = QByteArray(self.svg_data.encode('utf-8'))
-        renderer = StoringQSvgRenderer(data)
-        svg_item = DeepCopyableSvgItem(renderer)
-        svg_item.setTransform(self.transform())
-        return svg_item
+            return None
+        renderer = self.renderer()
+        if not isinstance(renderer, StoringQSvgRenderer):
+            data = QByteArray(inline_glyphs(self.svg_data, self.glyph_defs).encode('utf-8'))
+            renderer = StoringQSvgRenderer(data, svg_contents=self.svg_data, glyph_defs=self.glyph_defs)
+            self.setSharedRenderer(renderer)
+        return renderer
+
+    def clipboard_factory(self) -> Callable[[], DeepCopyableSvgItem]:
+        renderer = self.shared_renderer()
+        transform = self.transform()
+        def build() -> DeepCopyableSvgItem:
+            svg_item = DeepCopyableSvgItem(renderer)
+            svg_item.setTransform(transform)
+            return svg_item
+        return build
+
+    def __deepcopy__(self, memo) -> DeepCopyableSvgItem:
+        return self.clipboard_factory()()
 
     def to_svg(self, defs: dict):
         transform_svg = self.transform_to_svg(self.sceneTransform())
         body = self.svg_body()
+        # Shared glyphs are written once to the document level defs
+        defs.update(self.glyph_defs)
         xml_info = []
         for k, v in self.xml_info.items():
             xml_info.append(f' metadata-{k}="{v}"')
@@ -333,11 +405,7 @@ class DeepCopyableLineItem(QGraphicsLineItem, DeepCopyableLineABC):
                 f'</g>\n')
 
     def __deepcopy__(self, memo) -> DeepCopyableLineItem:
-        if (parent := self.parentItem()):
-            new_line = QLineF(parent.mapFromParent(self.line().p1()), parent.mapFromParent(self.line().p2()))
-        else:
-            new_line = self.line()
-        new_item = DeepCopyableLineItem(new_line)
+        new_item = DeepCopyableLineItem(self.line())
         new_item.setPen(self.copy_pen(self.pen()))
         new_item.setTransform(self.transform())
         new_item.setPos(self.pos())
@@ -387,26 +455,29 @@ class DeepCopyablePathItem(QGraphicsPathItem, DeepCopyableItemABC):
                 f'  {path_element_svg}\n'
                 f'</g>\n')
 
+    def clipboard_factory(self) -> Callable[[], DeepCopyablePathItem]:
+        # QPainterPath is implicitly shared, copies hold the elements once until one of them is edited
+        path, transform, pen, brush = self.path(), self.transform(), self.copy_pen(self.pen()), self.copy_brush(self.brush())
+        opacity, z, visible, flags = self.opacity(), self.zValue(), self.isVisible(), self.flags()
+        def build() -> DeepCopyablePathItem:
+            new_item = DeepCopyablePathItem(path)
+            new_item.setTransform(transform)
+            new_item.setPen(pen)
+            new_item.setBrush(brush)
+            new_item.setOpacity(opacity)
+            new_item.setZValue(z)
+            new_item.setVisible(visible)
+            new_item.setFlags(flags)
+            return new_item
+        return build
+
     def __deepcopy__(self, memo) -> DeepCopyablePathItem:
-        if (parent := self.parentItem()):
-            new_path = parent.mapFromParent(self.path())
-        else:
-            new_path = self.path()
-        new_item = DeepCopyablePathItem(new_path)
-        new_item.setTransform(self.transform())
-        new_item.setPen(self.pen())
-        new_item.setBrush(self.brush())
-        new_item.setOpacity(self.opacity())
-        new_item.setZValue(self.zValue())
-        new_item.setVisible(self.isVisible())
-        new_item.setFlags(self.flags())
-        return new_item
+        return self.clipboard_factory()()
 
 class ClippedTextItem(QGraphicsTextItem):
     """ Wrapper for QGraphicsTextItem that supports a 'clipped rect', where text outside of the rect bounds will not be displayed """
     def __init__(self, text: str, clip_rect: QRectF, parent=None):
         super().__init__(text, parent)
-        print(text, "clip text")
         self.text = text
         self.setTextInteractionFlags(Qt.TextInteractionFlag.TextEditable | Qt.TextInteractionFlag.TextSelectableByMouse
                                      | Qt.TextInteractionFlag.TextEditorInteraction)
@@ -429,21 +500,33 @@ class ClippedTextItem(QGraphicsTextItem):
         if event.button() == Qt.MouseButton.LeftButton and self.toPlainText() == self.text:
             self.setPlainText("")
 
+class PreviewSvgItem(QGraphicsSvgItem):
+    """ Lightweight, non interactive overlay used to display a live preview of compiled latex. Never saved or copied """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setOpacity(0.6)
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+        self.setAcceptHoverEvents(False)
+
 class DeepCopyableTextbox(QGraphicsRectItem, DeepCopyableItemABC):
     # TODO: Allow for no clip rect
     default_message = "Text.."
+    combines_transforms = True # setTransform resizes the rect instead of replacing the transform
 
     def __init__(self, rect: QRectF, text=None, parent=None):
         super().__init__(rect, parent=parent)
         self.moving = False # move this logic into the tools module
         _text = text if text is not None else self.default_message
         self.text_item: ClippedTextItem = ClippedTextItem(_text, self.rect(), parent=self)
+        self.preview_item: PreviewSvgItem | None = None
         self.moving_pen = QPen(Qt.GlobalColor.darkYellow)
         self.stationary_pen = QPen(Qt.GlobalColor.transparent)
         self.text_item.setTextWidth(rect.width())
         self.text_item.setPos(self.rect().topLeft())
         # This is a temporary fix. When the item is copied and then added to scene the text does not appear. It seems that super().setRect(*args) in setRect() needs to be called for text to display...
         self.setRect(self.rect())
+        self._recorded_text = self.text() # text as of the last change recorded for undo
+        self.text_item.document().contentsChanged.connect(self._text_changed)
 
     def setRect(self, *args, **kwargs):
         super().setRect(*args, **kwargs)
@@ -451,6 +534,30 @@ class DeepCopyableTextbox(QGraphicsRectItem, DeepCopyableItemABC):
         self.text_item.setClipRect(self.rect())
         self.text_item.setPos(self.rect().topLeft())
         self.text_item.update()
+        if self.preview_item is not None:
+            self.preview_item.setPos(self.rect().bottomLeft())
+
+    def _text_changed(self):
+        """ Forwards edits to the scene's live latex compiler and undo history, if the scene has them """
+        text = self.text()
+        if (record := getattr(self.scene(), "record_text_edit", None)) is not None:
+            record(self, self._recorded_text, text)
+        self._recorded_text = text
+        compiler = getattr(self.scene(), "latex_compiler", None)
+        if compiler is not None and compiler.isEnabled():
+            compiler.request(self, text)
+
+    def show_preview(self, renderer: QSvgRenderer):
+        """ Displays renderer below the textbox """
+        if self.preview_item is None:
+            self.preview_item = PreviewSvgItem(parent=self)
+        self.preview_item.setSharedRenderer(renderer)
+        self.preview_item.setPos(self.rect().bottomLeft())
+        self.preview_item.setVisible(True)
+
+    def clear_preview(self):
+        if self.preview_item is not None:
+            self.preview_item.setVisible(False)
 
     def paint(self, painter, option, widget=None):
         if not painter:
@@ -511,34 +618,113 @@ class DeepCopyableTextbox(QGraphicsRectItem, DeepCopyableItemABC):
 
     def __deepcopy__(self, memo) -> DeepCopyableTextbox:
         rect_copy = QRectF(self.rect().x(), self.rect().y(), self.rect().width(), self.rect().height())
-        new_item = DeepCopyableTextbox(rect_copy)
+        new_item = DeepCopyableTextbox(rect_copy, self.text())
         return new_item
 
 
 class DeepCopyableItemGroup(QGraphicsItemGroup, DeepCopyableItemABC):
-    """ Wrapper for QGraphicsItemGroup that supports deepcopy """
-    def __init__(self, *args, **kwargs):
-        raise NotImplementedError
-#        super().__init__(*args, **kwargs)
-
-#    def __deepcopy__(self) -> DeepCopyableItemGroup:
-#        scene = self.scene()
-#        group = DeepCopyableItemGroup()
-#        scene.addItem(group)
-#        for item in self.childItems():
-#            item_copy = deepcopy(item)
-#            group.addToGroup(item_copy)
-
-#    def to_svg(self, defs: dict):
-#        transform = self.sceneTransform()
-#        transform_svg = self.transform_to_svg(transform)
-#        item_svg = ""
-#        for item in self.childItems():
-#            print(item, "child item group")
-#            if hasattr(item, "to_svg"):
-#                to_svg = getattr(item, "to_svg")
-#                item_svg += to_svg() + '\n'
-#
-#        return (f'<g transform="{transform_svg}">\n'
-#                f'  {item_svg}\n'
-#                f'</g>\n')
+    """
+    Wrapper for QGraphicsItemGroup that supports deepcopy. Members are hidden and painted by the group from a recorded
+    QPicture, so a figure made of many items is painted, moved and indexed as one item. The picture holds vector
+    content and is replayed at any scale, it is recorded again after a member changes, see invalidate
+    """
+    def __init__(self, items: Iterable[QGraphicsItem] = (), parent=None):
+        super().__init__(parent)
+        self._picture: QPicture | None = None
+        self._bounds: QRectF | None = None
+        self._hidden: dict[int, QGraphicsItem] = {} # members hidden by the group, shown again when removed
+        for item in items:
+            self.addToGroup(item)
+
+    def addToGroup(self, item: QGraphicsItem | None) -> None:
+        if item is None:
+            return
+        self.prepareGeometryChange()
+        super().addToGroup(item)
+        if item.isVisibleTo(self):
+            item.setVisible(False)
+            self._hidden[id(item)] = item
+        self.invalidate()
+
+    def removeFromGroup(self, item: QGraphicsItem | None) -> None:
+        if item is None:
+            return
+        self.prepareGeometryChange()
+        super().removeFromGroup(item)
+        if self._hidden.pop(id(item), None) is not None:
+            item.setVisible(True)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """ Drops the recorded picture and bounds. Call prepareGeometryChange first if the bounds change """
+        self._picture = None
+        self._bounds = None
+        self.update()
+
+    def child_geometry_changed(self) -> None:
+        """ Called by members whose geometry changes without a transform, forwarded to the selectable container """
+        self.prepareGeometryChange()
+        self.invalidate()
+        notify = getattr(self.parentItem(), "child_geometry_changed", None)
+        if notify is not None:
+            notify()
+
+    def boundingRect(self) -> QRectF:
+        if self._bounds is None:
+            bounds = QRectF()
+            for item in self.childItems():
+                bounds = bounds.united(item.itemTransform(self)[0].mapRect(item.boundingRect().united(item.childrenBoundingRect())))
+            self._bounds = bounds
+        return QRectF(self._bounds)
+
+    def paint(self, painter, option, widget=None):
+        if painter is None:
+            return
+        if self._picture is None:
+            self._picture = QPicture()
+            recorder = QPainter(self._picture)
+            for item in self.childItems():
+                if id(item) in self._hidden or item.isVisibleTo(self):
+                    _paint_subtree(recorder, item, self)
+            recorder.end()
+        painter.drawPicture(0, 0, self._picture)
+
+    def to_svg(self, defs: dict) -> str:
+        # Members are written with their scene transforms, the group element only marks them as one item
+        members_svg = "".join(item.to_svg(defs) for item in self.childItems() if hasattr(item, "to_svg"))
+        return (f'<g metadata-custom-type="DeepCopyableItemGroup">\n'
+                f'{members_svg}'
+                f'</g>\n')
+
+    def __deepcopy__(self, memo) -> DeepCopyableItemGroup:
+        members = []
+        for item in self.childItems():
+            item_copy = deepcopy(item, memo)
+            QGraphicsItem.setPos(item_copy, QGraphicsItem.pos(item))
+            # Copies of members hidden by this group are hidden too, the new group hides only visible members
+            item_copy.setVisible(id(item) in self._hidden or item.isVisibleTo(self))
+            members.append(item_copy)
+        group = DeepCopyableItemGroup(members)
+        group.setTransform(self.transform())
+        return group
+
+
+def _paint_subtree(painter: QPainter, item: QGraphicsItem, parent: QGraphicsItem) -> None:
+    """ Paints item and its visible descendants, painter is in the coordinates of parent """
+    painter.save()
+    painter.setTransform(item.itemTransform(parent)[0], True)
+    painter.setOpacity(painter.opacity() * item.opacity())
+    children = [child for child in item.childItems() if child.isVisibleTo(item)]
+    behind = [child for child in children if child.flags() & QGraphicsItem.GraphicsItemFlag.ItemStacksBehindParent]
+    for child in behind:
+        _paint_subtree(painter, child, item)
+    if not item.flags() & QGraphicsItem.GraphicsItemFlag.ItemHasNoContents:
+        option = QStyleOptionGraphicsItem()
+        option.exposedRect = item.boundingRect()
+        item.paint(painter, option, None)
+    if item.flags() & QGraphicsItem.GraphicsItemFlag.ItemClipsChildrenToShape:
+        painter.setClipPath(item.shape(), Qt.ClipOperation.IntersectClip)
+    for child in children:
+        if not child.flags() & QGraphicsItem.GraphicsItemFlag.ItemStacksBehindParent:
+            _paint_subtree(painter, child, item)
+    painter.restore()
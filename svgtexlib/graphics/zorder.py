@@ -0,0 +1,206 @@
+from __future__ import annotations
+from itertools import count
+from random import random
+from typing import Any, Iterator
+
+
+class _Node:
+    __slots__ = ("key", "item", "priority", "size", "left", "right")
+
+    def __init__(self, key: tuple[float, int], item: Any):
+        self.key = key
+        self.item = item
+        self.priority = random()
+        self.size = 1
+        self.left: _Node | None = None
+        self.right: _Node | None = None
+
+def _size(node: _Node | None) -> int:
+    return node.size if node is not None else 0
+
+def _update(node: _Node) -> _Node:
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+def _split(node: _Node | None, key: tuple[float, int]) -> tuple[_Node | None, _Node | None]:
+    """ Splits node into keys < key and keys >= key """
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        return _update(node), right
+    left, right = _split(node.left, key)
+    node.left = right
+    return left, _update(node)
+
+def _merge(left: _Node | None, right: _Node | None) -> _Node | None:
+    """ Merges two treaps, every key of left must be smaller than every key of right """
+    if left is None or right is None:
+        return left if left is not None else right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+class ZOrderIndex:
+    """
+    Stacking order of items, bottom to top, backed by an order statistic treap keyed by (z value, insertion order).
+    Rank queries, bring to front, send to back, raise and lower are O(log n). Items are required to implement
+    setZValue, which is only called for the items whose z value actually changes.
+
+    The top z value is cached, it is only looked up again after the topmost key was removed.
+    """
+    def __init__(self):
+        self._root: _Node | None = None
+        self._keys: dict[Any, tuple[float, int]] = {}
+        self._sequence = count()
+        self._max_z: float | None = None # None when unknown
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self._keys
+
+    def __iter__(self) -> Iterator[Any]:
+        """ Iterates items from bottom to top """
+        stack, node = [], self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.item
+            node = node.right
+
+    def _insert(self, key: tuple[float, int], item: Any) -> None:
+        if self._root is None or (self._max_z is not None and key[0] > self._max_z):
+            self._max_z = key[0]
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key, item)), right)
+        self._keys[item] = key
+
+    def _delete(self, key: tuple[float, int]) -> None:
+        if self._max_z is not None and key[0] >= self._max_z:
+            self._max_z = None
+        left, right = _split(self._root, key)
+        _, right = _split(right, (key[0], key[1] + 1))
+        self._root = _merge(left, right)
+
+    def _node_at(self, rank: int) -> _Node:
+        node = self._root
+        while node is not None:
+            left_size = _size(node.left)
+            if rank < left_size:
+                node = node.left
+            elif rank == left_size:
+                return node
+            else:
+                rank -= left_size + 1
+                node = node.right
+        raise IndexError("rank out of range")
+
+    def _rekey(self, item: Any, key: tuple[float, int]) -> None:
+        self._delete(self._keys[item])
+        self._insert(key, item)
+
+    def _set_z(self, item: Any, z: float) -> None:
+        """ Moves item to z and pushes the new value to the item """
+        self._rekey(item, (z, self._keys[item][1]))
+        item.setZValue(z)
+
+    def add(self, item: Any, z: float | None = None) -> float:
+        """ Adds item to the index, on top of every other item unless z is given. Returns the z value of item """
+        if item in self._keys:
+            return self._keys[item][0]
+        if z is None:
+            z = self.max_z() + 1 if self._root is not None else 0.0
+        self._insert((z, next(self._sequence)), item)
+        item.setZValue(z)
+        return z
+
+    def remove(self, item: Any) -> None:
+        key = self._keys.pop(item, None)
+        if key is not None:
+            self._delete(key)
+
+    def update(self, item: Any, z: float) -> None:
+        """ Records a z value that was set on item directly. Does not call setZValue """
+        key = self._keys.get(item)
+        if key is not None and key[0] != z:
+            self._rekey(item, (z, key[1]))
+
+    def z_value(self, item: Any) -> float:
+        return self._keys[item][0]
+
+    def rank(self, item: Any) -> int:
+        """ Returns the number of items below item """
+        key, rank, node = self._keys[item], 0, self._root
+        while node is not None:
+            if key < node.key:
+                node = node.left
+            else:
+                rank += _size(node.left) + 1
+                if key == node.key:
+                    return rank - 1
+                node = node.right
+        raise KeyError(item)
+
+    def at(self, rank: int) -> Any:
+        """ Returns the item with the given rank, negative ranks count from the top """
+        if rank < 0:
+            rank += len(self)
+        return self._node_at(rank).item
+
+    def max_z(self) -> float | None:
+        """ Returns the z value of the top item, None if the index is empty. O(1) unless the top item was removed """
+        if self._max_z is None and self._root is not None:
+            self._max_z = self._node_at(_size(self._root) - 1).key[0]
+        return self._max_z
+
+    def top(self) -> Any | None:
+        return self.at(-1) if self._root is not None else None
+
+    def bottom(self) -> Any | None:
+        return self.at(0) if self._root is not None else None
+
+    def bring_to_front(self, item: Any) -> None:
+        top = self.top()
+        if top is not item:
+            self._set_z(item, self.z_value(top) + 1)
+
+    def send_to_back(self, item: Any) -> None:
+        bottom = self.bottom()
+        if bottom is not item:
+            self._set_z(item, self.z_value(bottom) - 1)
+
+    def raise_(self, item: Any) -> None:
+        """ Swaps item with the item directly above it """
+        rank = self.rank(item)
+        if rank + 1 < len(self):
+            self._swap(item, self.at(rank + 1))
+
+    def lower(self, item: Any) -> None:
+        """ Swaps item with the item directly below it """
+        rank = self.rank(item)
+        if rank > 0:
+            self._swap(item, self.at(rank - 1))
+
+    def _swap(self, item: Any, other: Any) -> None:
+        """ Swaps the positions of two items. Items with equal z values are stacked by insertion order """
+        key, other_key = self._keys[item], self._keys[other]
+        self._delete(key)
+        self._delete(other_key)
+        self._insert(other_key, item)
+        self._insert(key, other)
+        if key[0] != other_key[0]:
+            item.setZValue(other_key[0])
+            other.setZValue(key[0])
+
+    def clear(self) -> None:
+        self._root = None
+        self._keys.clear()
+        self._max_z = None
@@ -1,21 +1,21 @@
 from collections.abc import Callable
 import subprocess
-from copy import deepcopy
 from typing import Literal, Optional
-from collections import deque
 import logging
 from pathlib import Path
 
 from PyQt6.QtGui import QAction, QBrush, QCloseEvent, QColor, QCursor, QIcon, QKeyEvent, QKeySequence, QMouseEvent, QPaintEvent, QPainterPath, QPen, QPainter, QPixmap, QTransform
-from PyQt6.QtCore import QByteArray, QKeyCombination, QLineF, QPointF, QRect, Qt, QRectF, pyqtBoundSignal, pyqtSignal, QEvent, QSize
+from PyQt6.QtCore import QByteArray, QKeyCombination, QLineF, QPointF, QRect, Qt, QRectF, QTimer, pyqtBoundSignal, pyqtSignal, QEvent, QSize
 from PyQt6.QtWidgets import (QApplication, QCheckBox, QColorDialog, QDialog, QFileDialog, QGestureEvent, QGraphicsItem, QGraphicsPathItem, QGraphicsSceneMouseEvent, QLabel, QLineEdit,
                              QMessageBox, QPushButton, QScrollArea, QSizePolicy, QToolBar, QWidget, QHBoxLayout, QVBoxLayout, QGraphicsView,
                              QGraphicsScene, QGraphicsLineItem, QMainWindow, QGraphicsTextItem, QGraphicsRectItem, QComboBox, QFormLayout, QStackedWidget)
 
 from ..drawing.drawing_controller import DrawingController
-from ..graphics import DeepCopyableSvgItem, StoringQSvgRenderer, DeepCopyableTextbox, SelectableRectItem
+from ..graphics import DeepCopyableSvgItem, StoringQSvgRenderer, DeepCopyableTextbox, SelectableRectItem, SelectableScene
+from ..graphics.clipboard import CLIPBOARD
+from ..latex import EQUATION_CACHE, EquationCache, LatexPreviewCompiler, cached_compile
 from ..svg import scene_to_svg, SvgBuilder
-from ..utils import tex2svg, text_is_latex, Handlers, Tools
+from ..utils import text_is_latex, Handlers, Tools
 
 logger = logging.getLogger(__name__)
 
@@ -138,23 +138,59 @@ class RulerWidget(QWidget):
                 painter.drawText(width - 30, y + 5, str(y))
 
 class GraphicsView(QGraphicsView):
+    """ Forwards mouse events to the drawing controller. Move events with a button held are coalesced and delivered at most
+    once per frame, handlers that need every sample (freehand drawing) receive all moves of the frame. Hover moves are
+    delivered at once. Pending moves are flushed before other events so events keep their order """
     def __init__(self, controller: None | DrawingController = None):
         super().__init__()
         self._controller =  controller
         self.setRenderHint(QPainter.RenderHint.Antialiasing, True)
         self.setMouseTracking(True)
+        self._pending_moves: list[QMouseEvent] = []
+        self._move_timer = QTimer(self)
+        self._move_timer.setSingleShot(True)
+        self._move_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._move_timer.timeout.connect(self.flush_moves)
+
+    def frame_interval(self) -> int:
+        """ Milliseconds between frames of the screen displaying the view """
+        screen = self.screen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return max(1, int(1000 / rate)) if rate > 0 else 16
+
+    def flush_moves(self) -> None:
+        """ Delivers the move events received since the last frame """
+        self._move_timer.stop()
+        if not self._pending_moves:
+            return
+        events, self._pending_moves = self._pending_moves, []
+        if self._controller:
+            self._controller.mouseMoveEvent(events[-1], events)
+        super().mouseMoveEvent(events[-1])
 
     def mousePressEvent(self, event):
+        self.flush_moves()
         if self._controller and event:
             self._controller.mousePressEvent(event)
         super().mousePressEvent(event)
 
     def mouseMoveEvent(self, event):
-        if self._controller and event:
-            self._controller.mouseMoveEvent(event)
-        super().mouseMoveEvent(event)
+        if event is None:
+            return
+        if event.buttons() == Qt.MouseButton.NoButton:
+            # Hover feedback should not lag a frame behind
+            self.flush_moves()
+            if self._controller:
+                self._controller.mouseMoveEvent(event, [event])
+            super().mouseMoveEvent(event)
+            return
+        # Qt reuses the event once this returns
+        self._pending_moves.append(event.clone())
+        if not self._move_timer.isActive():
+            self._move_timer.start(self.frame_interval())
 
     def mouseReleaseEvent(self, event) -> None:
+        self.flush_moves()
         if self._controller and event:
             self._controller.mouseReleaseEvent(event)
         super().mouseReleaseEvent(event)
@@ -209,28 +245,40 @@ class ZoomableScrollArea(QScrollArea):
             return self.gestureEvent(event)
         return super().event(event)
 
-class TexGraphicsScene(QGraphicsScene):
-    def __init__(self, cache_max = 100):
+class TexGraphicsScene(SelectableScene):
+    def __init__(self, cache_max = 100, equation_cache: EquationCache | None = None):
+        """ cache_max: maximum number of undo steps, older steps are also evicted once the history exceeds its memory budget """
         super().__init__()
-        self.cache = deque()
-        self.cache_max = cache_max
-        self.clipboard_item: QGraphicsItem | None = None
+        self.undo_stack.max_commands = cache_max
+        self.clipboard = CLIPBOARD
+        self.equation_cache = equation_cache if equation_cache is not None else EQUATION_CACHE
+        self.latex_compiler = LatexPreviewCompiler(self.equation_cache, parent=self)
 
 
     def copy_to_clipboard(self):
-        for item in self.selectedItems():
-            if hasattr(item, "__deepcopy__") and isinstance(item, SelectableRectItem):
-                self.clipboard_item = deepcopy(item)
-                return
+        self.clipboard.copy(item for item in self.selectedItems() if isinstance(item, SelectableRectItem))
 
     def paste_from_clipboard(self, pos: QPointF):
-        if self.clipboard_item:
-            self.addItem(self.clipboard_item)
-
-            offset = pos - self.clipboard_item.mapToScene(self.clipboard_item.boundingRect().topLeft())
-            translation = QTransform().translate(offset.x(), offset.y())
-            self.clipboard_item.setTransform(translation)
-            self.clipboard_item = None
+        """ Pastes the clipboard with its top left corner at pos and selects the pasted items. Can be repeated """
+        items = self.clipboard.paste(self, pos)
+        if items:
+            self.clearSelection()
+            for item in items:
+                item.setSelected(True)
+
+    def group_selected(self):
+        if (group := self.group_items(self.selectedItems())) is not None:
+            self.clearSelection()
+            group.setSelected(True)
+
+    def ungroup_selected(self):
+        items = []
+        with self.undo_stack.macro():
+            for item in self.selectedItems():
+                if isinstance(item, SelectableRectItem):
+                    items += self.ungroup_item(item)
+        for item in items:
+            item.setSelected(True)
 
     def keyPressEvent(self, event: QKeyEvent | None):
         if event is None:
@@ -238,28 +286,35 @@ class TexGraphicsScene(QGraphicsScene):
 
         event_sequence = QKeySequence(QKeyCombination(event.modifiers(), Qt.Key(event.key())))
 #        Qt.KeyboardModifier.ShiftModifier.value
-        if QKeySequence(QKeyCombination(Qt.KeyboardModifier.ShiftModifier, Qt.Key.Key_U)).matches(event_sequence) == QKeySequence.SequenceMatch.ExactMatch:
-            if len(self.cache) != 0:
-                item = self.cache.pop()
-                self.addItem(item)
+        editing_text = isinstance(self.focusItem(), QGraphicsTextItem)
+        undo_sequences = (QKeySequence(QKeyCombination(Qt.KeyboardModifier.ShiftModifier, Qt.Key.Key_U)),
+                          QKeySequence(QKeyCombination(Qt.KeyboardModifier.ControlModifier, Qt.Key.Key_Z)))
+        redo_sequence = QKeySequence(QKeyCombination(Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.ShiftModifier, Qt.Key.Key_Z))
+        # Focused textboxes handle their own shortcuts
+        if not editing_text and any(sequence.matches(event_sequence) == QKeySequence.SequenceMatch.ExactMatch for sequence in undo_sequences):
+            self.undo_stack.undo()
+            return
+
+        elif not editing_text and redo_sequence.matches(event_sequence) == QKeySequence.SequenceMatch.ExactMatch:
+            self.undo_stack.redo()
+            return
 
         elif QKeySequence(QKeyCombination(Qt.KeyboardModifier.NoModifier, Qt.Key.Key_Backspace)).matches(event_sequence) == QKeySequence.SequenceMatch.ExactMatch: #== QKeySequence.SequenceMatch.ExactMatch:
-            focus_item = self.focusItem()
-            if not isinstance(focus_item, QGraphicsTextItem):
-                selected_items = self.selectedItems()
-                for item in selected_items:
-                    if isinstance(item, SelectableRectItem):
-                        self.removeItem(item)
-                        self.add_to_cache(item)
-                        del item
+            if not editing_text:
+                # Deleting the selection is undone in one step
+                with self.undo_stack.macro():
+                    for item in self.selectedItems():
+                        if isinstance(item, SelectableRectItem):
+                            self.removeItem(item)
 
 
         super().keyPressEvent(event)
 
-    def add_to_cache(self, item: QGraphicsItem):
-        if len(self.cache) > self.cache_max:
-            self.cache.popleft()
-        self.cache.append(item)
+    def restack_selected(self, restack: Callable[[SelectableRectItem], None]):
+        """ Applies a z-order operation, e.g SelectableRectItem.raise_, to every selected item """
+        for item in self.selectedItems():
+            if isinstance(item, SelectableRectItem):
+                restack(item)
 
     def set_error_message(self, msg: str):
         msg_box = QMessageBox()
@@ -267,8 +322,20 @@ class TexGraphicsScene(QGraphicsScene):
         msg_box.setWindowTitle("Error")
         msg_box.exec()
 
-    def compile_latex(self, signal):
+    def compile_latex(self):
         failed = set()
+        # Compiling every textbox is undone in one step
+        with self.undo_stack.macro():
+            self._compile_textboxes(failed)
+
+        num_failed = len(failed)
+        if num_failed > 0:
+            msg = f"Failed to compile {num_failed} items\n"
+            msg += "\n".join(failed)
+            self.set_error_message(msg)
+
+    def _compile_textboxes(self, failed: set[str]):
+        """ Replaces textboxes containing latex with the compiled equation. Error messages are added to failed """
         for item in self.items():
             parent = item.parentItem()
             if not isinstance(item, DeepCopyableTextbox) or not isinstance(parent, SelectableRectItem):
@@ -289,32 +356,22 @@ class TexGraphicsScene(QGraphicsScene):
 
                 inverse = transform.inverted()[0]
                 res_item.setTransform(inverse, combine=True)
-                selectable_item = SelectableRectItem(res_item, signal)
+                selectable_item = SelectableRectItem(res_item)
                 selectable_item.setTransform(QTransform().translate(global_pos.x(), global_pos.y()), combine=True)
                 selectable_item.setTransform(transform, combine=True)
                 self.addItem(selectable_item)
-
-                item.setParentItem(None)
-                self.removeItem(item)
+                # The textbox stays in its container, so undo restores both
                 self.removeItem(parent)
-                del item
-
-        num_failed = len(failed)
-        if num_failed > 0:
-            msg = f"Failed to compile {num_failed} items\n"
-            msg += "\n".join(failed)
-            self.set_error_message(msg)
 
 
     def attempt_compile(self, text) -> DeepCopyableSvgItem:
         if not text_is_latex(text):
             raise MissingMathDelimeterError(f"Missing math delimeter\nEquation: {text}")
         try:
-            svg_bytes = tex2svg(text)
+            compiled = cached_compile(text, self.equation_cache)
         except Exception:
             raise LatexCompilationError(f"Failed to compile equation {text}")
-        q_byte_array = QByteArray(svg_bytes.read())
-        renderer = StoringQSvgRenderer(q_byte_array)
+        renderer = compiled.renderer()
         item = DeepCopyableSvgItem()
         item.setSharedRenderer(renderer)
         return item
@@ -539,6 +596,7 @@ class VToolBar(QWidget):
         self.color_selection = ColorBar()
         self.fill_color_selection = ColorBar()
         self.selection_toggle = QCheckBox("Disable Selection")
+        self.live_latex_toggle = QCheckBox("Live LaTeX")
 
     def _configure_widgets(self):
         button = QPushButton()
@@ -562,6 +620,7 @@ class VToolBar(QWidget):
         self.toolbar_layout.addWidget(QLabel("Fill Color"))
         self.toolbar_layout.addWidget(self.fill_color_selection)
         self.toolbar_layout.addWidget(self.selection_toggle)
+        self.toolbar_layout.addWidget(self.live_latex_toggle)
 
     def connectClickedTool(self, func: Callable): self.tool_checkbox.clicked.connect(func)
     def connectClickedPenWidth(self, func: Callable[[int], None]): self.pen_size_selector.clicked.connect(func)
@@ -569,6 +628,7 @@ class VToolBar(QWidget):
     def connectColorSelection(self, func: Callable[[QColor], None]): self.color_selection.clicked.connect(func)
     def connectFillColorSelection(self, func: Callable[[QColor], None]): self.fill_color_selection.clicked.connect(func)
     def connectToggleSelection(self, func: Callable[[QColor], None]): self.selection_toggle.clicked.connect(func)
+    def connectToggleLiveLatex(self, func: Callable[[bool], None]): self.live_latex_toggle.clicked.connect(func)
     def getClickCallback(self, box_text: str):
         for box in self.check_boxes:
             if box.text() == box_text and not box.isChecked():
@@ -814,7 +874,12 @@ class MainWindow(QMainWindow):
         self.scroll_area.setWidget(scroll_widget)
 
     def _build_scene(self):
+        old_scene = self._scene
         self._scene = TexGraphicsScene()
+        self._scene.latex_compiler.setEnabled(old_scene.latex_compiler.isEnabled())
+        self._scene.select_enabled = old_scene.select_enabled
+        if (cont := self.graphics_view.controller()) is not None:
+            self.set_interaction_mode(cont.handler.__class__.__name__)
         self._scene.setBackgroundBrush(QBrush(Qt.GlobalColor.white))
         self.graphics_view.setScene(self._scene)
         self._scene.setSceneRect(QRectF(0, 0, self.scene_width, self.scene_height)) # TODO
@@ -845,7 +910,12 @@ class MainWindow(QMainWindow):
         self._scene.setSceneRect(QRectF(0, 0, self.scene_width, self.scene_height)) # TODO
         self.scroll_area.setWidgetResizable(True)
 
-        self.tool_bar.connectToggleSelection(SelectableRectItem.toggleEnabled)
+        self.tool_bar.connectToggleSelection(lambda: self._scene.toggleSelectEnabled())
+        self.tool_bar.connectToggleLiveLatex(self.toggle_live_latex)
+
+    def toggle_live_latex(self, enabled: bool):
+        """ Enables background compilation and previews of latex while typing in textboxes """
+        self._scene.latex_compiler.setEnabled(enabled)
 
 
     def _add_widgets(self):
@@ -857,6 +927,8 @@ class MainWindow(QMainWindow):
         """ set controller object and connect relevant signals """
         controller.setSceneView(self.graphics_view)
         self.graphics_view.setController(controller)
+        controller.handler_signal.connect(self.set_interaction_mode)
+        self.set_interaction_mode(controller.handler.__class__.__name__)
         self.tool_bar.connectClickedTool(controller.setHandlerFromName)
         self.tool_bar.connectClickedPenWidth(controller.setPenWidth)
         self.tool_bar.connectColorSelection(controller.setPenColor)
@@ -865,6 +937,9 @@ class MainWindow(QMainWindow):
         self.toggle_menu.connectBrushStyle(controller.setBrushStyle)
         self.toggle_menu.connectPenStyle(controller.setPenStyle)
 
+    def set_interaction_mode(self, handler_name: str):
+        self._scene.setInteractionMode(handler_name)
+
     @property
     def scene(self):
         return self.graphics_view.scene()
@@ -1003,27 +1078,14 @@ class MainWindow(QMainWindow):
 
     def load_svg(self, file_path: str):
         """ TODO """
-        builder = SvgBuilder(Path(file_path))
+        builder = SvgBuilder(Path(file_path), self._scene.style_table)
         svg_items = builder.build_scene_items()
-        cont = self.graphics_view.controller()
-        if cont:
-            handler = cont.handler
-            signal = cont.handler_signal
-        else:
-            signal = None
-            handler = None
-
         for svg_item in svg_items:
             #svg_item.setFlag(QGraphicsSvgItem.GraphicsItemFlag.ItemClipsToShape, True) # Make background transparent
-            if signal:
-                selectable_item = SelectableRectItem(svg_item, signal) # TODO
-            else:
-                selectable_item = SelectableRectItem(svg_item) # TODO
+            selectable_item = SelectableRectItem(svg_item)
             self._scene.addItem(selectable_item)
-
-        # hack to 'refresh' signals.. without this loaded graphic won't be selectable untill selector button is pressed
-        if handler and signal:
-            signal.emit(handler.__class__.__name__)
+        # Loading a document is not an edit
+        self._scene.undo_stack.clear()
 
     def toggleMenuWidget(self):
         if self.toggle_menu.isVisible():
@@ -1066,9 +1128,15 @@ class MainWindow(QMainWindow):
                 (Qt.Key.Key_B, lambda: call_click(str(Tools.Brush.name)), "Brush", {"modifiers":Qt.KeyboardModifier.MetaModifier}),
                 (Qt.Key.Key_P, lambda: call_click(str(Tools.Pen.name)), "Pen", {"modifiers":Qt.KeyboardModifier.MetaModifier}),
                 (Qt.Key.Key_S, lambda: call_click(str(Handlers.Selector.name)), "Selector", {"modifiers":Qt.KeyboardModifier.MetaModifier}),
-                (Qt.Key.Key_C, lambda: self._scene.compile_latex(self.get_handeler_signal()), "Compile latex", {"modifiers": Qt.KeyboardModifier.MetaModifier}),
-                (Qt.Key.Key_N, lambda: SelectableRectItem.cycle(self.get_cursor_pos()), "Cycle selectable items under curosr", {"modifiers": Qt.KeyboardModifier.MetaModifier}),
-                (Qt.Key.Key_C, self._scene.copy_to_clipboard, "Copy item", {"modifiers": Qt.KeyboardModifier.ControlModifier}),
-                (Qt.Key.Key_V, lambda: self._scene.paste_from_clipboard(self.get_cursor_pos()), "Paste item", {"modifiers": Qt.KeyboardModifier.ControlModifier}),
+                (Qt.Key.Key_C, lambda: self._scene.compile_latex(), "Compile latex", {"modifiers": Qt.KeyboardModifier.MetaModifier}),
+                (Qt.Key.Key_N, lambda: self._scene.cycle(self.get_cursor_pos()), "Cycle selectable items under curosr", {"modifiers": Qt.KeyboardModifier.MetaModifier}),
+                (Qt.Key.Key_BracketRight, lambda: self._scene.restack_selected(SelectableRectItem.raise_), "Raise item", {"modifiers": Qt.KeyboardModifier.ControlModifier}),
+                (Qt.Key.Key_BracketLeft, lambda: self._scene.restack_selected(SelectableRectItem.lower), "Lower item", {"modifiers": Qt.KeyboardModifier.ControlModifier}),
+                (Qt.Key.Key_BracketRight, lambda: self._scene.restack_selected(SelectableRectItem.bring_to_front), "Bring item to front", {"modifiers": Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.ShiftModifier}),
+                (Qt.Key.Key_BracketLeft, lambda: self._scene.restack_selected(SelectableRectItem.send_to_back), "Send item to back", {"modifiers": Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.ShiftModifier}),
+                (Qt.Key.Key_C, lambda: self._scene.copy_to_clipboard(), "Copy selection", {"modifiers": Qt.KeyboardModifier.ControlModifier}),
+                (Qt.Key.Key_V, lambda: self._scene.paste_from_clipboard(self.get_cursor_pos()), "Paste", {"modifiers": Qt.KeyboardModifier.ControlModifier}),
+                (Qt.Key.Key_G, lambda: self._scene.group_selected(), "Group selection", {"modifiers": Qt.KeyboardModifier.ControlModifier}),
+                (Qt.Key.Key_G, lambda: self._scene.ungroup_selected(), "Ungroup selection", {"modifiers": Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.ShiftModifier}),
                 ]
         return shortcuts
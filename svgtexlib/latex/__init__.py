@@ -0,0 +1,11 @@
+from .cache import CompiledEquation, EquationCache
+from .compiler import EQUATION_CACHE, compile_equation, cached_compile
+from .preview import LatexPreviewCompiler
+
+__all__ = ["CompiledEquation",
+           "EquationCache",
+           "EQUATION_CACHE",
+           "compile_equation",
+           "cached_compile",
+           "LatexPreviewCompiler"
+           ]
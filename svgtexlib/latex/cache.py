@@ -0,0 +1,94 @@
+from __future__ import annotations
+from collections import OrderedDict
+from collections.abc import Callable
+import threading
+
+from PyQt6.QtCore import QByteArray
+
+from ..graphics import StoringQSvgRenderer
+from ..graphics.glyphs import inline_glyphs
+
+
+class CompiledEquation:
+    """ Result of compiling a single equation. Instances are shared between the cache, previews and scene items, do not mutate """
+    def __init__(self, equation: str, svg: bytes, glyph_defs: dict[str, str] | None = None):
+        """
+        svg: compiled svg document, referencing shared glyphs instead of defining them
+        glyph_defs: mapping glyph id -> svg code for the shared glyphs referenced by svg
+        """
+        self.equation = equation
+        self.svg = svg
+        self.glyph_defs = glyph_defs if glyph_defs is not None else {}
+        self._renderer: StoringQSvgRenderer | None = None
+
+    def renderer(self) -> StoringQSvgRenderer:
+        """ Returns the renderer for the compiled svg, shared by every item displaying this equation.
+        Renderers are QObjects and must be created on the gui thread """
+        if self._renderer is None:
+            svg = self.svg.decode("utf-8")
+            contents = QByteArray(inline_glyphs(svg, self.glyph_defs).encode("utf-8"))
+            self._renderer = StoringQSvgRenderer(contents, svg_contents=svg, glyph_defs=self.glyph_defs)
+        return self._renderer
+
+    def size(self) -> int:
+        """ Approximate memory footprint in bytes, shared glyphs are not counted """
+        return len(self.svg)
+
+
+class EquationCache:
+    """
+    Thread safe LRU cache mapping equation text to CompiledEquation. The cache is filled both by the background
+    preview compiler and by explicit compiles, so an equation that was previewed while typing compiles instantly.
+    """
+    def __init__(self, max_entries: int = 500):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CompiledEquation] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, equation: str) -> bool:
+        return equation in self._entries
+
+    def get(self, equation: str) -> CompiledEquation | None:
+        with self._lock:
+            compiled = self._entries.get(equation)
+            if compiled is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(equation)
+            return compiled
+
+    def put(self, compiled: CompiledEquation) -> None:
+        with self._lock:
+            self._entries[compiled.equation] = compiled
+            self._entries.move_to_end(compiled.equation)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compile(self, equation: str, compile_func: Callable[[str], CompiledEquation]) -> CompiledEquation:
+        """ Returns the cached equation or compiles and caches it. Compilation happens outside the lock """
+        if (compiled := self.get(equation)) is not None:
+            return compiled
+        compiled = compile_func(equation)
+        self.put(compiled)
+        return compiled
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes": sum(compiled.size() for compiled in list(self._entries.values()))
+                }
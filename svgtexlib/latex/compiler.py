@@ -0,0 +1,22 @@
+from ..graphics.glyphs import GLYPHS, share_glyphs
+from ..svg.minify import DEFAULT_PRECISION, minify_svg
+from ..utils import tex2svg
+from .cache import CompiledEquation, EquationCache
+
+EQUATION_CACHE = EquationCache()
+
+def compile_equation(equation: str, precision: int | None = DEFAULT_PRECISION) -> CompiledEquation:
+    """
+    Compiles equation to minified svg with glyphs moved to the shared glyph dictionary. Safe to call from worker threads
+
+    precision: number of decimals kept by minification, None disables minification
+    """
+    svg_bytes = tex2svg(equation).read()
+    svg = minify_svg(svg_bytes, precision) if precision is not None else svg_bytes
+    svg, glyph_defs = share_glyphs(svg, GLYPHS)
+    return CompiledEquation(equation, svg.encode("utf-8"), glyph_defs)
+
+def cached_compile(equation: str, cache: EquationCache | None = None) -> CompiledEquation:
+    """ Compiles equation, returning the cached result when the equation has been compiled before """
+    cache = cache if cache is not None else EQUATION_CACHE
+    return cache.get_or_compile(equation, compile_equation)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+from collections.abc import Callable
+import logging
+import weakref
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from ..graphics import DeepCopyableTextbox
+from ..utils import text_is_latex
+from .cache import CompiledEquation, EquationCache
+from .compiler import EQUATION_CACHE, compile_equation
+
+logger = logging.getLogger(__name__)
+
+
+class _CompileSignals(QObject):
+    """ QRunnable is not a QObject, results are emitted through this object which lives on the gui thread """
+    finished = pyqtSignal(int, object) # generation, CompiledEquation | None
+
+
+class _CompileTask(QRunnable):
+    def __init__(self, generation: int, equation: str, cache: EquationCache, signals: _CompileSignals,
+                 is_current: Callable[[int], bool]):
+        super().__init__()
+        self.generation = generation
+        self.equation = equation
+        self.cache = cache
+        self.signals = signals
+        self.is_current = is_current
+
+    def run(self):
+        # The user kept typing while this task was queued
+        if not self.is_current(self.generation):
+            return
+        try:
+            compiled = self.cache.get_or_compile(self.equation, compile_equation)
+        except Exception:
+            logger.debug(f"Preview compile failed: {self.equation}")
+            compiled = None
+        self.signals.finished.emit(self.generation, compiled)
+
+
+class LatexPreviewCompiler(QObject):
+    """
+    Debounced background compiler for live LaTeX previews. Each text change bumps a generation counter, which cancels
+    queued requests and marks results of in flight requests as stale. Compiled equations are stored in the equation cache
+    even when stale, so an explicit compile of the same text is a cache hit.
+
+    A single worker thread is used since mathtext rendering is serialized anyway, the worker therefore never
+    has more than one request queued behind the one it is compiling.
+    """
+    def __init__(self, cache: EquationCache | None = None, delay_ms: int = 400, parent: QObject | None = None):
+        super().__init__(parent)
+        self.cache = cache if cache is not None else EQUATION_CACHE
+        self.delay_ms = delay_ms
+        self._enabled = False
+        self._generation = 0
+        self._pending: str | None = None
+        self._target: weakref.ref[DeepCopyableTextbox] | None = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._dispatch)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._signals = _CompileSignals(self)
+        self._signals.finished.connect(self._on_finished)
+
+    def isEnabled(self) -> bool:
+        return self._enabled
+
+    def setEnabled(self, enabled: bool) -> None:
+        self._enabled = enabled
+        if not enabled:
+            self.cancel()
+
+    def request(self, textbox: DeepCopyableTextbox, text: str) -> None:
+        """ Schedule a preview compile of text for textbox. Supersedes any previous request """
+        if not self._enabled:
+            return
+        self._generation += 1
+        self._set_target(textbox)
+        if not text_is_latex(text):
+            self._timer.stop()
+            self._pending = None
+            textbox.clear_preview()
+            return
+
+        if (compiled := self.cache.get(text)) is not None:
+            self._timer.stop()
+            self._pending = None
+            textbox.show_preview(compiled.renderer())
+            return
+
+        self._pending = text
+        self._timer.start(self.delay_ms)
+
+    def cancel(self) -> None:
+        """ Drops pending requests and removes the current preview """
+        self._generation += 1
+        self._timer.stop()
+        self._pending = None
+        self._pool.clear()
+        if (textbox := self._current_target()) is not None:
+            textbox.clear_preview()
+        self._target = None
+
+    def _set_target(self, textbox: DeepCopyableTextbox) -> None:
+        current = self._current_target()
+        if current is not None and current is not textbox:
+            current.clear_preview()
+        self._target = weakref.ref(textbox)
+
+    def _current_target(self) -> DeepCopyableTextbox | None:
+        return self._target() if self._target is not None else None
+
+    def _is_current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def _dispatch(self) -> None:
+        if self._pending is None:
+            return
+        equation, self._pending = self._pending, None
+        # Tasks that have not started yet are stale by construction
+        self._pool.clear()
+        self._pool.start(_CompileTask(self._generation, equation, self.cache, self._signals, self._is_current))
+
+    def _on_finished(self, generation: int, compiled: CompiledEquation | None) -> None:
+        if not self._is_current(generation):
+            return
+        textbox = self._current_target()
+        if textbox is None or textbox.scene() is None:
+            return
+        if compiled is None:
+            # The latest text does not compile, a preview of older text would not match it
+            textbox.clear_preview()
+            return
+        textbox.show_preview(compiled.renderer())
@@ -1,7 +1,9 @@
 from .load_svg import SvgBuilder
 from .save_svg import scene_to_svg
+from .minify import minify_svg
 
 __all__ = ["SvgBuilder",
-         "scene_to_svg"
+         "scene_to_svg",
+         "minify_svg"
            ]
 
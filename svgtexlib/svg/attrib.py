@@ -5,6 +5,8 @@ from PyQt6.QtGui import QColor, QPainterPath, QPen, QBrush
 from PyQt6.QtCore import Qt
 from lxml import etree
 
+from ..graphics.styles import StyleTable
+
 """
 Current approach for setting svg item tools
 
@@ -21,12 +23,16 @@ TODO:
 
 brush_defaults = {"fill": None, "stroke": "black", "stroke-width": None, "stroke-linecap": None}
 
-def tools_from_attrib(attrib: etree._Element.attrib) -> tuple[QPen, QBrush]:
+def tools_from_attrib(attrib: etree._Element.attrib, style_table: StyleTable | None = None) -> tuple[QPen, QBrush]:
+    """ Returns tools interned in style_table, elements with the same style share one pen and brush. They must not be
+    modified """
     pen, brush = QPen(QColor("white")), QBrush(Qt.BrushStyle.SolidPattern)
     pen = build_pen_from_attrib(attrib, pen)
     brush = build_brush_from_attrib(attrib, brush)
     pen, brush = build_tools_from_style(attrib.get("style", ""), pen, brush)
-    return pen, brush
+    if style_table is None:
+        return pen, brush
+    return style_table.pen(pen), style_table.brush(brush)
 
 def build_pen_from_attrib(attrib: etree._Element.attrib, pen: QPen) -> QPen:
     stroke_color = attrib.get('stroke', brush_defaults["stroke"])
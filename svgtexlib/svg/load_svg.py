@@ -6,9 +6,12 @@ from PyQt6.QtGui import QFont, QTransform
 from PyQt6.QtCore import QLineF, QByteArray, QPointF, QRectF
 
 from ..utils import build_transform
+from ..graphics.styles import StyleTable
+from ..graphics.glyphs import GLYPHS, GLYPH_ID_PREFIX, inline_glyphs, referenced_glyphs
 from .attrib import parse_d_attribute, tools_from_attrib
 from ..graphics import (DeepCopyableEllipseItem, DeepCopyableSvgItem, StoringQSvgRenderer,
-                        DeepCopyablePathItem,DeepCopyableRectItem, DeepCopyableLineItem, DeepCopyableTextbox)
+                        DeepCopyablePathItem,DeepCopyableRectItem, DeepCopyableLineItem, DeepCopyableTextbox, DeepCopyableConnectorItem, DeepCopyableItemGroup,
+                        DeepCopyableArrowItem)
 
 class SvgBuilder:
     """ Class for building a scene with selectable items from svg document
@@ -17,7 +20,9 @@ class SvgBuilder:
           3. Fix parse patterns
           4. Fix load svg
     """
-    def __init__(self, source: Path | bytes):
+    def __init__(self, source: Path | bytes, style_table: StyleTable | None = None):
+        """ style_table: pens and brushes of the items are interned there, e.g the table of the scene they are added to """
+        self.style_table = style_table if style_table is not None else StyleTable()
         self.svg_namespace = {'svg': 'http://www.w3.org/2000/svg'}
         self.scene_items = []
 
@@ -44,9 +49,16 @@ class SvgBuilder:
         """ TODO: this does not take into account viewport sizes """
         if self.root is None:
             return []
+        self.register_glyphs()
         self.parse_element(self.root, {}, None)
         return self.scene_items
 
+    def register_glyphs(self):
+        """ Adds shared equation glyphs defined in the document <defs> to the glyph dictionary """
+        for path in self.root.iterfind('.//svg:defs/svg:path', namespaces=self.svg_namespace):
+            if path.attrib.get("id", "").startswith(GLYPH_ID_PREFIX):
+                GLYPHS.register(path)
+
     def has_ancestor(self, tag: etree._Element) -> bool:
         has_g_ancestor = False
         parent = tag.getparent()
@@ -104,6 +116,21 @@ class SvgBuilder:
                 item = build_svg_item(e, parent_attr, parent_transform)
                 self.scene_items.append(item)
                 continue
+            if self.element_name(e) == "g" and e.attrib.get("metadata-custom-type", None) == "DeepCopyableConnectorItem":
+                item = build_connector(e, element_attr, element_transform, self.style_table)
+                if item:
+                    self.scene_items.append(item)
+                continue
+            if self.element_name(e) == "g" and e.attrib.get("metadata-custom-type", None) == "DeepCopyableArrowItem":
+                item = build_arrow(e, element_attr, element_transform, self.style_table)
+                if item:
+                    self.scene_items.append(item)
+                continue
+            if self.element_name(e) == "g" and e.attrib.get("metadata-custom-type", None) == "DeepCopyableItemGroup":
+                item = self.build_group(e, element_attr, element_transform)
+                if item:
+                    self.scene_items.append(item)
+                continue
             if self.element_name(e) == "defs":
                 defs.update(
                         self.parse_defs_element(e, element_attr, element_transform)
@@ -134,7 +161,7 @@ class SvgBuilder:
                         use_transform = combine_parent_child_transform(use_transform, element_transform)
                         # Defined element attributes default to those defined in use tag
                         defs_item_attr = element_attr | defs_item_attr
-                        item = func(defs_item, defs_item_attr, use_transform)
+                        item = func(defs_item, defs_item_attr, use_transform, self.style_table)
                         if item:
                             self.scene_items.append(item)
                 continue
@@ -143,13 +170,23 @@ class SvgBuilder:
             if func is None:
                 self.parse_element(e, element_attr, parent_transform=element_transform)
                 continue
-            item = func(e, element_attr, element_transform)
+            item = func(e, element_attr, element_transform, self.style_table)
             if item:
                 self.scene_items.append(item)
         return None
 
 
 
+    def build_group(self, element: etree._Element, parent_attr, parent_transform: QTransform | None) -> DeepCopyableItemGroup | None:
+        """ Builds the items of a DeepCopyableItemGroup element and groups them """
+        scene_items, self.scene_items = self.scene_items, []
+        try:
+            self.parse_element(element, parent_attr, parent_transform)
+            members = self.scene_items
+        finally:
+            self.scene_items = scene_items
+        return DeepCopyableItemGroup(members) if members else None
+
     def element_name(self, element: etree._Element) -> str:
         """ Returns element name from element """
         return element.tag.split("}")[-1]
@@ -178,9 +215,10 @@ def build_svg_item(element: etree._Element, parent_attrs: dict, parent_transform
     body_str = re.sub(pattern[::-1], '', body_str[::-1], count=1)
     body_str = body_str[::-1]
 
-    doc_bytes = doc_header_bytes + body_str.encode('utf-8')
+    glyph_defs = GLYPHS.defs_for(referenced_glyphs(body_str))
+    doc_bytes = doc_header_bytes + inline_glyphs(body_str, glyph_defs).encode('utf-8')
     q_byte_array = QByteArray(doc_bytes)
-    renderer = StoringQSvgRenderer(q_byte_array)
+    renderer = StoringQSvgRenderer(q_byte_array, svg_contents=doc_header + body_str, glyph_defs=glyph_defs)
     item = DeepCopyableSvgItem()
     item.setSharedRenderer(renderer)
     if transform:
@@ -198,10 +236,11 @@ def combine_parent_child_transform(child_transform: str | None, parent_transform
             return build_transform(child_transform)
     return parent_transform
 
-def build_ellipse(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None) -> DeepCopyableEllipseItem:
+def build_ellipse(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None,
+                  style_table: StyleTable | None = None) -> DeepCopyableEllipseItem:
     transform = combine_parent_child_transform(element.attrib.get("transform", None), parent_transform)
     attrs = parent_attrs | dict(element.attrib)
-    pen, brush = tools_from_attrib(element.attrib)
+    pen, brush = tools_from_attrib(element.attrib, style_table)
     rx, ry = float(attrs['rx']), float(attrs['ry'])
     cy, cx = float(attrs['cy']), float(attrs['cx'])
     x, y = cx - rx, cy - ry
@@ -214,10 +253,11 @@ def build_ellipse(element: etree._Element, parent_attrs: dict, parent_transform:
         ellipse_item.setTransform(transform)
     return ellipse_item
 
-def build_rect(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None):
+def build_rect(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None,
+               style_table: StyleTable | None = None):
     transform = combine_parent_child_transform(element.attrib.get("transform", None), parent_transform)
     attrs = parent_attrs | dict(element.attrib)
-    pen, brush = tools_from_attrib(element.attrib)
+    pen, brush = tools_from_attrib(element.attrib, style_table)
 
     x, y = float(attrs.get('x', 0)), float(attrs.get('y', '0'))
     width, height = float(attrs['width']), float(attrs['height'])
@@ -230,13 +270,14 @@ def build_rect(element: etree._Element, parent_attrs: dict, parent_transform: QT
         rect_item.setTransform(transform)
     return rect_item
 
-def build_path(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None):
+def build_path(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None,
+               style_table: StyleTable | None = None):
     transform = combine_parent_child_transform(element.attrib.get("transform", None), parent_transform)
     attrs = parent_attrs | dict(element.attrib)
     path_str = attrs.get("d", None)
     if path_str is None:
         return
-    pen, brush = tools_from_attrib(element.attrib)
+    pen, brush = tools_from_attrib(element.attrib, style_table)
     path = parse_d_attribute(path_str)
 
     path_svg = DeepCopyablePathItem(path)
@@ -246,14 +287,15 @@ def build_path(element: etree._Element, parent_attrs: dict, parent_transform: QT
     path_svg.setBrush(brush)
     return path_svg
 
-def build_line(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None):
+def build_line(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None,
+               style_table: StyleTable | None = None):
     transform = combine_parent_child_transform(element.attrib.get("transform", None), parent_transform)
     attrs = parent_attrs | dict(element.attrib)
     points_str = attrs.get("points", None)
 
     if points_str is None:
         return
-    pen, _ = tools_from_attrib(element.attrib)
+    pen, _ = tools_from_attrib(element.attrib, style_table)
     points = [float(point) for point in points_str.split(" ")]
     line_svg = DeepCopyableLineItem()
     line_svg.setLine(
@@ -264,7 +306,48 @@ def build_line(element: etree._Element, parent_attrs: dict, parent_transform: QT
         line_svg.setTransform(transform)
     return line_svg
 
-def build_textbox(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None):
+def build_connector(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None,
+                    style_table: StyleTable | None = None) -> DeepCopyableConnectorItem | None:
+    """ Builds a connector from the polylines of a DeepCopyableConnectorItem group, equal points become shared vertices """
+    transform = combine_parent_child_transform(element.attrib.get("transform", None), parent_transform)
+    polylines, pen = [], None
+    for polyline in element:
+        if not isinstance(polyline.tag, str) or polyline.tag.split("}")[-1] != "polyline":
+            continue
+        values = [float(value) for value in polyline.attrib.get("points", "").replace(",", " ").split()]
+        polylines.append([QPointF(values[i], values[i + 1]) for i in range(0, len(values) - 1, 2)])
+        if pen is None:
+            pen, _ = tools_from_attrib(polyline.attrib, style_table)
+    if not polylines:
+        return None
+    connector_item = DeepCopyableConnectorItem.from_polylines(polylines)
+    if pen is not None:
+        connector_item.setPen(pen)
+    if transform:
+        connector_item.setTransform(transform)
+    return connector_item
+
+def build_arrow(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None,
+                style_table: StyleTable | None = None) -> DeepCopyableArrowItem | None:
+    """ Builds an arrow from the shaft polyline of a DeepCopyableArrowItem group, the head is rebuilt from its metadata """
+    transform = combine_parent_child_transform(element.attrib.get("transform", None), parent_transform)
+    shaft = next((child for child in element if isinstance(child.tag, str) and child.tag.split("}")[-1] == "polyline"), None)
+    if shaft is None:
+        return None
+    points = [float(value) for value in shaft.attrib.get("points", "").replace(",", " ").split()]
+    if len(points) < 4:
+        return None
+    arrow_item = DeepCopyableArrowItem(QLineF(points[0], points[1], points[2], points[3]),
+                                       head_length=float(element.attrib.get("metadata-head-length", 20)),
+                                       head_angle=float(element.attrib.get("metadata-head-angle", 30)))
+    pen, _ = tools_from_attrib(shaft.attrib, style_table)
+    arrow_item.setPen(pen)
+    if transform:
+        arrow_item.setTransform(transform)
+    return arrow_item
+
+def build_textbox(element: etree._Element, parent_attrs: dict, parent_transform: QTransform | None,
+                  style_table: StyleTable | None = None):
     transform = combine_parent_child_transform(element.attrib.get("transform", None), parent_transform)
     attrs = parent_attrs | dict(element.attrib)
     x, y = float(element.attrib['x']), float(element.attrib['y'])
@@ -279,7 +362,7 @@ def build_textbox(element: etree._Element, parent_attrs: dict, parent_transform:
     width_str, height_str = clip_rect.split(" ")
     width, height = float(width_str), float(height_str)
     rect = QRectF(x, y, width, height)
-    pen, brush = tools_from_attrib(element.attrib)
+    pen, brush = tools_from_attrib(element.attrib, style_table)
 
     textbox_svg = DeepCopyableTextbox(rect, text=element_text)
     if transform:
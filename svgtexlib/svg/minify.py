@@ -0,0 +1,126 @@
+import re
+
+from lxml import etree
+
+"""
+Minification of compiled equation svg. Matplotlib output carries metadata, a stylesheet, comments, clip paths,
+pretty printing and high precision numbers, none of which affect how an equation is displayed.
+"""
+
+DEFAULT_PRECISION = 3
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+NUMERIC_ATTRIBUTES = ("d", "transform", "points", "viewBox", "x", "y", "x1", "y1", "x2", "y2",
+                      "width", "height", "cx", "cy", "r", "rx", "ry")
+_number_pattern = re.compile(r'-?\d*\.\d+(?:[eE][-+]?\d+)?')
+_reference_pattern = re.compile(r'url\(#([^)]+)\)')
+
+
+def _tag(element: etree._Element) -> str:
+    return element.tag.split("}")[-1] if isinstance(element.tag, str) else ""
+
+def _round_numbers(value: str, precision: int) -> str:
+    def repl(match: re.Match) -> str:
+        number = f"{round(float(match.group(0)), precision):.{precision}f}".rstrip("0").rstrip(".")
+        return "0" if number in ("-0", "") else number
+    return _number_pattern.sub(repl, " ".join(value.split()))
+
+def _round_transform(value: str, precision: int) -> str:
+    """ Translations are coordinates and are rounded like them. Scale, rotate and matrix factors multiply coordinates,
+    e.g matplotlib glyphs use scale(0.015625), so they keep significant digits instead of decimals """
+    def repl(match: re.Match) -> str:
+        name, args = match.group(1), match.group(2)
+        if name == "translate":
+            return f"{name}({_round_numbers(args, precision)})"
+        numbers = [f"{float(arg):.{max(precision, 6)}g}" for arg in re.split(r'[\s,]+', args.strip()) if arg]
+        return f"{name}({' '.join(numbers)})"
+    return re.sub(r'([a-zA-Z]+)\s*\(([^)]*)\)', repl, value)
+
+def _is_invisible(element: etree._Element) -> bool:
+    """ True for paths that are neither filled nor stroked, e.g matplotlib's transparent figure background """
+    style = {k.strip(): v.strip() for k, _, v in (p.partition(":") for p in element.get("style", "").split(";")) if k.strip()}
+    fill = style.get("fill", element.get("fill"))
+    stroke = style.get("stroke", element.get("stroke", "none"))
+    return _tag(element) == "path" and fill == "none" and stroke == "none"
+
+def _referenced_ids(root: etree._Element) -> set[str]:
+    ids = set()
+    for element in root.iter():
+        for key, value in element.attrib.items():
+            if key in (XLINK_HREF, "href") and value.startswith("#"):
+                ids.add(value[1:])
+            else:
+                ids.update(_reference_pattern.findall(value))
+    return ids
+
+def _flatten_group(group: etree._Element) -> None:
+    """ Splices attribute free groups into their parent, and pushes the transform of single child groups onto the child """
+    parent = group.getparent()
+    if parent is None:
+        return
+    children = [child for child in group if isinstance(child.tag, str)]
+    attributes = dict(group.attrib)
+    if not attributes:
+        index = parent.index(group)
+        parent.remove(group)
+        for offset, child in enumerate(children):
+            parent.insert(index + offset, child)
+    elif list(attributes.keys()) == ["transform"] and len(children) == 1:
+        child = children[0]
+        child_transform = child.get("transform")
+        transform = attributes["transform"] if child_transform is None else f'{attributes["transform"]} {child_transform}'
+        child.set("transform", transform)
+        parent.replace(group, child)
+
+def minify_svg(svg: bytes | str, precision: int = DEFAULT_PRECISION, strip_clip_paths: bool = True) -> str:
+    """
+    Returns minified svg document
+
+    -- Params --
+    svg: svg document
+    precision: number of decimals kept for coordinates and translations
+    strip_clip_paths: remove clip paths. Equation output is clipped to the figure, which has no visible effect
+    """
+    parser = etree.XMLParser(remove_comments=True, remove_blank_text=True)
+    root = etree.fromstring(svg.encode("utf-8") if isinstance(svg, str) else svg, parser)
+
+    for element in list(root.iter()):
+        if not isinstance(element.tag, str):
+            continue
+        tag = _tag(element)
+        if tag in ("metadata", "style") or _is_invisible(element):
+            element.getparent().remove(element)
+            continue
+        if strip_clip_paths and "clip-path" in element.attrib:
+            del element.attrib["clip-path"]
+
+    # Unused definitions and ids
+    referenced = _referenced_ids(root)
+    for element in list(root.iter()):
+        if not isinstance(element.tag, str) or (parent := element.getparent()) is None:
+            continue
+        element_id = element.get("id")
+        if element_id is not None and element_id not in referenced:
+            if _tag(parent) == "defs" or _tag(element) == "clipPath":
+                parent.remove(element)
+                continue
+            del element.attrib["id"]
+    for defs in list(root.iter(f"{{{SVG_NS}}}defs")):
+        if len(defs) == 0:
+            defs.getparent().remove(defs)
+
+    # Deepest groups first so nested trivial groups collapse completely
+    for group in reversed(list(root.iter(f"{{{SVG_NS}}}g"))):
+        _flatten_group(group)
+
+    for element in root.iter():
+        if not isinstance(element.tag, str):
+            continue
+        for key in NUMERIC_ATTRIBUTES:
+            if (value := element.get(key)) is None:
+                continue
+            if key == "transform":
+                element.set(key, _round_transform(value, precision))
+            else:
+                element.set(key, _round_numbers(value, precision))
+    return etree.tostring(root, encoding="unicode")
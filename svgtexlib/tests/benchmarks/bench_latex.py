@@ -0,0 +1,144 @@
+"""
+Latex compile benchmarks. Measures cold and warm per equation latency, batch throughput of
+TexGraphicsScene.compile_latex, equation cache hit rates and peak memory. Results are written as json so runs can be
+compared between releases.
+
+    python -m svgtexlib.tests.benchmarks.bench_latex --repeat 3 --output latex.json
+"""
+import argparse as arg
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import matplotlib
+from PyQt6.QtCore import QRectF, QT_VERSION_STR
+from PyQt6.QtWidgets import QApplication
+
+from ...graphics import DeepCopyableSvgItem, DeepCopyableTextbox, SelectableRectItem
+from ...gui.window import TexGraphicsScene
+from ...latex import EquationCache, cached_compile, compile_equation
+from .corpus import CORPUS
+
+
+def _summary(samples: list[float]) -> dict:
+    """ Latency summary in milliseconds """
+    ms = sorted(sample * 1000 for sample in samples)
+    p95 = statistics.quantiles(ms, n=20, method="inclusive")[-1] if len(ms) > 1 else ms[0]
+    return {"n": len(ms),
+            "mean_ms": statistics.fmean(ms),
+            "median_ms": statistics.median(ms),
+            "p95_ms": p95,
+            "min_ms": ms[0],
+            "max_ms": ms[-1]
+            }
+
+def _peak_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+def bench_latency(equations: list[str], repeat: int) -> dict:
+    """ Cold latency compiles every equation from scratch, warm latency looks them up in a filled cache """
+    cold, warm, renderer = [], [], []
+    cache = EquationCache()
+    for _ in range(repeat):
+        for equation in equations:
+            start = time.perf_counter()
+            compiled = compile_equation(equation)
+            cold.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            compiled.renderer()
+            renderer.append(time.perf_counter() - start)
+            cache.put(compiled)
+
+    for _ in range(repeat):
+        for equation in equations:
+            start = time.perf_counter()
+            cached_compile(equation, cache).renderer()
+            warm.append(time.perf_counter() - start)
+    return {"cold": _summary(cold), "warm": _summary(warm), "renderer": _summary(renderer)}
+
+def _populate_scene(scene: TexGraphicsScene, equations: list[str]) -> None:
+    for i, equation in enumerate(equations):
+        textbox = DeepCopyableTextbox(QRectF(0, i * 40, 300, 30), equation)
+        scene.addItem(SelectableRectItem(textbox))
+
+def _compile_batch(equations: list[str], cache: EquationCache) -> tuple[float, int]:
+    scene = TexGraphicsScene(equation_cache=cache)
+    _populate_scene(scene, equations)
+    start = time.perf_counter()
+    scene.compile_latex()
+    elapsed = time.perf_counter() - start
+    compiled = sum(1 for item in scene.items() if isinstance(item, DeepCopyableSvgItem))
+    if compiled != len(equations):
+        raise RuntimeError(f"Compiled {compiled} of {len(equations)} equations")
+    return elapsed, compiled
+
+def bench_batch(equations: list[str], repeat: int) -> dict:
+    """ Compiles a scene of the distinct equations with an empty cache (cold), then a scene of every equation repeat
+    times with the filled cache (warm). The cold pass holds each equation once, so none of its compiles is a cache hit """
+    distinct = list(dict.fromkeys(equations))
+    cache = EquationCache()
+    result = {}
+    for name, batch in (("cold", distinct), ("warm", equations * repeat)):
+        elapsed, compiled = _compile_batch(batch, cache)
+        result[name] = {"seconds": elapsed,
+                        "equations": compiled,
+                        "equations_per_second": compiled / elapsed if elapsed else 0.0,
+                        "cache": cache.stats()
+                        }
+
+    # Separate pass, tracemalloc slows allocation heavy code down and would skew the timings above
+    cache = EquationCache()
+    tracemalloc.start()
+    _compile_batch(distinct, cache)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result["peak_traced_bytes"] = peak
+    return result
+
+def run(repeat: int = 3) -> dict:
+    app = QApplication.instance() or QApplication([])
+
+    results = {"meta": {"timestamp": datetime.now(timezone.utc).isoformat(),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "qt": QT_VERSION_STR,
+                        "qt_platform": app.platformName(),
+                        "matplotlib": matplotlib.__version__,
+                        "repeat": repeat
+                        },
+               "latency": {},
+               "batch": {}
+               }
+    for category, equations in CORPUS.items():
+        results["latency"][category] = bench_latency(equations, repeat)
+        results["batch"][category] = bench_batch(equations, repeat)
+    everything = [equation for equations in CORPUS.values() for equation in equations]
+    results["batch"]["mixed"] = bench_batch(everything, repeat)
+    results["peak_rss_bytes"] = _peak_rss_bytes()
+    return results
+
+parser = arg.ArgumentParser(prog="bench_latex", description="latex compile benchmarks")
+parser.add_argument("-r", "--repeat", action="store", type=int, default=3, help="times each equation is compiled")
+parser.add_argument("-o", "--output", action="store", help="write json results to file instead of stdout")
+
+def main():
+    args = parser.parse_args()
+    results = json.dumps(run(args.repeat), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(results)
+    else:
+        print(results)
+
+if __name__ == "__main__":
+    main()
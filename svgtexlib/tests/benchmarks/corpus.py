@@ -0,0 +1,38 @@
+"""
+Representative equations for the latex benchmarks. Equations are compiled with matplotlib mathtext, which has no
+matrix environment, matrices are written as stacked \\genfrac columns inside delimiters.
+"""
+
+SHORT_INLINE = [
+    r"$x^2$",
+    r"$\alpha + \beta$",
+    r"$e^{i\pi} + 1 = 0$",
+    r"$f(x) = \sin x$",
+    r"$a_n \to 0$",
+    r"$\nabla \cdot E = \rho$",
+    r"$\lambda \in \mathbb{C}$",
+    r"$\|v\|_2 \leq 1$",
+]
+
+LONG_DISPLAY = [
+    r"$\int_0^\infty e^{-x^2}\,dx = \frac{\sqrt{\pi}}{2}$",
+    r"$\sum_{n=1}^{\infty} \frac{1}{n^2} = \frac{\pi^2}{6}$",
+    r"$\left( \sum_{k=1}^{n} a_k b_k \right)^2 \leq \left( \sum_{k=1}^{n} a_k^2 \right) \left( \sum_{k=1}^{n} b_k^2 \right)$",
+    r"$\hat{f}(\xi) = \int_{-\infty}^{\infty} f(x)\, e^{-2\pi i x \xi}\, dx$",
+    r"$\mathcal{L}\{f\}(s) = \int_0^\infty f(t) e^{-st}\,dt = \lim_{T \to \infty} \int_0^T f(t) e^{-st}\,dt$",
+    r"$\binom{n}{k} = \frac{n!}{k!\,(n-k)!} = \prod_{i=1}^{k} \frac{n - k + i}{i}$",
+]
+
+MATRIX_HEAVY = [
+    r"$\left[ \genfrac{}{}{0}{}{a_{11}}{a_{21}} \; \genfrac{}{}{0}{}{a_{12}}{a_{22}} \right]$",
+    r"$\left[ \genfrac{}{}{0}{}{\cos\theta}{\sin\theta} \; \genfrac{}{}{0}{}{-\sin\theta}{\cos\theta} \right] \left[ \genfrac{}{}{0}{}{x}{y} \right]$",
+    r"$\det \left| \genfrac{}{}{0}{}{a}{c} \; \genfrac{}{}{0}{}{b}{d} \right| = ad - bc$",
+    r"$\left( \genfrac{}{}{0}{}{1}{\genfrac{}{}{0}{}{0}{0}} \; \genfrac{}{}{0}{}{0}{\genfrac{}{}{0}{}{1}{0}} \; \genfrac{}{}{0}{}{0}{\genfrac{}{}{0}{}{0}{1}} \right) = I_3$",
+    r"$A^{-1} = \frac{1}{ad - bc} \left[ \genfrac{}{}{0}{}{d}{-c} \; \genfrac{}{}{0}{}{-b}{a} \right]$",
+]
+
+CORPUS: dict[str, list[str]] = {
+    "short_inline": SHORT_INLINE,
+    "long_display": LONG_DISPLAY,
+    "matrix_heavy": MATRIX_HEAVY,
+}
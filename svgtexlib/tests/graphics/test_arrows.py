@@ -0,0 +1,47 @@
+import unittest
+
+from PyQt6.QtCore import QLineF, QPointF, Qt
+from PyQt6.QtGui import QPen
+from PyQt6.QtWidgets import QApplication
+
+from svgtexlib.graphics import DeepCopyableArrowItem, SelectableRectItem, SelectableScene
+from svgtexlib.svg import SvgBuilder
+
+app = QApplication.instance() or QApplication([])
+
+class TestArrowItem(unittest.TestCase):
+    def setUp(self):
+        self.arrow = DeepCopyableArrowItem(QLineF(0, 0, 100, 0), head_length=10, head_angle=45)
+        self.arrow.setPen(QPen(Qt.GlobalColor.black, 2))
+
+    def test_one_scene_item(self):
+        scene = SelectableScene()
+        scene.addItem(SelectableRectItem(self.arrow))
+        self.assertEqual(len(scene.items()), 2)
+
+    def test_exact_geometry(self):
+        left, right = self.arrow.head_points()
+        self.assertAlmostEqual(left.x(), 100 - 10 * 0.5 ** 0.5)
+        self.assertAlmostEqual(abs(left.y()), 10 * 0.5 ** 0.5)
+        self.assertAlmostEqual(left.y(), -right.y())
+        self.assertTrue(self.arrow.shape().contains(QPointF(50, 0)))
+        self.assertFalse(self.arrow.shape().contains(QPointF(50, 5)))
+        self.assertTrue(self.arrow.boundingRect().contains(left))
+        self.assertLess(self.arrow.boundingRect().height(), 2 * 10 * 0.5 ** 0.5 + 3)
+
+    def test_geometry_follows_line(self):
+        bounds = self.arrow.boundingRect()
+        self.arrow.setLine(QLineF(0, 0, 0, 200))
+        self.assertNotEqual(self.arrow.boundingRect(), bounds)
+        self.assertTrue(self.arrow.shape().contains(QPointF(0, 150)))
+
+    def test_svg_round_trip(self):
+        document = f'<svg xmlns="http://www.w3.org/2000/svg">{self.arrow.to_svg({})}</svg>'
+        loaded, = SvgBuilder(document.encode('utf-8')).build_scene_items()
+        self.assertIsInstance(loaded, DeepCopyableArrowItem)
+        self.assertEqual(loaded.line(), self.arrow.line())
+        self.assertEqual((loaded.head_length, loaded.head_angle), (10, 45))
+        self.assertEqual(loaded.pen().widthF(), 2)
+
+if __name__ == "__main__":
+    unittest.main()
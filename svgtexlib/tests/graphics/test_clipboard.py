@@ -0,0 +1,79 @@
+import unittest
+
+from PyQt6.QtCore import QByteArray, QPointF
+from PyQt6.QtGui import QPainterPath, QTransform
+from PyQt6.QtWidgets import QApplication
+
+from svgtexlib.graphics import (DeepCopyableLineItem, DeepCopyablePathItem, DeepCopyableRectItem, DeepCopyableSvgItem, SelectableRectItem,
+                                SelectableScene, StoringQSvgRenderer)
+from svgtexlib.graphics.clipboard import Clipboard
+
+app = QApplication.instance() or QApplication([])
+
+SVG = '<svg xmlns="http://www.w3.org/2000/svg" width="20" height="10"><rect width="20" height="10"/></svg>'
+
+class TestClipboard(unittest.TestCase):
+    def setUp(self):
+        self.scene = SelectableScene()
+        self.renderer = StoringQSvgRenderer(QByteArray(SVG.encode('utf-8')))
+        self.equations = [SelectableRectItem(DeepCopyableSvgItem(self.renderer)) for _ in range(3)]
+        path = QPainterPath()
+        path.lineTo(30, 40)
+        self.path = SelectableRectItem(DeepCopyablePathItem(path))
+        for i, item in enumerate(self.equations + [self.path]):
+            self.scene.addItem(item)
+            item.setPos(i * 50, 100)
+        self.clipboard = Clipboard()
+        self.clipboard.copy(self.equations + [self.path])
+
+    def test_paste_repeatedly_shares_payloads(self):
+        first = self.clipboard.paste(self.scene, QPointF(0, 500))
+        second = self.clipboard.paste(self.scene, QPointF(0, 1000))
+        self.assertEqual(len(first), 4)
+        for pasted in (first, second):
+            self.assertTrue(all(item.item.renderer() is self.renderer for item in pasted[:3]))
+            self.assertEqual(pasted[3].item.path(), self.path.item.path())
+        self.assertEqual(second[1].pos() - second[0].pos(), QPointF(50, 0))
+        self.assertEqual(second[0].pos() - first[0].pos(), QPointF(0, 500))
+        self.assertEqual(len(self.scene.selectables_in(self.scene.itemsBoundingRect())), 12)
+
+    def test_paste_is_one_undo_step(self):
+        pasted = self.clipboard.paste(self.scene, QPointF(0, 500))
+        self.scene.undo_stack.undo()
+        self.assertTrue(all(item.scene() is None for item in pasted))
+        self.assertTrue(all(item.scene() is self.scene for item in self.equations))
+
+    def test_copy_keeps_transforms(self):
+        item = SelectableRectItem(DeepCopyableRectItem(0, 0, 100, 50))
+        self.scene.addItem(item)
+        item.setTransform(QTransform().rotate(30))
+        clipboard = Clipboard()
+        clipboard.copy([item])
+        # Later edits do not change the clipboard
+        item.setTransform(QTransform().rotate(60))
+        pasted, = clipboard.paste(self.scene, item.item.sceneBoundingRect().topLeft())
+        self.assertEqual(pasted.transform(), QTransform().rotate(30))
+
+    def test_moved_line_keeps_geometry(self):
+        line = SelectableRectItem(DeepCopyableLineItem(0, 0, 40, 40))
+        self.scene.addItem(line)
+        line.setPos(200, 300)
+        clipboard = Clipboard()
+        clipboard.copy([line])
+        pasted, = clipboard.paste(self.scene, line.item.sceneBoundingRect().topLeft() + QPointF(10, 0))
+        self.assertEqual(pasted.item.sceneBoundingRect(), line.item.sceneBoundingRect().translated(10, 0))
+
+    def test_paste_keeps_stacking_order(self):
+        back = SelectableRectItem(DeepCopyableRectItem(0, 0, 100, 100))
+        front = SelectableRectItem(DeepCopyableSvgItem(self.renderer))
+        for item in (back, front):
+            self.scene.addItem(item)
+        self.assertLess(back.zValue(), front.zValue())
+        clipboard = Clipboard()
+        clipboard.copy([front, back])
+        pasted_back, pasted_front = sorted(clipboard.paste(self.scene, QPointF(0, 500)), key=lambda item: item.zValue())
+        self.assertIsInstance(pasted_back.item, DeepCopyableRectItem)
+        self.assertIsInstance(pasted_front.item, DeepCopyableSvgItem)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from PyQt6.QtCore import QPointF
+from PyQt6.QtWidgets import QApplication
+
+from svgtexlib.graphics import ConnectorGraph, DeepCopyableConnectorItem, SelectableRectItem, SelectableScene
+from svgtexlib.svg import SvgBuilder
+
+app = QApplication.instance() or QApplication([])
+
+def grid_polylines(n):
+    """ n x n grid of points, joined by horizontal and vertical polylines """
+    rows = [[QPointF(x * 10, y * 10) for x in range(n)] for y in range(n)]
+    columns = [[QPointF(x * 10, y * 10) for y in range(n)] for x in range(n)]
+    return rows + columns
+
+class TestConnectorGraph(unittest.TestCase):
+    def test_polylines_cover_every_edge_once(self):
+        graph = ConnectorGraph.from_polylines(grid_polylines(6))
+        self.assertEqual(len(graph), 36)
+        self.assertEqual(len(graph.edges()), 2 * 6 * 5)
+        covered = [tuple(sorted(edge)) for chain in graph.polylines() for edge in zip(chain, chain[1:])]
+        self.assertEqual(sorted(covered), sorted(graph.edges()))
+
+    def test_moving_a_shared_vertex(self):
+        scene = SelectableScene()
+        connector = DeepCopyableConnectorItem.from_polylines(grid_polylines(3))
+        scene.addItem(SelectableRectItem(connector))
+        center = connector.vertex_at(QPointF(10, 10), 1)
+        self.assertEqual(len(connector.graph.neighbours(center)), 4)
+
+        connector.move_vertex(center, QPointF(100, 100))
+        self.assertTrue(connector.path().boundingRect().contains(QPointF(100, 100)))
+        self.assertEqual(scene.snap_index.nearest(QPointF(99, 99), 5), QPointF(100, 100))
+        self.assertIsNone(scene.snap_index.nearest(QPointF(10, 10), 5))
+
+    def test_svg_round_trip(self):
+        scene = SelectableScene()
+        connector = DeepCopyableConnectorItem.from_polylines(grid_polylines(4))
+        scene.addItem(SelectableRectItem(connector))
+        svg = '<svg xmlns="http://www.w3.org/2000/svg">\n' + connector.to_svg({}) + '</svg>'
+        self.assertLess(svg.count("<polyline"), connector.edge_count())
+
+        loaded, = SvgBuilder(svg.encode("utf-8")).build_scene_items()
+        self.assertIsInstance(loaded, DeepCopyableConnectorItem)
+        self.assertEqual(len(loaded.graph), len(connector.graph))
+        self.assertEqual(loaded.edge_count(), connector.edge_count())
+
+if __name__ == "__main__":
+    unittest.main()
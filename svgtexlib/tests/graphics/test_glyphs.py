@@ -0,0 +1,65 @@
+import threading
+import unittest
+
+from svgtexlib.graphics.glyphs import GlyphDictionary, share_glyphs, inline_glyphs, referenced_glyphs
+
+SVG = b'''<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">
+ <g>
+  <defs>
+   <path id="DejaVuSans-Oblique-78" d="M 0 0
+L 10 10
+z" transform="scale(0.015625)"/>
+  </defs>
+  <use xlink:href="#DejaVuSans-Oblique-78" transform="translate(1 2)"/>
+ </g>
+</svg>'''
+
+class TestShareGlyphs(unittest.TestCase):
+    def setUp(self):
+        self.glyphs = GlyphDictionary()
+
+    def test_glyphs_are_moved_to_dictionary(self):
+        svg, glyph_defs = share_glyphs(SVG, self.glyphs)
+        self.assertEqual(len(self.glyphs), 1)
+        self.assertNotIn("<defs", svg)
+        self.assertEqual(referenced_glyphs(svg), set(glyph_defs.keys()))
+
+    def test_identical_glyphs_share_id(self):
+        _, first = share_glyphs(SVG, self.glyphs)
+        _, second = share_glyphs(SVG.replace(b"Oblique-78", b"other-id"), self.glyphs)
+        self.assertEqual(first.keys(), second.keys())
+        self.assertEqual(len(self.glyphs), 1)
+
+    def test_inline_glyphs(self):
+        svg, glyph_defs = share_glyphs(SVG, self.glyphs)
+        standalone = inline_glyphs(svg, glyph_defs)
+        glyph_id = next(iter(glyph_defs))
+        self.assertIn(f'<path id="{glyph_id}"', standalone)
+        self.assertLess(standalone.index("<defs>"), standalone.index("<use"))
+
+    def test_least_recently_used_glyphs_are_evicted(self):
+        glyphs = GlyphDictionary(max_glyphs=2)
+        _, first = share_glyphs(SVG, glyphs)
+        share_glyphs(SVG.replace(b"M 0 0", b"M 1 1"), glyphs)
+        share_glyphs(SVG, glyphs)
+        share_glyphs(SVG.replace(b"M 0 0", b"M 2 2"), glyphs)
+        self.assertEqual(len(glyphs), 2)
+        self.assertIn(next(iter(first)), glyphs)
+
+    def test_concurrent_sharing(self):
+        glyphs = GlyphDictionary(max_glyphs=50)
+        results = []
+        def share(offset):
+            for i in range(100):
+                svg, glyph_defs = share_glyphs(SVG.replace(b"M 0 0", f"M {offset} {i}".encode()), glyphs)
+                results.append(referenced_glyphs(svg) == set(glyph_defs))
+        threads = [threading.Thread(target=share, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(results))
+        self.assertLessEqual(len(glyphs), 50)
+
+if __name__ == "__main__":
+    unittest.main()
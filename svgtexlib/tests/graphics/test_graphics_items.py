@@ -1,4 +1,5 @@
-import VectorGraphics.graphics as gf
+from svgtexlib.graphics.patterns import color_to_rgb
+from svgtexlib.utils import translate_matrix, scale_matrix, combine_transforms_from_string
 import unittest
 import numpy.testing as np
 from PyQt6.QtGui import QColor
@@ -8,23 +9,23 @@ class TestRbg(unittest.TestCase):
         self.red = QColor('red')
 
     def test_red(self):
-        self.assertEqual(gf.color_to_rgb(self.red), "rgb(255, 0, 0)")
+        self.assertEqual(color_to_rgb(self.red), "rgb(255, 0, 0)")
 
 
 class TestMatrixCombine(unittest.TestCase):
     def setUp(self):
-        self.translate = gf.translate_matrix(7.2, 19.325)
-        self.scale = gf.scale_matrix(0.16, -0.16)
+        self.translate = translate_matrix(7.2, 19.325)
+        self.scale = scale_matrix(0.16, -0.16)
         self.scale_str = "scale(0.16 -0.16)"
         self.translate_str = "translate(7.2 19.325)"
 
 
     def test_translate(self):
-        matrix = gf.combine_transforms_from_string([self.translate_str])
+        matrix = combine_transforms_from_string([self.translate_str])
         np.assert_equal(matrix, self.translate, verbose=True), f"\n{matrix}\n not equal to\n{self.translate}"
 
     def test_scale(self):
-        matrix = gf.combine_transforms_from_string([self.scale_str])
+        matrix = combine_transforms_from_string([self.scale_str])
         np.assert_equal(matrix, self.scale, verbose=True), f"\n{matrix}\n not equal to\n{self.translate}"
 
 #    def test_composition(self):
@@ -0,0 +1,78 @@
+import unittest
+
+from PyQt6.QtCore import QPointF, QRectF
+from PyQt6.QtGui import QImage, QPainter, QTransform
+from PyQt6.QtWidgets import QApplication
+
+from svgtexlib.graphics import DeepCopyableItemGroup, DeepCopyableRectItem, SelectableRectItem, SelectableScene
+from svgtexlib.graphics.clipboard import Clipboard
+from svgtexlib.svg import SvgBuilder
+
+app = QApplication.instance() or QApplication([])
+
+def render(scene):
+    image = QImage(300, 300, QImage.Format.Format_ARGB32)
+    image.fill(0)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(0, 0, 300, 300), QRectF(0, 0, 300, 300))
+    painter.end()
+    return image
+
+class TestItemGroup(unittest.TestCase):
+    def setUp(self):
+        self.scene = SelectableScene()
+        self.items = [SelectableRectItem(DeepCopyableRectItem(i * 30, 0, 20, 20)) for i in range(3)]
+        for item in self.items:
+            self.scene.addItem(item)
+        self.items[1].setPos(0, 50)
+        self.items[2].setTransform(QTransform().rotate(10))
+        self.bounds = [item.item.sceneBoundingRect() for item in self.items]
+
+    def test_group_and_undo(self):
+        group = self.scene.group_items(self.items)
+        self.assertIsInstance(group.item, DeepCopyableItemGroup)
+        self.assertEqual([item.scene() for item in self.items], [None] * 3)
+        self.assertEqual(self.scene.selectables_in(QRectF(0, 0, 300, 300)), [group])
+        self.assertEqual([item.item.sceneBoundingRect() for item in self.items], self.bounds)
+        self.scene.undo_stack.undo()
+        self.assertIsNone(group.scene())
+        self.assertEqual([item.item.sceneBoundingRect() for item in self.items], self.bounds)
+        self.assertTrue(all(item.item.isVisible() for item in self.items))
+
+    def test_moving_group_moves_members(self):
+        group = self.scene.group_items(self.items)
+        self.scene.apply_translation([group], QPointF(100, 0))
+        members = self.scene.ungroup_item(group)
+        self.assertEqual([item.item.sceneBoundingRect() for item in members],
+                         [bounds.translated(100, 0) for bounds in self.bounds])
+        self.scene.undo_stack.undo()
+        self.assertIs(group.scene(), self.scene)
+
+    def test_picture_matches_members(self):
+        expected = render(self.scene)
+        group = self.scene.group_items(self.items)
+        self.assertEqual(render(self.scene), expected)
+        self.assertIsNotNone(group.item._picture)
+
+    def test_pasted_group_paints_members(self):
+        group = self.scene.group_items(self.items)
+        expected = render(self.scene)
+        clipboard = Clipboard()
+        clipboard.copy([group])
+        self.scene.removeItem(group)
+        pasted, = clipboard.paste(self.scene, group.item.sceneBoundingRect().topLeft())
+        self.assertEqual(render(self.scene), expected)
+        members = self.scene.ungroup_item(pasted)
+        self.assertTrue(all(item.item.isVisible() for item in members))
+        self.assertEqual([item.item.sceneBoundingRect() for item in members], self.bounds)
+
+    def test_svg_round_trip(self):
+        group = self.scene.group_items(self.items)
+        document = f'<svg xmlns="http://www.w3.org/2000/svg">{group.to_svg({})}</svg>'
+        loaded, = SvgBuilder(document.encode('utf-8')).build_scene_items()
+        self.assertIsInstance(loaded, DeepCopyableItemGroup)
+        self.assertEqual(len(loaded.childItems()), 3)
+        self.assertEqual(loaded.boundingRect(), group.item.boundingRect())
+
+if __name__ == "__main__":
+    unittest.main()
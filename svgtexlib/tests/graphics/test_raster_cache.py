@@ -0,0 +1,80 @@
+import time
+import unittest
+
+from PyQt6.QtCore import QRectF
+from PyQt6.QtGui import QImage, QTransform
+from PyQt6.QtWidgets import QApplication, QGraphicsRectItem
+
+from svgtexlib.graphics.raster_cache import RasterCache
+
+app = QApplication.instance() or QApplication([])
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" width="20" height="10"><rect width="20" height="10"/></svg>'
+
+class UpdateRecorder(QGraphicsRectItem):
+    def __init__(self):
+        super().__init__()
+        self.updates = 0
+
+    def update(self, *args):
+        self.updates += 1
+
+def image(size=10):
+    return QImage(size, size, QImage.Format.Format_ARGB32_Premultiplied)
+
+class TestRasterCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = RasterCache(budget_bytes=2 * image().sizeInBytes())
+
+    def unexpected_svg(self):
+        self.fail("svg built for a request that is not scheduled")
+
+    def test_least_recently_used_is_evicted(self):
+        for key in ((1, 1.0), (2, 1.0)):
+            self.cache._on_finished(key, image())
+        self.cache.get((1, 1.0))
+        self.cache._on_finished((3, 1.0), image())
+        self.assertIsNone(self.cache.get((2, 1.0)))
+        self.assertIsNotNone(self.cache.get((1, 1.0)))
+        self.assertIsNotNone(self.cache.get((3, 1.0)))
+        self.assertLessEqual(self.cache.used_bytes, self.cache.budget_bytes)
+
+    def test_images_over_budget_are_not_cached(self):
+        self.cache._on_finished((1, 1.0), image(100))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.used_bytes, 0)
+
+    def test_keys_follow_device_scale(self):
+        self.assertEqual(RasterCache.device_scale(QTransform().scale(2, 2)), 2.0)
+        self.assertIsNone(RasterCache.device_scale(QTransform().rotate(30)))
+        self.assertIsNone(RasterCache.device_scale(QTransform().scale(1, 2)))
+        self.cache._on_finished((1, RasterCache.device_scale(QTransform())), image())
+        # Zooming changes the key, the image rendered for the old scale is not reused
+        self.assertIsNone(self.cache.get((1, RasterCache.device_scale(QTransform().scale(1.5, 1.5)))))
+
+    def test_request_repaints_waiting_items(self):
+        cache = RasterCache()
+        first, second = UpdateRecorder(), UpdateRecorder()
+        cache.request((7, 2.0), lambda: SVG, QRectF(0, 0, 20, 10), first)
+        cache.request((7, 2.0), self.unexpected_svg, QRectF(0, 0, 20, 10), second)
+        end = time.monotonic() + 10
+        while cache.get((7, 2.0)) is None and time.monotonic() < end:
+            app.processEvents()
+            time.sleep(0.005)
+        rendered = cache.get((7, 2.0))
+        self.assertIsNotNone(rendered)
+        self.assertEqual((rendered.width(), rendered.height()), (40, 20))
+        self.assertEqual((first.updates, second.updates), (1, 1))
+
+    def test_oversized_requests_are_rejected(self):
+        item = UpdateRecorder()
+        self.cache.request((1, 4.0), self.unexpected_svg, QRectF(0, 0, 20, 10), item)
+        self.assertEqual(self.cache._waiting, {})
+        self.cache._on_finished((2, 1.0), None)
+        # Rejected keys are not requested again
+        for key in ((1, 4.0), (2, 1.0)):
+            self.cache.request(key, self.unexpected_svg, QRectF(0, 0, 1, 1), item)
+        self.assertEqual(self.cache._waiting, {})
+
+if __name__ == "__main__":
+    unittest.main()
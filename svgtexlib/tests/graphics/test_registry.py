@@ -0,0 +1,29 @@
+import gc
+import unittest
+
+from PyQt6.QtWidgets import QGraphicsRectItem
+
+from svgtexlib.graphics.registry import ItemRegistry
+
+class TestItemRegistry(unittest.TestCase):
+    def test_dead_items_are_dropped(self):
+        registry = ItemRegistry()
+        items = [QGraphicsRectItem() for _ in range(10)]
+        list(map(registry.add, items))
+        self.assertEqual(len(registry), 10)
+        del items[5:]
+        gc.collect()
+        self.assertEqual(len(registry), 5)
+        self.assertEqual(list(registry), items)
+
+    def test_discard(self):
+        registry = ItemRegistry()
+        item = QGraphicsRectItem()
+        registry.add(item)
+        registry.discard(item)
+        registry.discard(item)
+        self.assertNotIn(item, registry)
+        self.assertEqual(len(registry), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import math
+import unittest
+
+from PyQt6.QtCore import QPointF, QRectF, Qt
+from PyQt6.QtGui import QBrush, QPen, QTransform
+from PyQt6.QtWidgets import QApplication, QGraphicsItem
+
+from svgtexlib.drawing.transformation_handlers import RotationHandler, ScaleHandler, VertexHandler
+from svgtexlib.graphics import DeepCopyableConnectorItem, DeepCopyableRectItem, SelectableRectItem, SelectableScene
+
+app = QApplication.instance() or QApplication([])
+
+class Event:
+    def __init__(self, scene_pos):
+        self._scene_pos = scene_pos
+
+    def scenePos(self):
+        return self._scene_pos
+
+def drag(handler, start, positions):
+    handler.handle_mouse_press(Event(start))
+    for position in positions:
+        handler.handle_mouse_move(Event(position))
+    handler.handle_mouse_release(Event(positions[-1]))
+
+class TestSelectableRectGeometry(unittest.TestCase):
+    def setUp(self):
+        self.scene = SelectableScene()
+        self.item = SelectableRectItem(DeepCopyableRectItem(0, 0, 100, 50))
+        self.scene.addItem(self.item)
+
+    def test_cached_geometry_follows_transform_and_pen(self):
+        self.assertEqual(self.item.itemBoundingRect(), self.item._item_bounding_rect())
+        self.assertEqual(self.item.topLeftStretchIcon().center(), self.item.itemBoundingRect().topLeft())
+
+        self.item.setTransform(QTransform().scale(2, 1), combine=True)
+        self.assertEqual(self.item.itemBoundingRect(), self.item._item_bounding_rect())
+        self.assertEqual(self.item.rotatingRectIcon().center().x(), self.item.itemBoundingRect().right())
+
+        self.item.setPen(QPen(QPen().color(), 10))
+        self.assertEqual(self.item.itemBoundingRect(), self.item._item_bounding_rect())
+        self.assertTrue(self.item.boundingRect().contains(self.item.bottomRightStretchIcon()))
+
+    def test_child_geometry_change(self):
+        connector = DeepCopyableConnectorItem.from_polylines([[QPointF(0, 0), QPointF(50, 0), QPointF(50, 50)]])
+        wrapper = SelectableRectItem(connector)
+        self.scene.addItem(wrapper)
+        connector.move_vertex(connector.vertex_at(QPointF(50, 50), 1), QPointF(300, 300))
+        self.assertTrue(wrapper.boundingRect().contains(QRectF(290, 290, 10, 10)))
+        self.assertIn(wrapper, self.scene.selectables_in(QRectF(295, 295, 10, 10)))
+
+    def test_handler_at(self):
+        self.assertIsInstance(self.item.handler_at(self.item.rotatingRectIcon().center()), RotationHandler)
+        self.assertIsInstance(self.item.handler_at(self.item.bottomLeftStretchIcon().center()), ScaleHandler)
+        self.assertIsNone(self.item.handler_at(self.item.itemBoundingRect().center()))
+
+        connector = DeepCopyableConnectorItem.from_polylines([[QPointF(0, 0), QPointF(50, 0), QPointF(50, 50)]])
+        wrapper = SelectableRectItem(connector)
+        self.scene.addItem(wrapper)
+        handler = wrapper.handler_at(wrapper.mapFromItem(connector, QPointF(51, 1)))
+        self.assertIsInstance(handler, VertexHandler)
+        self.assertIsNone(wrapper.handler_at(wrapper.mapFromItem(connector, QPointF(25, 25))))
+
+class TestTransformDrags(unittest.TestCase):
+    def setUp(self):
+        self.scene = SelectableScene()
+        self.item = SelectableRectItem(DeepCopyableRectItem(0, 0, 100, 50))
+        self.scene.addItem(self.item)
+
+    def test_rotation_returning_to_start_is_identity(self):
+        handler = self.item.handler_at(self.item.rotatingRectIcon().center())
+        center = self.item.mapToScene(self.item.boundingRect().center())
+        start = self.item.mapToScene(self.item.rotatingRectIcon().center())
+        radius = start.x() - center.x()
+        angles = [math.sin(i / 50) * 2 for i in range(1, 1000)] + [0.0]
+        drag(handler, start, [center + QPointF(radius * math.cos(a), radius * math.sin(a)) for a in angles])
+        self.assertEqual(QGraphicsItem.transform(self.item), QTransform())
+        self.assertEqual(self.item.transform(), QTransform())
+
+    def test_scale_is_measured_from_press(self):
+        handler = self.item.handler_at(self.item.bottomRightStretchIcon().center())
+        start = self.item.mapToScene(self.item.bottomRightStretchIcon().center())
+        before = self.item.item.sceneBoundingRect()
+        drag(handler, start, [start + QPointF(i % 37, i % 11) for i in range(500)] + [start + QPointF(before.width(), before.height())])
+        self.assertEqual(self.item.item.sceneBoundingRect(), QRectF(before.topLeft(), before.size() * 2))
+
+    def test_drag_session_reindexes_on_end(self):
+        other = SelectableRectItem(DeepCopyableRectItem(0, 0, 100, 50))
+        self.scene.addItem(other)
+        self.scene.begin_drag([self.item, other])
+        for i in range(1, 50):
+            self.item.setPos(i * 10, 0)
+            other.setPos(0, i * 10)
+        # Indexes keep the bounds from the start of the drag
+        self.assertIn(self.item, self.scene.selectables_in(QRectF(0, 0, 10, 10)))
+        self.scene.end_drag()
+        self.assertNotIn(self.item, self.scene.selectables_in(QRectF(0, 0, 10, 10)))
+        self.assertIn(self.item, self.scene.selectables_in(QRectF(490, 0, 10, 10)))
+        self.assertIn(other, self.scene.selectables_in(QRectF(0, 490, 10, 10)))
+        self.assertFalse(self.scene.is_dragging())
+
+class TestBatchOperations(unittest.TestCase):
+    def setUp(self):
+        self.scene = SelectableScene()
+        self.items = [SelectableRectItem(DeepCopyableRectItem(i * 20, 0, 10, 10)) for i in range(20)]
+        for item in self.items:
+            self.scene.addItem(item)
+
+    def test_style_and_restore(self):
+        record = self.scene.apply_style(self.items, pen=QPen(Qt.GlobalColor.red, 5), brush=QBrush(Qt.GlobalColor.blue))
+        self.assertTrue(all(item.item.pen().widthF() == 5 for item in self.items))
+        self.assertTrue(all(item.item.brush().color() == Qt.GlobalColor.blue for item in self.items))
+        self.assertEqual(self.items[0].itemBoundingRect(), self.items[0]._item_bounding_rect())
+        self.scene.restore_style(record)
+        self.assertTrue(all(item.item.pen() == QPen() and item.item.brush() == QBrush() for item in self.items))
+        self.assertEqual(self.items[0].itemBoundingRect(), self.items[0]._item_bounding_rect())
+
+    def test_translation_is_indexed(self):
+        self.scene.apply_translation(self.items, QPointF(0, 1000))
+        self.assertEqual(self.scene.selectables_in(QRectF(0, 0, 400, 20)), [])
+        self.assertEqual(len(self.scene.selectables_in(QRectF(0, 1000, 400, 20))), 20)
+
+if __name__ == "__main__":
+    unittest.main()
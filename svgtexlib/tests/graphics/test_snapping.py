@@ -0,0 +1,53 @@
+import random
+import unittest
+
+from PyQt6.QtCore import QLineF, QPointF
+from PyQt6.QtWidgets import QApplication
+
+from svgtexlib.graphics import DeepCopyableLineItem, DeepCopyableRectItem, SelectableRectItem, SelectableScene
+
+app = QApplication.instance() or QApplication([])
+
+class TestSnapIndex(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.scene = SelectableScene()
+        self.lines = []
+        for _ in range(200):
+            p1 = QPointF(random.uniform(0, 1000), random.uniform(0, 1000))
+            p2 = p1 + QPointF(random.uniform(-100, 100), random.uniform(-100, 100))
+            line = SelectableRectItem(DeepCopyableLineItem(QLineF(p1, p2)))
+            self.scene.addItem(line)
+            self.lines.append(line)
+        self.index = self.scene.snap_index
+
+    def brute_nearest(self, pos, radius):
+        points = [line.item.mapToScene(p) for line in self.lines for p in (line.item.line().p1(), line.item.line().p2())]
+        points = [p for p in points if QLineF(p, pos).length() < radius]
+        return min(points, key=lambda p: QLineF(p, pos).length(), default=None)
+
+    def test_nearest_matches_brute_force(self):
+        self.scene.addItem(SelectableRectItem(DeepCopyableRectItem(0, 0, 50, 50)))
+        self.assertEqual(len(self.index), 400)
+        for _ in range(100):
+            pos = QPointF(random.uniform(0, 1000), random.uniform(0, 1000))
+            self.assertEqual(self.index.nearest(pos, 20), self.brute_nearest(pos, 20))
+
+    def test_moved_removed_and_connected_lines(self):
+        line = self.lines[0]
+        p2 = line.item.mapToScene(line.item.line().p2())
+        connected = SelectableRectItem(DeepCopyableLineItem(QLineF(p2, p2 + QPointF(40, 0))))
+        self.scene.addItem(connected)
+        self.assertIn(connected, self.index.connected(line))
+
+        line.setPos(line.pos() + QPointF(3000, 3000))
+        self.assertNotIn(connected, self.index.connected(line))
+        moved = p2 + QPointF(3000, 3000)
+        self.assertEqual(self.index.nearest(moved + QPointF(1, 1), 5), moved)
+
+        self.scene.removeItem(line)
+        self.assertNotIn(line, self.index)
+        self.assertIsNone(self.index.nearest(moved, 5))
+
+if __name__ == "__main__":
+    unittest.main()
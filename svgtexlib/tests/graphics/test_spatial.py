@@ -0,0 +1,55 @@
+import random
+import unittest
+
+from PyQt6.QtCore import QPointF, QRectF
+from PyQt6.QtWidgets import QGraphicsRectItem
+
+from svgtexlib.graphics.spatial import SpatialIndex, rect_distance
+
+class TestSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.index = SpatialIndex(cell_size=32, max_cells=16)
+        self.items = []
+        for z in range(300):
+            item = QGraphicsRectItem(QRectF(random.uniform(0, 1000), random.uniform(0, 1000), random.uniform(1, 80), random.uniform(1, 80)))
+            item.setZValue(z)
+            self.items.append(item)
+            self.index.insert(item)
+        # Larger than max_cells
+        self.large = QGraphicsRectItem(QRectF(0, 0, 500, 500))
+        self.items.append(self.large)
+        self.index.insert(self.large)
+
+    def brute_at(self, point):
+        return sorted((item for item in self.items if item.sceneBoundingRect().contains(point)), key=lambda item: -item.zValue())
+
+    def test_point_and_rect_queries(self):
+        for _ in range(50):
+            point = QPointF(random.uniform(0, 1000), random.uniform(0, 1000))
+            self.assertEqual(self.index.items_at(point), self.brute_at(point))
+        rect = QRectF(200, 300, 150, 90)
+        expected = {id(item) for item in self.items if item.sceneBoundingRect().intersects(rect)}
+        self.assertEqual({id(item) for item in self.index.items_in(rect)}, expected)
+
+    def test_nearest(self):
+        for _ in range(20):
+            point = QPointF(random.uniform(-200, 1200), random.uniform(-200, 1200))
+            best = min(rect_distance(item.sceneBoundingRect(), point) for item in self.items)
+            nearest = self.index.nearest(point)
+            self.assertAlmostEqual(rect_distance(nearest.sceneBoundingRect(), point), best)
+        self.assertIsNone(self.index.nearest(QPointF(5000, 5000), max_distance=10))
+
+    def test_moved_and_removed_items(self):
+        item = self.items[0]
+        item.setPos(3000, 3000)
+        self.index.mark_dirty(item)
+        self.assertIn(item, self.index.items_at(item.sceneBoundingRect().center()))
+        self.index.remove(item)
+        self.items.remove(item)
+        self.assertNotIn(item, self.index)
+        point = QPointF(250, 250)
+        self.assertEqual(self.index.items_at(point), self.brute_at(point))
+
+if __name__ == "__main__":
+    unittest.main()
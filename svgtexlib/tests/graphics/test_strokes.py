@@ -0,0 +1,73 @@
+import math
+import unittest
+
+import numpy as np
+from PyQt6.QtCore import QPointF, QRectF
+from PyQt6.QtGui import QPen
+from PyQt6.QtWidgets import QApplication, QStyleOptionGraphicsItem
+
+from svgtexlib.graphics import LiveStrokeItem
+from svgtexlib.graphics.strokes import curves_to_path, fit_stroke, rdp_mask
+
+app = QApplication.instance() or QApplication([])
+
+class Painter:
+    def __init__(self):
+        self.polylines = 0
+
+    def setPen(self, pen):
+        pass
+
+    def drawPolyline(self, polygon):
+        self.polylines += 1
+
+class TestLiveStrokeItem(unittest.TestCase):
+    def setUp(self):
+        self.points = [QPointF(i, 50 * math.sin(i / 20)) for i in range(1000)]
+        self.stroke = LiveStrokeItem(self.points[0], QPen())
+        for point in self.points[1:]:
+            self.stroke.append(point)
+
+    def test_points_and_path(self):
+        self.assertEqual(self.stroke.points(), self.points)
+        self.assertEqual(self.stroke.point_count(), len(self.points))
+        self.assertAlmostEqual(self.stroke.length(), self.stroke.path().length(), places=3)
+        self.assertTrue(self.stroke.boundingRect().contains(self.stroke.path().boundingRect()))
+
+    def test_paint_only_draws_exposed_chunks(self):
+        option = QStyleOptionGraphicsItem()
+        option.exposedRect = QRectF(998, -60, 4, 120)
+        painter = Painter()
+        self.stroke.paint(painter, option)
+        self.assertEqual(painter.polylines, 1)
+
+class TestStrokeSimplification(unittest.TestCase):
+    def test_rdp_keeps_corners(self):
+        points = np.array([(x, 0) for x in range(10)] + [(9, y) for y in range(1, 10)], dtype=float)
+        self.assertEqual(np.nonzero(rdp_mask(points, 0.5))[0].tolist(), [0, 9, 18])
+
+    def test_fit_stroke_within_tolerance(self):
+        # Pixel quantized samples of a smooth curve followed by a straight line, with a corner in between
+        t = np.linspace(0, 4 * np.pi, 2000)
+        points = [QPointF(round(x), round(y)) for x, y in zip(100 * np.cos(t) + 20 * t, 60 * np.sin(2 * t))]
+        points += [QPointF(points[-1].x(), points[-1].y() + i) for i in range(1, 100)]
+        curves = fit_stroke(points, 1.0)
+        self.assertLess(len(curves) + 1, len(points) / 10)
+
+        path = curves_to_path(curves)
+        curve = np.array([(path.pointAtPercent(p).x(), path.pointAtPercent(p).y()) for p in np.linspace(0, 1, 4000)])
+        samples = np.array([(point.x(), point.y()) for point in points])
+        deviation = np.min(np.hypot(samples[:, None, 0] - curve[None, :, 0], samples[:, None, 1] - curve[None, :, 1]), axis=1)
+        self.assertLess(deviation.max(), 1.1)
+
+    def test_fit_tiny_closed_loop(self):
+        points = [QPointF(math.cos(i / 10 * math.tau), math.sin(i / 10 * math.tau)) for i in range(10)]
+        points.append(QPointF(points[0]))
+        curves = fit_stroke(points, tolerance=5)
+        self.assertTrue(curves)
+        self.assertTrue(all(np.all(np.isfinite(curve)) for curve in curves))
+        self.assertTrue(np.allclose(curves[-1][3], curves[0][0]))
+        self.assertTrue(math.isfinite(curves_to_path(curves).length()))
+
+if __name__ == "__main__":
+    unittest.main()
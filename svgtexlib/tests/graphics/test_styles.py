@@ -0,0 +1,64 @@
+import unittest
+from copy import deepcopy
+
+from lxml import etree
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QBrush, QPen
+from PyQt6.QtWidgets import QApplication, QGraphicsView
+
+from svgtexlib.drawing.drawing_controller import DrawingController
+from svgtexlib.graphics import DeepCopyableRectItem, SelectableScene
+from svgtexlib.graphics.styles import StyleTable
+from svgtexlib.svg import SvgBuilder
+from svgtexlib.svg.attrib import tools_from_attrib
+
+app = QApplication.instance() or QApplication([])
+
+class TestStyleTable(unittest.TestCase):
+    def test_interning(self):
+        table = StyleTable()
+        pen = table.pen(QPen(Qt.GlobalColor.red, 2))
+        self.assertIs(table.pen(QPen(Qt.GlobalColor.red, 2)), pen)
+        self.assertIsNot(table.pen(QPen(Qt.GlobalColor.red, 3)), pen)
+        self.assertIs(table.brush(QBrush(Qt.GlobalColor.blue)), table.brush(QBrush(Qt.GlobalColor.blue)))
+        self.assertEqual(len(table), 3)
+
+    def test_memoized_svg_keeps_defs(self):
+        table = StyleTable()
+        item = DeepCopyableRectItem(0, 0, 10, 10)
+        brush = QBrush(Qt.GlobalColor.blue, Qt.BrushStyle.CrossPattern)
+        expected_defs = {}
+        expected = item._brush_to_svg(brush, expected_defs)
+        for _ in range(2):
+            defs = {}
+            self.assertEqual(table.brush_svg(brush, defs, item._brush_to_svg), expected)
+            self.assertEqual(defs, expected_defs)
+
+    def test_loaded_tools_are_shared(self):
+        first = etree.fromstring('<rect style="stroke:rgb(255, 0, 0);stroke-width:2.0;fill:none"/>')
+        second = etree.fromstring('<rect style="stroke:rgb(255, 0, 0);stroke-width:2.0;fill:none"/>')
+        table = StyleTable()
+        pen, brush = tools_from_attrib(first.attrib, table)
+        self.assertIs(tools_from_attrib(second.attrib, table)[0], pen)
+        self.assertIs(tools_from_attrib(second.attrib, table)[1], brush)
+
+    def test_loaded_items_use_the_scene_table(self):
+        scene = SelectableScene()
+        document = b'<svg xmlns="http://www.w3.org/2000/svg"><rect width="5" height="5" style="stroke:rgb(255, 0, 0)"/></svg>'
+        rect, = SvgBuilder(document, scene.style_table).build_scene_items()
+        self.assertEqual(len(scene.style_table), 2)
+        # Copies outside of a scene intern nothing
+        copy = deepcopy(rect)
+        self.assertEqual(copy.pen(), rect.pen())
+        self.assertEqual(len(scene.style_table), 2)
+
+    def test_scenes_own_their_table(self):
+        first, second = SelectableScene(), SelectableScene()
+        self.assertIsNot(first.style_table, second.style_table)
+        controller = DrawingController(scene_view=QGraphicsView(first))
+        controller.setPenWidth(7)
+        self.assertIs(first.style_table.pen(QPen(controller.pen)), controller.pen)
+        self.assertEqual(len(second.style_table), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from PyQt6.QtCore import QPointF, QRectF, Qt
+from PyQt6.QtGui import QPen, QTextCursor
+from PyQt6.QtWidgets import QApplication
+
+from svgtexlib.graphics import DeepCopyableRectItem, DeepCopyableTextbox, SelectableRectItem, SelectableScene
+from svgtexlib.graphics.undo import UndoStack
+
+app = QApplication.instance() or QApplication([])
+
+class TestUndoStack(unittest.TestCase):
+    def setUp(self):
+        self.scene = SelectableScene()
+        self.item = SelectableRectItem(DeepCopyableRectItem(0, 0, 100, 50))
+        self.scene.addItem(self.item)
+        self.stack = self.scene.undo_stack
+
+    def test_add_and_remove(self):
+        self.scene.removeItem(self.item)
+        self.assertTrue(self.stack.undo())
+        self.assertIs(self.item.scene(), self.scene)
+        self.assertIn(self.item, self.scene.selectables_at(QPointF(50, 25)))
+        self.assertTrue(self.stack.undo())
+        self.assertIsNone(self.item.scene())
+        self.assertFalse(self.stack.can_undo())
+        self.assertTrue(self.stack.redo())
+        self.assertIs(self.item.scene(), self.scene)
+
+    def test_drag_is_one_step(self):
+        self.scene.begin_drag([self.item])
+        for i in range(1, 20):
+            self.item.setPos(i * 10, 0)
+        self.scene.end_drag()
+        steps = len(self.stack)
+        self.stack.undo()
+        self.assertEqual(self.item.pos(), QPointF(0, 0))
+        self.assertIn(self.item, self.scene.selectables_at(QPointF(50, 25)))
+        self.stack.redo()
+        self.assertEqual(self.item.pos(), QPointF(190, 0))
+        self.assertEqual(len(self.stack), steps)
+
+    def test_style(self):
+        self.scene.apply_style([self.item], pen=QPen(Qt.GlobalColor.red, 4))
+        self.stack.undo()
+        self.assertEqual(self.item.item.pen(), QPen())
+        self.stack.redo()
+        self.assertEqual(self.item.item.pen().widthF(), 4)
+
+    def test_typing_is_merged(self):
+        textbox = DeepCopyableTextbox(QRectF(0, 0, 100, 50), "")
+        self.scene.addItem(SelectableRectItem(textbox))
+        cursor = QTextCursor(textbox.text_item.document())
+        for char in "$x^2$":
+            cursor.insertText(char)
+        self.assertEqual(textbox.text(), "$x^2$")
+        self.stack.undo()
+        self.assertEqual(textbox.text(), "")
+        self.stack.redo()
+        self.assertEqual(textbox.text(), "$x^2$")
+
+    def test_memory_budget(self):
+        stack = UndoStack(max_bytes=20000)
+        items = [SelectableRectItem(DeepCopyableRectItem(0, 0, 10, 10)) for _ in range(100)]
+        for item in items:
+            self.scene.addItem(item)
+        self.scene.undo_stack = stack
+        for item in items:
+            self.scene.removeItem(item)
+        self.assertLessEqual(stack.memory(), 20000)
+        kept = len(stack)
+        self.assertLess(kept, 100)
+        while stack.undo():
+            pass
+        # Only the removals still in the history are restored
+        self.assertEqual(sum(item.scene() is self.scene for item in items), kept)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from svgtexlib.graphics.zorder import ZOrderIndex
+
+class Item:
+    def __init__(self):
+        self.z = None
+        self.calls = 0
+
+    def setZValue(self, z):
+        self.z = z
+        self.calls += 1
+
+class TestZOrderIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = ZOrderIndex()
+        self.items = [Item() for _ in range(50)]
+        for item in self.items:
+            self.index.add(item)
+
+    def assertConsistent(self):
+        ordered = list(self.index)
+        self.assertEqual([self.index.rank(item) for item in ordered], list(range(len(ordered))))
+        self.assertEqual([item.z for item in ordered], sorted(item.z for item in ordered))
+        self.assertEqual(self.index.max_z(), max(item.z for item in ordered))
+
+    def test_add_stacks_on_top(self):
+        self.assertEqual(list(self.index), self.items)
+        self.assertEqual(self.index.rank(self.items[10]), 10)
+        self.assertIs(self.index.at(-1), self.items[-1])
+
+    def test_front_and_back(self):
+        item = self.items[20]
+        calls = [other.calls for other in self.items]
+        self.index.bring_to_front(item)
+        self.assertIs(self.index.top(), item)
+        self.index.send_to_back(item)
+        self.assertIs(self.index.bottom(), item)
+        # Only the moved item is pushed a new z value
+        self.assertEqual([other.calls for other in self.items if other is not item],
+                         [c for other, c in zip(self.items, calls) if other is not item])
+        self.assertConsistent()
+
+    def test_raise_and_lower(self):
+        item = self.items[5]
+        self.index.raise_(item)
+        self.assertEqual(self.index.rank(item), 6)
+        self.index.lower(item)
+        self.index.lower(item)
+        self.assertEqual(self.index.rank(item), 4)
+        self.index.raise_(self.items[-1])
+        self.assertIs(self.index.top(), self.items[-1])
+        self.assertConsistent()
+
+    def test_external_update_and_remove(self):
+        item = self.items[0]
+        item.setZValue(1000)
+        self.index.update(item, 1000)
+        self.assertIs(self.index.top(), item)
+        self.assertEqual(self.index.max_z(), 1000)
+        self.index.remove(item)
+        self.assertNotIn(item, self.index)
+        self.assertEqual(len(self.index), 49)
+        self.assertConsistent()
+
+if __name__ == "__main__":
+    unittest.main()
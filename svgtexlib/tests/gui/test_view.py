@@ -0,0 +1,46 @@
+import time
+import unittest
+
+from PyQt6.QtCore import QEvent, QPointF, Qt
+from PyQt6.QtGui import QMouseEvent
+from PyQt6.QtWidgets import QApplication
+
+from svgtexlib.graphics import SelectableScene
+from svgtexlib.gui.window import GraphicsView
+
+app = QApplication.instance() or QApplication([])
+
+class RecordingController:
+    def __init__(self):
+        self.moves = []
+
+    def mouseMoveEvent(self, event, samples=None):
+        self.moves.append((event.position(), len(samples or [])))
+
+def move(pos: QPointF, buttons=Qt.MouseButton.LeftButton) -> QMouseEvent:
+    return QMouseEvent(QEvent.Type.MouseMove, pos, pos, Qt.MouseButton.NoButton, buttons, Qt.KeyboardModifier.NoModifier)
+
+class TestMoveCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.controller = RecordingController()
+        self.view = GraphicsView(self.controller)
+        self.view.setScene(SelectableScene())
+
+    def test_drag_moves_are_delivered_once_per_frame(self):
+        for i in range(10):
+            self.view.mouseMoveEvent(move(QPointF(i, i)))
+        self.assertEqual(self.controller.moves, [])
+        end = time.monotonic() + 2
+        while not self.controller.moves and time.monotonic() < end:
+            app.processEvents()
+            time.sleep(0.001)
+        self.assertEqual(self.controller.moves, [(QPointF(9, 9), 10)])
+
+    def test_hover_moves_are_not_delayed(self):
+        self.view.mouseMoveEvent(move(QPointF(1, 1)))
+        self.view.mouseMoveEvent(move(QPointF(5, 5), Qt.MouseButton.NoButton))
+        # The pending drag move is delivered first
+        self.assertEqual(self.controller.moves, [(QPointF(1, 1), 1), (QPointF(5, 5), 1)])
+
+if __name__ == "__main__":
+    unittest.main()
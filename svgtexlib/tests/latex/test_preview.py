@@ -0,0 +1,65 @@
+import time
+import unittest
+
+from PyQt6.QtCore import QRectF
+from PyQt6.QtWidgets import QApplication
+
+from svgtexlib.graphics import DeepCopyableTextbox, SelectableRectItem, SelectableScene
+from svgtexlib.latex.cache import CompiledEquation, EquationCache
+from svgtexlib.latex.preview import LatexPreviewCompiler
+
+app = QApplication.instance() or QApplication([])
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" width="20" height="10"><rect width="20" height="10"/></svg>'
+
+def wait_for(condition, timeout=10.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+class TestLatexPreviewCompiler(unittest.TestCase):
+    def setUp(self):
+        self.scene = SelectableScene()
+        self.textbox = DeepCopyableTextbox(QRectF(0, 0, 100, 50), "")
+        self.scene.addItem(SelectableRectItem(self.textbox))
+        self.cache = EquationCache()
+        self.compiler = LatexPreviewCompiler(self.cache, delay_ms=20)
+        self.compiler.setEnabled(True)
+
+    def preview_visible(self):
+        return self.textbox.preview_item is not None and self.textbox.preview_item.isVisible()
+
+    def test_cache_hit_shows_preview_immediately(self):
+        compiled = CompiledEquation("$x$", SVG)
+        self.cache.put(compiled)
+        self.compiler.request(self.textbox, "$x$")
+        self.assertFalse(self.compiler._timer.isActive())
+        self.assertTrue(self.preview_visible())
+        self.assertIs(self.textbox.preview_item.renderer(), compiled.renderer())
+
+    def test_debounce_compiles_latest_text_only(self):
+        self.compiler.request(self.textbox, "$a$")
+        self.compiler.request(self.textbox, "$b$")
+        self.assertTrue(self.compiler._timer.isActive())
+        self.assertTrue(wait_for(self.preview_visible))
+        self.assertIn("$b$", self.cache)
+        self.assertNotIn("$a$", self.cache)
+
+    def test_stale_results_are_discarded(self):
+        self.compiler.request(self.textbox, "$a$")
+        stale = self.compiler._generation
+        self.compiler.request(self.textbox, "$b$")
+        self.compiler._on_finished(stale, CompiledEquation("$a$", SVG))
+        self.assertFalse(self.preview_visible())
+
+    def test_failed_compile_clears_preview(self):
+        self.cache.put(CompiledEquation("$x$", SVG))
+        self.compiler.request(self.textbox, "$x$")
+        self.compiler.request(self.textbox, "$\\frac{$")
+        self.compiler._on_finished(self.compiler._generation, None)
+        self.assertFalse(self.preview_visible())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from svgtexlib.svg.minify import minify_svg
+
+SVG = b'''<?xml version="1.0" encoding="utf-8" standalone="no"?>
+<svg xmlns:xlink="http://www.w3.org/1999/xlink" width="62.4pt" height="33.28375pt" viewBox="0 0 62.4 33.28375" xmlns="http://www.w3.org/2000/svg">
+ <metadata><title>Matplotlib</title></metadata>
+ <defs>
+  <style type="text/css">*{stroke-linejoin: round}</style>
+  <clipPath id="clip"><rect x="0" y="0" width="10" height="10"/></clipPath>
+ </defs>
+ <g id="figure_1">
+  <g id="patch_1">
+   <path d="M 0 33.28375 L 62.4 33.28375 z" style="fill: none"/>
+  </g>
+  <!-- $x$ -->
+  <g transform="translate(7.2 22.24) scale(0.16 -0.16)">
+   <defs><path id="glyph" d="M 3841 3500 z" transform="scale(0.015625)"/><path id="unused" d="M 0 0 z"/></defs>
+   <use xlink:href="#glyph" transform="translate(0.123456 1)" clip-path="url(#clip)"/>
+  </g>
+ </g>
+</svg>'''
+
+class TestMinifySvg(unittest.TestCase):
+    def setUp(self):
+        self.svg = minify_svg(SVG, precision=2)
+
+    def test_strips_metadata_style_and_comments(self):
+        for removed in ("metadata", "<style", "<!--", "clipPath", "clip-path", 'id="unused"', "figure_1"):
+            self.assertNotIn(removed, self.svg)
+
+    def test_rounds_coordinates_but_not_scale_factors(self):
+        self.assertIn('viewBox="0 0 62.4 33.28"', self.svg)
+        self.assertIn("translate(0.12 1)", self.svg)
+        self.assertIn("scale(0.015625)", self.svg)
+
+    def test_keeps_referenced_glyph(self):
+        self.assertIn('id="glyph"', self.svg)
+        self.assertIn('href="#glyph"', self.svg)
+
+    def test_flattens_trivial_groups(self):
+        self.assertEqual(self.svg.count("<g"), 1)
+
+if __name__ == "__main__":
+    unittest.main()
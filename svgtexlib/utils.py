@@ -6,10 +6,11 @@ import json
 from pathlib import Path
 import re
 import io
+import threading
 
 import numpy as np
 from PyQt6.QtGui import QTransform
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from lxml import etree
 
 class Handlers(Enum):
@@ -26,6 +27,21 @@ class Tools(Enum):
     Brush = "BrushTool"
     Pen = "PenTool"
 
+class InteractionMode(Enum):
+    """ How selectable items respond to the mouse. Held by the scene and derived from the active handler """
+    Select = "select" # items are selectable and movable
+    Style = "style" # items are selectable but not movable, brush and pen tools restyle the selection
+    Draw = "draw" # items ignore the mouse so drawing handlers receive it
+
+    @classmethod
+    def from_handler(cls, name: str) -> "InteractionMode":
+        """ name: class name of the active DrawingHandler or ToolProtocol """
+        if name == Handlers.Selector.value:
+            return cls.Select
+        if name == Tools.Brush.value or name == Tools.Pen.value:
+            return cls.Style
+        return cls.Draw
+
 CONFIG_PATH = Path(__file__).parent / "config.json"
 def get_config():
     with open(CONFIG_PATH, 'r') as f:
@@ -44,13 +60,17 @@ def latex_template(tex: str) -> str:
 class LatexCompilationError(Exception):
     pass
 
+_tex_lock = threading.Lock()
+
 def tex2svg(equation: str):
-    fig = plt.figure(figsize=(1, 1))
-    fig.text(0, 0, equation, fontsize=16)
-    svg_data = io.BytesIO()
-    fig.savefig(svg_data, format="svg", bbox_inches="tight", pad_inches=0.1, dpi=100, transparent=True)
+    """ Renders equation to svg using matplotlib mathtext. The Figure api is used directly instead of pyplot so equations
+    can be compiled off the gui thread. Mathtext itself is not thread safe, hence the lock """
+    with _tex_lock:
+        fig = Figure(figsize=(1, 1))
+        fig.text(0, 0, equation, fontsize=16)
+        svg_data = io.BytesIO()
+        fig.savefig(svg_data, format="svg", bbox_inches="tight", pad_inches=0.1, dpi=100, transparent=True)
 #        raise LatexCompilationError(f"Failed to compile equation: {equation}")
-    plt.close(fig)
     svg_data.seek(0)
     return svg_data
 
@@ -190,6 +210,13 @@ def matrix_to_qtransform(matrix: np.ndarray):
     qtransform = QTransform(matrix[0][0], matrix[0][1], matrix[1][0], matrix[1][1], matrix[0][2], matrix[1][2])
     return qtransform
 
+def normalize_transform(transform: QTransform, precision: int = 9) -> QTransform:
+    """ Rounds the affine components of transform, dropping float noise such as 6.123e-17 or -0.0. The projective
+    components are discarded """
+    values = [round(value, precision) + 0.0 for value in (transform.m11(), transform.m12(), transform.m21(),
+                                                           transform.m22(), transform.dx(), transform.dy())]
+    return QTransform(*values)
+
 
 def transform_path(svg_document: bytes, transform: QTransform) -> str:
     """